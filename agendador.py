@@ -0,0 +1,245 @@
+import time
+import random
+import threading
+import email.utils
+from urllib.parse import urlsplit
+
+
+# Respostas que indicam sobrecarga ou falha temporária do servidor: a requisição é repetida
+STATUS_REPETIR = {429, 500, 502, 503, 504}
+
+
+class BaldeDeFichas:
+    '''
+    Limitador de taxa (token bucket): cada requisição retira uma ficha, e as fichas são
+    repostas a uma taxa, até a capacidade do balde (rajada máxima). A taxa também é ajustada
+    por AIMD: cai pela metade a cada 429 e volta a subir aos poucos, até a taxa configurada.
+    Também pode ser pausado por um tempo, quando o servidor pede (Retry-After)
+    '''
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = float(taxa)
+        self.taxa_max = float(taxa)
+        self.capacidade = float(capacidade or max(1.0, taxa))
+        self.fichas = self.capacidade
+        self.ultimo = time.monotonic()
+        self.pausa_ate = 0.0
+        self._trava = threading.Lock()
+
+    def pausa(self, segundos):
+        with self._trava:
+            self.pausa_ate = max(self.pausa_ate, time.monotonic() + segundos)
+
+    def desacelera(self):
+        with self._trava:
+            self.taxa = max(self.taxa_max / 64, self.taxa / 2)
+
+    def acelera(self):
+        with self._trava:
+            self.taxa = min(self.taxa_max, self.taxa + self.taxa_max / 20)
+
+    def retira(self):
+        while True:
+            with self._trava:
+                agora = time.monotonic()
+                if agora < self.pausa_ate:
+                    espera = self.pausa_ate - agora
+                else:
+                    self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) * self.taxa)
+                    self.ultimo = agora
+                    if self.fichas >= 1:
+                        self.fichas -= 1
+                        return
+                    espera = (1 - self.fichas) / self.taxa
+            time.sleep(espera)
+
+
+class LimiteAdaptativo:
+    '''
+    Limite de requisições simultâneas ajustado por AIMD: cresce devagar (+1 a cada "janela" de
+    requisições rápidas) e cai pela metade quando o servidor dá sinais de sobrecarga (429, 5xx,
+    timeout ou latência acima do alvo)
+    '''
+    def __init__(self, inicial=4, minimo=1, maximo=16, latencia_alvo=10.0):
+        self.limite = float(inicial)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.latencia_alvo = latencia_alvo
+        self.em_uso = 0
+        self._cond = threading.Condition()
+
+    def entra(self):
+        with self._cond:
+            while self.em_uso >= int(self.limite):
+                self._cond.wait()
+            self.em_uso += 1
+
+    def sai(self, latencia=None, sobrecarga=False):
+        with self._cond:
+            self.em_uso -= 1
+            if sobrecarga or ((latencia is not None) and (latencia > self.latencia_alvo)):
+                self.limite = max(self.minimo, self.limite / 2)
+            elif latencia is not None:
+                self.limite = min(self.maximo, self.limite + 1 / self.limite)
+            self._cond.notify_all()
+
+
+'''
+Funcao auxiliar: le_retry_after
+Finalidade: Ler o cabeçalho Retry-After de uma resposta, em segundos ou como data HTTP
+Parâmetros:
+         resposta -> resposta do requests
+Retorno: segundos a esperar, ou None se não houver o cabeçalho
+'''
+def le_retry_after(resposta):
+    valor = resposta.headers.get('Retry-After') if resposta is not None else None
+    if not valor:
+        return None
+
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+
+    try:
+        data = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, data.timestamp() - time.time())
+
+
+class Agendador:
+    '''
+    Agendador das requisições aos servidores do TCD: limita a taxa por host (BaldeDeFichas), ajusta
+    a concorrência por host conforme a latência e os 429 (LimiteAdaptativo), aplica timeout e
+    repete as falhas temporárias com espera exponencial e jitter, respeitando o Retry-After.
+    Pode ser compartilhado entre threads (ex.: os downloads do pipeline)
+    '''
+    def __init__(self,
+                 taxa=2.0,
+                 rajada=None,
+                 concorrencia=4,
+                 concorrencia_max=16,
+                 latencia_alvo=10.0,
+                 tentativas=5,
+                 espera_base=0.5,
+                 espera_max=60.0,
+                 timeout=(10, 120)):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.concorrencia = concorrencia
+        self.concorrencia_max = concorrencia_max
+        self.latencia_alvo = latencia_alvo
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.timeout = timeout
+
+        self._baldes = {}
+        self._limites = {}
+        self._trava = threading.Lock()
+        self._local = threading.local()   # uma sessão HTTP por thread: requests.Session não é segura entre threads
+        self.estatisticas = {'requisicoes': 0, 'repeticoes': 0, 'status_429': 0, 'falhas': 0}
+
+    def _controles(self, url):
+        host = urlsplit(url).netloc
+        with self._trava:
+            if host not in self._baldes:
+                self._baldes[host] = BaldeDeFichas(self.taxa, self.rajada)
+                self._limites[host] = LimiteAdaptativo(self.concorrencia, 1, self.concorrencia_max,
+                                                       self.latencia_alvo)
+            return self._baldes[host], self._limites[host]
+
+    def _espera(self, tentativa):
+        # backoff exponencial com "full jitter": sorteia entre 0 e o teto da tentativa
+        return random.uniform(0, min(self.espera_max, self.espera_base * (2 ** tentativa)))
+
+    def _conta(self, chave):
+        with self._trava:
+            self.estatisticas[chave] += 1
+
+    def concorrencia_atual(self, url):
+        return self._controles(url)[1].limite
+
+    def taxa_atual(self, url):
+        return self._controles(url)[0].taxa
+
+    def _sessao(self):
+        import requests
+
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = self._local.sessao = requests.Session()
+        return sessao
+
+    def requisita(self, metodo, url, **kwargs):
+        import requests   # importado sob demanda: só quem baixa arquivos paga o custo
+
+        # falhas temporárias, repetidas; as demais RequestException são devolvidas na hora
+        repetir = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+        sessao = self._sessao()
+        balde, limite = self._controles(url)
+        kwargs.setdefault('timeout', self.timeout)
+        resposta, erro = None, None
+
+        for tentativa in range(self.tentativas):
+            balde.retira()
+            limite.entra()
+            inicio = time.monotonic()
+            latencia, sobrecarga = None, False
+            try:   # a vaga do limite é sempre devolvida, qualquer que seja a exceção
+                resposta = sessao.request(metodo, url, **kwargs)
+                latencia, sobrecarga = time.monotonic() - inicio, resposta.status_code in STATUS_REPETIR
+            except repetir as e:
+                sobrecarga = True
+                resposta, erro = None, e
+            except requests.RequestException:
+                sobrecarga = True
+                self._conta('falhas')
+                raise
+            finally:
+                limite.sai(latencia, sobrecarga=sobrecarga)
+                self._conta('requisicoes')
+
+            if (resposta is not None) and (resposta.status_code not in STATUS_REPETIR):
+                balde.acelera()
+                return resposta
+
+            if (resposta is not None) and (resposta.status_code == 429):
+                balde.desacelera()
+                self._conta('status_429')
+
+            if tentativa == self.tentativas - 1:
+                break
+
+            espera = self._espera(tentativa)
+            retry_after = le_retry_after(resposta)
+            if retry_after is not None:   # o servidor disse quando voltar: vale para o host todo
+                espera = max(espera, retry_after)
+                balde.pausa(retry_after)
+
+            motivo = str(resposta.status_code) if resposta is not None else type(erro).__name__
+            print(f'WARNING: {metodo} {url} falhou ({motivo}), nova tentativa em {espera:.1f} s')
+            self._conta('repeticoes')
+            time.sleep(espera)
+
+        self._conta('falhas')
+        if resposta is not None:
+            return resposta
+        raise erro
+
+
+_PADRAO = None
+
+
+'''
+Funcao: agendador_padrao
+Finalidade: Obter o agendador compartilhado pelos downloads, criado no primeiro uso
+Parâmetros: nenhum
+Retorno: objeto Agendador
+'''
+def agendador_padrao():
+    global _PADRAO
+    if _PADRAO is None:
+        _PADRAO = Agendador()
+    return _PADRAO
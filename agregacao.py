@@ -0,0 +1,388 @@
+import pandas as pd
+
+from instrumentacao import medir, fase
+from carregadores import get_main_dataset
+
+
+CNPJ = 'Consultado (CPF/CNPJ)'
+CLASS = 'Classificação'
+RESULT = 'Resultado'
+EMITIDO = 'Emitido em'
+
+# Colunas do cubo de contagens (ver conta_cubo)
+COLS_CUBO = [CNPJ, 'class_short', RESULT, 'Mes']
+
+RESULTADOS = {'Negativa': 'N', 'Positiva': 'P', 'Pos./Neg.': 'PN'}
+RESULTADOS_REV = {'N': 'Negativa', 'P': 'Positiva', 'PN': 'Pos./Neg.'}
+TODOS_RESULTADOS = ['Negativa', 'Positiva', 'Pos./Neg.']
+
+# Sufixo do nome das colunas do mapa, conforme o Resultado (ver classif_result)
+SUFIXOS = {'Positiva': 'P ', 'Negativa': 'N '}
+
+
+'''
+Funcao auxiliar: resultados_do_mapa
+Finalidade: Traduzir o filtro de resultados do mapa ('all', 'P', ['N', 'PN'] ...) para a
+            lista de Resultados
+Parâmetros:
+          results -> 'all', sigla de um resultado ou lista de siglas
+Retorno: lista com os Resultados, ou None se o filtro for inválido
+'''
+def resultados_do_mapa(results='all'):
+
+    show_result = []
+    if type(results) is list:
+        for res in results:
+            if res.upper() in RESULTADOS_REV:
+                show_result.append(RESULTADOS_REV[res.upper()])
+    else:
+        if results.lower() == 'all':
+            show_result = TODOS_RESULTADOS.copy()
+        else:
+            if results.upper() in RESULTADOS_REV:
+                show_result.append(RESULTADOS_REV[results.upper()])
+            else:
+                return None
+
+    return show_result
+
+
+'''
+Funcao: conta_certidoes
+Finalidade: Agregação parcial do mapa de certidões: quantidade de certidões por CPF/CNPJ
+            e tipo/resultado. A contagem é feita sobre os grupos, sem expandir o dataset em
+            colunas dummy, e o resultado de partes diferentes pode ser somado com combina_contagens
+Parâmetros:
+               df -> dataset (ou parte dele) com as certidões, texto ou compacto
+      show_result -> lista com os Resultados que entram no mapa
+Retorno: dataframe com os CPF/CNPJs no índice e uma coluna por tipo/resultado (ex.: '160 P ')
+'''
+@medir
+def conta_certidoes(df, show_result=TODOS_RESULTADOS):
+
+    data = df.loc[df[RESULT].isin(show_result), [CNPJ, CLASS, RESULT]]
+    contagem = data.groupby([CNPJ, CLASS, RESULT], observed=True).size()
+    contagem = contagem[contagem > 0].reset_index(name='qt')
+
+    # Mesmo rótulo de classif_result, calculado só sobre os grupos
+    contagem['classif_result'] = (contagem[CLASS].astype(str).str[0:4] +
+                                  contagem[RESULT].astype(object).map(SUFIXOS).fillna('PN'))
+    contagem[CNPJ] = contagem[CNPJ].astype(object)
+
+    tabela = contagem.groupby([CNPJ, 'classif_result'])['qt'].sum().unstack(fill_value=0)
+    tabela.columns.name = None
+
+    return tabela.astype('int64')
+
+
+'''
+Funcao: combina_contagens
+Finalidade: Somar duas agregações parciais do mapa (ver conta_certidoes)
+Parâmetros:
+        acumulado -> agregação acumulada até agora (ou None, na primeira parte)
+          parcial -> agregação da parte atual
+Retorno: dataframe com a soma das duas agregações
+'''
+def combina_contagens(acumulado, parcial):
+    if acumulado is None:
+        return parcial
+
+    return acumulado.add(parcial, fill_value=0).fillna(0).astype('int64').sort_index(axis=1)
+
+
+'''
+Funcao: monta_mapa
+Finalidade: Montar os dados do mapa de certidões a partir das contagens, inserindo as colunas
+            totalizadoras e ordenando pela quantidade de certidões positivas
+Parâmetros:
+        contagens -> agregação do mapa (ver conta_certidoes)
+      show_result -> lista com os Resultados que entram no mapa
+           totais -> indica se é para incluir as colunas de totais ou não
+Retorno: dataframe com os dados do mapa (a última coluna, 'Tot P2', é só para ordenação)
+'''
+def monta_mapa(contagens, show_result=TODOS_RESULTADOS, totais=True):
+
+    data = contagens.copy()
+    colunas = data.columns.tolist()
+
+    def soma(tipo):
+        cols = [col for col in colunas if (' '+tipo.center(2)) in col]
+        return data[cols].sum(axis=1).astype('int64')
+
+    # Insere colunas totalizadoras, se for o caso
+    if totais:
+        for res in show_result:
+            data['Tot '+RESULTADOS[res]] = soma(RESULTADOS[res])
+
+    data['Tot P2'] = soma('P')
+
+    return data.sort_values(by='Tot P2')
+
+
+'''
+Funcao: ultimas_parciais
+Finalidade: Agregação parcial da planilha das últimas certidões: o maior Resultado de cada
+            CPF/CNPJ e tipo de certidão. Partes diferentes são combinadas com combina_ultimas
+Parâmetros:
+               df -> dataset (ou parte dele) com as certidões, texto ou compacto
+Retorno: series com o Resultado, indexada por CPF/CNPJ e tipo de certidão (class_short)
+'''
+def ultimas_parciais(df):
+
+    resultados = df.groupby([CNPJ, CLASS], observed=True)[RESULT].max()
+    resultados = resultados.astype(object).reset_index()
+    resultados['class_short'] = resultados[CLASS].astype(str).str[0:4]
+    resultados[CNPJ] = resultados[CNPJ].astype(object)
+
+    return resultados.groupby([CNPJ, 'class_short'])[RESULT].max()
+
+
+'''
+Funcao: combina_ultimas
+Finalidade: Combinar duas agregações parciais das últimas certidões (ver ultimas_parciais)
+Parâmetros:
+        acumulado -> agregação acumulada até agora (ou None, na primeira parte)
+          parcial -> agregação da parte atual
+Retorno: series combinada
+'''
+def combina_ultimas(acumulado, parcial):
+    if acumulado is None:
+        return parcial
+
+    return pd.concat([acumulado, parcial]).groupby(level=[0, 1]).max()
+
+
+'''
+Funcao: monta_ultimas
+Finalidade: Montar a planilha das últimas certidões a partir da agregação
+Parâmetros:
+          ultimas -> agregação das últimas certidões (ver ultimas_parciais)
+Retorno: dataframe com os CPF/CNPJs no índice, os tipos de certidão nas colunas e ''
+         onde não há certidão
+'''
+def monta_ultimas(ultimas):
+
+    df2 = ultimas.unstack('class_short')
+    df2.fillna('', inplace=True)
+
+    return df2
+
+
+'''
+Funcao auxiliar: ultimas_certidoes
+Finalidade: montar a planilha com o resultado das certidões de cada CPF/CNPJ (linhas) por tipo
+            de certidão (colunas). Havendo mais de uma certidão do mesmo tipo, fica o maior
+            Resultado (Positiva > Pos./Neg. > Negativa). Aceita o dataset texto ou o compacto
+Parâmetros:
+               df -> dataframe com as certidões
+Retorno: dataframe com os CPF/CNPJs no índice, os tipos de certidão nas colunas e ''
+         onde não há certidão
+'''
+def ultimas_certidoes(df):
+
+    with fase('pivot', linhas_entrada=df.shape[0]) as f:
+        df2 = monta_ultimas(ultimas_parciais(df))
+        f.linhas_saida = df2.shape[0]
+
+    return df2
+
+
+'''
+Funcao: le_pastas
+Finalidade: Ler as pastas de certidões uma a uma, para o processamento em partes
+Parâmetros:
+          folders -> Número da pasta, ou lista com os números das pastas
+             path -> Caminho onde estão os arquivos
+         compacto -> Carrega cada pasta no formato compacto (colunas categóricas)
+Retorno: gerador de tuplas (número da pasta, dataset da pasta)
+'''
+def le_pastas(folders_, path='', compacto=True):
+
+    folders = folders_ if type(folders_) is list else [folders_]
+    for folder_id in folders:
+        yield folder_id, get_main_dataset(folder_id, path=path, compacto=compacto)
+
+
+'''
+Funcao: processa_em_partes
+Finalidade: Passar as partes do histórico (pastas, ver le_pastas, ou blocos de linhas do
+            armazém em disco, ver armazem.le_partes_armazem) pelos validadores e pelas
+            agregações do mapa, uma parte por vez. Só a parte atual e as agregações ficam em
+            memória, e não o histórico inteiro
+            Obs: validadores que comparam linhas entre si (ex.: validar_duplicidade) só enxergam
+            a parte atual; por isso, com validadores, as partes costumam ser as próprias pastas
+Parâmetros:
+           partes -> iterável de tuplas (identificação da parte, dataset), ex.: le_pastas(...)
+                     ou le_partes_armazem(con, linhas=...)
+      show_result -> lista com os Resultados que entram no mapa
+      validadores -> dicionário nome -> função(df, parte) que devolve o dataframe de erros
+          ultimas -> Calcula também a agregação das últimas certidões
+Retorno: tupla (contagens do mapa, agregação das últimas certidões, dicionário nome -> erros),
+         com uma coluna 'Parte' nos erros
+'''
+@medir
+def processa_em_partes(partes, show_result=TODOS_RESULTADOS, validadores=None, ultimas=True):
+
+    validadores = validadores or {}
+    erros = {nome: [] for nome in validadores}
+    contagens = None
+    acumulado_ultimas = None
+
+    for parte, df in partes:
+        with fase('parte', linhas_entrada=df.shape[0]):
+            for nome, validador in validadores.items():
+                resultado = validador(df, parte)
+                if isinstance(resultado, tuple): # validar_cnpj_razao devolve (df, erros)
+                    resultado = resultado[-1]
+                resultado.insert(0, 'Parte', parte)
+                erros[nome].append(resultado)
+
+            contagens = combina_contagens(contagens, conta_certidoes(df, show_result))
+            if ultimas:
+                acumulado_ultimas = combina_ultimas(acumulado_ultimas, ultimas_parciais(df))
+
+        del df
+
+    erros = {nome: (pd.concat(lista, ignore_index=True) if lista else pd.DataFrame())
+             for nome, lista in erros.items()}
+
+    return contagens, acumulado_ultimas, erros
+
+
+'''
+Funcao auxiliar: mes_emissao
+Finalidade: Obter o mês de emissão ('aaaa-mm') das certidões, calculado sobre as datas distintas
+Parâmetros:
+            serie -> coluna 'Emitido em' ('dd/mm/aaaa'), texto ou categórica
+Retorno: series com os meses (nulo quando a data é inválida)
+'''
+def mes_emissao(serie):
+    cat = serie.astype('category').cat
+    meses = pd.to_datetime(pd.Series(cat.categories.astype(str)), format='%d/%m/%Y', errors='coerce').dt.strftime('%Y-%m')
+
+    codigos = cat.codes.to_numpy()
+    valores = meses.to_numpy(dtype=object)[codigos]
+    valores[codigos < 0] = None
+
+    return pd.Series(valores, index=serie.index, name='Mes')
+
+
+'''
+Funcao auxiliar: mes_iso
+Finalidade: Converter um mês no formato 'mm/aaaa' para o formato do cubo ('aaaa-mm')
+Parâmetros:
+              mes -> mês 'mm/aaaa'
+Retorno: mês 'aaaa-mm'
+'''
+def mes_iso(mes):
+    return pd.to_datetime(mes, format='%m/%Y').strftime('%Y-%m')
+
+
+'''
+Funcao: conta_cubo
+Finalidade: Agregação parcial das certidões em um cubo de contagens por CPF/CNPJ, tipo de
+            certidão (class_short), Resultado e mês de emissão. O mapa, seus totais e as últimas
+            certidões (entrada da pontuação) de qualquer período ou conjunto de resultados saem
+            do cubo (ver contagens_do_cubo e ultimas_do_cubo), sem voltar às certidões. Cubos de
+            partes diferentes são somados com combina_cubos
+Parâmetros:
+               df -> dataset (ou parte dele) com as certidões, texto ou compacto
+Retorno: dataframe com as colunas de COLS_CUBO e a quantidade 'qt' (Resultado e Mes podem ser nulos)
+'''
+@medir
+def conta_cubo(df):
+
+    with fase('cubo', linhas_entrada=df.shape[0]) as f:
+        data = pd.DataFrame({CNPJ: df[CNPJ].astype(object),
+                             'class_short': df[CLASS].astype(object).str[0:4],
+                             RESULT: df[RESULT].astype(object),
+                             'Mes': mes_emissao(df[EMITIDO])})
+        data = data.dropna(subset=[CNPJ, 'class_short'])
+
+        cubo = data.groupby(COLS_CUBO, dropna=False).size().reset_index(name='qt')
+        f.linhas_saida = cubo.shape[0]
+
+    return cubo
+
+
+'''
+Funcao: combina_cubos
+Finalidade: Somar dois cubos de contagens (ver conta_cubo)
+Parâmetros:
+        acumulado -> cubo acumulado até agora (ou None, na primeira parte)
+          parcial -> cubo da parte atual
+Retorno: dataframe com a soma dos dois cubos
+'''
+def combina_cubos(acumulado, parcial):
+    if acumulado is None:
+        return parcial
+
+    return pd.concat([acumulado, parcial]).groupby(COLS_CUBO, dropna=False)['qt'].sum().reset_index()
+
+
+'''
+Funcao: fatia_cubo
+Finalidade: Selecionar uma fatia do cubo por período de emissão, resultados e tipos de certidão
+Parâmetros:
+             cubo -> cubo de contagens (ver conta_cubo)
+           mes_de -> mês de emissão inicial ('mm/aaaa'), inclusive
+          mes_ate -> mês de emissão final ('mm/aaaa'), inclusive
+      show_result -> lista com os Resultados (opcional)
+    classificacao -> tipo de certidão (3 primeiros caracteres da Classificação), ou lista deles
+Retorno: dataframe com as linhas do cubo selecionadas. Com filtro de período, ficam de fora as
+         certidões sem data de emissão válida
+'''
+def fatia_cubo(cubo, mes_de=None, mes_ate=None, show_result=None, classificacao=None):
+
+    manter = pd.Series(True, index=cubo.index)
+    if mes_de is not None:
+        manter &= cubo['Mes'].notna() & (cubo['Mes'].astype(str) >= mes_iso(mes_de))
+    if mes_ate is not None:
+        manter &= cubo['Mes'].notna() & (cubo['Mes'].astype(str) <= mes_iso(mes_ate))
+    if show_result is not None:
+        manter &= cubo[RESULT].isin(show_result)
+    if classificacao is not None:
+        classes = [str(c).strip() for c in (classificacao if type(classificacao) is list else [classificacao])]
+        manter &= cubo['class_short'].str.strip().isin(classes)
+
+    return cubo[manter]
+
+
+'''
+Funcao: contagens_do_cubo
+Finalidade: Mesma agregação de conta_certidoes (quantidade de certidões por CPF/CNPJ e
+            tipo/resultado), somando uma fatia do cubo
+Parâmetros:
+             cubo -> cubo de contagens (ver conta_cubo)
+      show_result -> lista com os Resultados que entram no mapa
+           mes_de -> mês de emissão inicial ('mm/aaaa'), inclusive
+          mes_ate -> mês de emissão final ('mm/aaaa'), inclusive
+Retorno: dataframe com os CPF/CNPJs no índice e uma coluna por tipo/resultado
+'''
+def contagens_do_cubo(cubo, show_result=TODOS_RESULTADOS, mes_de=None, mes_ate=None):
+
+    data = fatia_cubo(cubo, mes_de, mes_ate, show_result).copy()
+    data['classif_result'] = data['class_short'] + data[RESULT].map(SUFIXOS).fillna('PN')
+
+    tabela = data.groupby([CNPJ, 'classif_result'])['qt'].sum().unstack(fill_value=0)
+    tabela.columns.name = None
+
+    return tabela.astype('int64')
+
+
+'''
+Funcao: ultimas_do_cubo
+Finalidade: Mesma planilha de ultimas_certidoes (maior Resultado por CPF/CNPJ e tipo de
+            certidão), a partir de uma fatia do cubo
+Parâmetros:
+             cubo -> cubo de contagens (ver conta_cubo)
+           mes_de -> mês de emissão inicial ('mm/aaaa'), inclusive
+          mes_ate -> mês de emissão final ('mm/aaaa'), inclusive
+Retorno: dataframe com os CPF/CNPJs no índice, os tipos de certidão nas colunas e ''
+         onde não há certidão
+'''
+def ultimas_do_cubo(cubo, mes_de=None, mes_ate=None):
+
+    data = fatia_cubo(cubo, mes_de, mes_ate)
+
+    return monta_ultimas(data.groupby([CNPJ, 'class_short'])[RESULT].max())
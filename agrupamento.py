@@ -0,0 +1,256 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir, fase
+
+
+COL_NOME = 'Consultado (Nome)'
+COL_CNPJ = 'Consultado (CPF/CNPJ)'
+
+# Sufixos de natureza jurídica, que não distinguem uma razão social de outra
+SUFIXOS_EMPRESA = {'LTDA', 'SA', 'EIRELI', 'ME', 'EPP', 'MEI', 'CIA'}
+
+LIMIAR = 90       # similaridade mínima (0 a 100) entre nomes normalizados do mesmo grupo
+JANELA = 4        # vizinhos comparados na ordenação dos nomes (e dos nomes invertidos)
+MAX_BLOCO = 50    # palavras presentes em mais nomes que isso não geram candidatos
+
+
+'''
+Funcao auxiliar: normaliza_nome
+Finalidade: Normalizar um Nome/Razão Social para a comparação: sem acentos, maiúsculo, sem
+            pontuação, sem espaços repetidos e sem os sufixos de natureza jurídica
+Parâmetros:
+             nome -> Nome/Razão Social
+Retorno: nome normalizado
+'''
+def normaliza_nome(nome):
+    nome = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii').upper()
+    nome = re.sub(r'\bS\s*[/.]\s*A\b\.?', ' SA ', nome)
+    palavras = re.sub(r'[^A-Z0-9]+', ' ', nome).split()
+
+    return ' '.join(p for p in palavras if p not in SUFIXOS_EMPRESA)
+
+
+'''
+Funcao auxiliar: numeros_nome
+Finalidade: Extrair as palavras numéricas de um nome normalizado. Nomes com números diferentes
+            (ex.: 'POSTO 3' e 'POSTO 4') são de empresas diferentes, por mais parecidos que sejam
+Parâmetros:
+             nome -> nome normalizado
+Retorno: tupla com as palavras numéricas, na ordem
+'''
+def numeros_nome(nome):
+    return tuple(p for p in nome.split() if p.isdigit())
+
+
+'''
+Funcao auxiliar: pares_candidatos
+Finalidade: Gerar os pares de nomes que vale a pena comparar (blocagem), em vez de comparar todos
+            com todos: vizinhos na ordem alfabética, vizinhos na ordem dos nomes invertidos (pega
+            diferenças no começo do nome) e nomes que compartilham uma palavra pouco frequente
+Parâmetros:
+           nomes -> lista com os nomes normalizados distintos
+          janela -> quantidade de vizinhos comparados em cada ordenação
+       max_bloco -> palavras presentes em mais nomes que isso não geram candidatos
+Retorno: conjunto de tuplas (i, j), com i < j, de posições em nomes
+'''
+def pares_candidatos(nomes, janela=JANELA, max_bloco=MAX_BLOCO):
+    pares = set()
+
+    for chave in (lambda i: nomes[i], lambda i: nomes[i][::-1]):
+        ordem = sorted(range(len(nomes)), key=chave)
+        for pos, i in enumerate(ordem):
+            for j in ordem[pos + 1:pos + 1 + janela]:
+                pares.add((min(i, j), max(i, j)))
+
+    blocos = {}
+    for i, nome in enumerate(nomes):
+        for palavra in set(nome.split()):
+            blocos.setdefault(palavra, []).append(i)
+
+    for membros in blocos.values():
+        if 1 < len(membros) <= max_bloco:
+            for a in range(len(membros)):
+                for b in range(a + 1, len(membros)):
+                    pares.add((membros[a], membros[b]))
+
+    return pares
+
+
+'''
+Funcao: agrupa_nomes
+Finalidade: Agrupar todas as grafias de Nome/Razão Social de um dataset de uma vez: os nomes
+            distintos são normalizados, os pares candidatos (ver pares_candidatos) com
+            similaridade >= limiar e os mesmos números (ver numeros_nome) são unidos
+            (union-find) e cada grupo recebe um identificador
+            estável, o menor nome normalizado do grupo, que não depende da ordem das linhas
+Parâmetros:
+               df -> dataset com as certidões
+         col_nome -> coluna com o Nome/Razão Social
+         col_cnpj -> coluna com o CPF/CNPJ (ou a chave canônica, ver documentos)
+           limiar -> similaridade mínima (0 a 100) entre nomes normalizados do mesmo grupo
+           janela -> vizinhos comparados na ordenação dos nomes
+        max_bloco -> palavras presentes em mais nomes que isso não geram candidatos
+Retorno: tupla (nomes, grupos):
+         nomes  -> dataframe com cada Nome/Razão Social distinto, o nome normalizado e o Grupo
+         grupos -> dataframe por Grupo, com a quantidade de nomes e a lista ordenada dos CPF/CNPJs
+'''
+@medir
+def agrupa_nomes(df, col_nome=COL_NOME, col_cnpj=COL_CNPJ, limiar=LIMIAR, janela=JANELA, max_bloco=MAX_BLOCO):
+    from fuzzywuzzy import fuzz   # importado sob demanda, só é usado aqui
+
+    originais = pd.Series(df[col_nome].dropna().astype(str).unique())
+    normalizados = originais.map(normaliza_nome)
+    distintos = sorted(set(normalizados))
+
+    numeros = [numeros_nome(nome) for nome in distintos]
+    pai = list(range(len(distintos)))
+
+    def raiz(i):
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]   # compressão de caminho (pela metade)
+            i = pai[i]
+        return i
+
+    with fase('pares candidatos', linhas_entrada=len(distintos)) as f:
+        candidatos = pares_candidatos(distintos, janela, max_bloco)
+        f.linhas_saida = len(candidatos)
+
+    with fase('similaridade e união', linhas_entrada=len(candidatos)):
+        for i, j in candidatos:
+            ri, rj = raiz(i), raiz(j)
+            if (ri != rj) and (numeros[i] == numeros[j]) and (fuzz.ratio(distintos[i], distintos[j]) >= limiar):
+                pai[max(ri, rj)] = min(ri, rj)   # a raiz é sempre o menor nome do grupo
+
+    grupo_de = {nome: distintos[raiz(i)] for i, nome in enumerate(distintos)}
+    nomes = pd.DataFrame({col_nome: originais,
+                          'Nome Normalizado': normalizados,
+                          'Grupo': normalizados.map(grupo_de)})
+
+    mapa = dict(zip(nomes[col_nome], nomes['Grupo']))
+    com_cnpj = pd.DataFrame({'Grupo': df[col_nome].astype(object).map(mapa),
+                             col_cnpj: df[col_cnpj].astype(object)}).dropna()
+
+    grupos = nomes.groupby('Grupo').size().rename('Nomes').to_frame()
+    grupos['CPF/CNPJs'] = com_cnpj.groupby('Grupo')[col_cnpj].agg(lambda x: sorted(set(x))).reindex(grupos.index)
+    grupos['CPF/CNPJs'] = grupos['CPF/CNPJs'].map(lambda x: x if isinstance(x, list) else [])
+
+    return nomes, grupos.reset_index()
+
+
+'''
+Funcao: salva_grupos / carrega_grupos
+Finalidade: Gravar e ler a tabela de nomes agrupados (ver agrupa_nomes), para reaproveitar o
+            agrupamento em outras execuções sobre o mesmo dataset
+Parâmetros:
+            nomes -> tabela de nomes de agrupa_nomes
+          arquivo -> caminho do arquivo CSV
+Retorno: salva_grupos: o nome do arquivo; carrega_grupos: a tabela de nomes
+'''
+def salva_grupos(nomes, arquivo):
+    nomes.to_csv(arquivo, index=False)
+    return arquivo
+
+
+def carrega_grupos(arquivo):
+    return pd.read_csv(arquivo, dtype=str, keep_default_na=False)
+
+
+'''
+Funcao: erros_por_grupos
+Finalidade: Derivar as situações de validar_cnpj_razao a partir dos grupos de nomes, com uma
+            passada pelo dataset, sem comparar nomes linha a linha:
+            - CPF/CNPJ com nomes em mais de um grupo: nomes distintos, se a similaridade entre
+              os grupos for menor que threshold (mesmo critério de validar_cnpj_razao)
+            - certidão sem CPF/CNPJ: resolvida se o grupo do nome tem um CPF/CNPJ só, ambígua se
+              tem mais de um, e não identificável se não tem nenhum
+            A resolução é feita no fim (não durante a varredura), então não depende da ordem
+            das linhas
+Parâmetros:
+               df -> dataset com as certidões (os CPF/CNPJs resolvidos são preenchidos nele)
+            nomes -> tabela de nomes de agrupa_nomes (ou carrega_grupos)
+    col_reference -> coluna com o CPF/CNPJ usado na comparação
+     col_to_check -> coluna com o Nome/Razão Social
+    col_to_report -> coluna que será informada no caso de erro
+            exibe -> função que formata o CPF/CNPJ nas mensagens
+        threshold -> similaridade (0 a 100) a partir da qual grupos diferentes do mesmo CPF/CNPJ
+                     não são informados; None informa todos
+Retorno: tupla (urls, urls_ref, erros, atualizacoes), com atualizacoes = dicionário
+         índice da linha -> CPF/CNPJ resolvido
+'''
+@medir
+def erros_por_grupos(df, nomes, col_reference=COL_CNPJ, col_to_check=COL_NOME, col_to_report='Url', exibe=str,
+                     threshold=None):
+    from fuzzywuzzy import fuzz
+
+    urls, urls_ref, erros = [], [], []
+    atualizacoes = {}
+
+    dados = pd.DataFrame({'nome': df[col_to_check].astype(object),
+                          'cnpj': df[col_reference].astype(object),
+                          'url': df[col_to_report].astype(object)}, index=df.index)
+    dados['grupo'] = dados['nome'].map(dict(zip(nomes[col_to_check], nomes['Grupo'])))
+    com_nome = dados['nome'].notna() & (dados['nome'].astype(str) != '')
+
+    identificados = dados[dados['cnpj'].notna() & com_nome]
+    cnpjs_do_grupo = identificados.groupby('grupo')['cnpj'].agg(lambda x: sorted(set(x)))
+    url_ref = identificados.groupby(['grupo', 'cnpj'])['url'].max()
+
+    with fase('certidões com CPF/CNPJ', linhas_entrada=identificados.shape[0]) as f:
+        # CPF/CNPJ com mais de um grupo de nomes: cada certidão é comparada com os outros grupos
+        # do seu CPF/CNPJ (junção com um exemplo de nome e Url de cada grupo), na ordem das linhas
+        qtd_grupos = identificados.groupby('cnpj')['grupo'].transform('nunique')
+        multiplos = identificados[qtd_grupos > 1].reset_index(drop=True).rename_axis('ordem').reset_index()
+        exemplo = (identificados.groupby(['cnpj', 'grupo'])[['nome', 'url']].max().reset_index()
+                   .rename(columns={'grupo': 'outro_grupo', 'nome': 'outro_nome', 'url': 'outro_url'}))
+        pares = multiplos.merge(exemplo, on='cnpj')
+        pares = pares[pares['grupo'] != pares['outro_grupo']]
+
+        if threshold is not None:
+            # a similaridade é calculada uma vez por par de grupos, e não por certidão
+            a, b = pares['grupo'].to_numpy(), pares['outro_grupo'].to_numpy()
+            chaves = pd.Series(list(zip(np.where(a < b, a, b), np.where(a < b, b, a))), index=pares.index, dtype=object)
+            similares = {par: fuzz.WRatio(par[0], par[1]) >= threshold for par in set(chaves)}
+            pares = pares[~chaves.map(similares).astype(bool)]
+
+        pares = pares.sort_values(['ordem', 'outro_grupo'], kind='stable')
+        urls.extend(pares['url'].tolist())
+        urls_ref.extend(pares['outro_url'].tolist())
+        erros.extend(('Mesmo CPF/CNPJ com Nomes/Razão Social distintos: [ ' + pares['nome'].astype(str) +
+                      ' ] / [ ' + pares['outro_nome'].astype(str) + ' ]').tolist())
+        f.linhas_saida = pares.shape[0]
+
+    # Mesma numeração da mensagem de validar_cnpj_razao sem agrupamento: 1 quando o próprio nome
+    # já aparece com CPF/CNPJ, 2 quando os CPF/CNPJs vêm só de nomes parecidos
+    nomes_com_cnpj = set(identificados['nome'])
+
+    sem_cnpj = dados[dados['cnpj'].isna()]
+    with fase('certidões sem CPF/CNPJ', linhas_entrada=sem_cnpj.shape[0]):
+        for row in sem_cnpj.itertuples():
+            if pd.isna(row.nome) or (not row.nome):
+                urls.append(row.url)
+                urls_ref.append('')
+                erros.append('Certidão sem CPF/CNPJ e sem Nome/Razão Social')
+                continue
+
+            cnpjs = cnpjs_do_grupo.get(row.grupo, [])
+            if len(cnpjs) == 0:
+                urls.append(row.url)
+                urls_ref.append('')
+                erros.append('Certidão com Nome/Razão Social, mas sem CPF/CNPJ identificável [ ' + str(row.nome) + ' ]')
+            elif len(cnpjs) == 1:
+                urls.append(row.url)
+                urls_ref.append(url_ref[(row.grupo, cnpjs[0])])
+                erros.append('Certidão sem CPF/CNPJ, porém identificável e atualizado para [ ' + exibe(cnpjs[0]) + ' ]')
+                atualizacoes[row.Index] = cnpjs[0]
+            else:
+                numero = '1' if row.nome in nomes_com_cnpj else '2'
+                for cnpj in cnpjs:
+                    urls.append(row.url)
+                    urls_ref.append(url_ref[(row.grupo, cnpj)])
+                    erros.append('Certidão sem CPF/CNPJ, mas Nome/Razão social ' + numero + ' [ ' + str(row.nome) + ' ] pode pertencer ao CPF/CNPJ [ ' + exibe(cnpj) + ' ]')
+
+    return urls, urls_ref, erros, atualizacoes
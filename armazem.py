@@ -0,0 +1,434 @@
+import time
+import sqlite3
+
+import pandas as pd
+
+from instrumentacao import medir, fase
+from carregadores import get_main_dataset, get_positive_dataset, chave_cpf_cnpj
+from agregacao import SUFIXOS, TODOS_RESULTADOS, COLS_CUBO, monta_ultimas, mes_iso
+
+
+# Colunas dos datasets -> colunas das tabelas do armazém
+COLUNAS_CERTIDOES = {'Nome': 'nome',
+                     'Url': 'url',
+                     'Classificação': 'classificacao',
+                     'Resultado': 'resultado',
+                     'Consultado (CPF/CNPJ)': 'cnpj',
+                     'Consultado (Nome)': 'nome_consultado',
+                     'Emitido em': 'emitido_em',
+                     'Validade': 'validade'}
+
+COLUNAS_POSITIVOS = {'Nome': 'nome',
+                     'Classificação': 'classificacao',
+                     'Número do Processo': 'numero_processo'}
+
+# Tamanho padrão dos blocos de le_partes_armazem
+LINHAS_POR_PARTE = 100000
+
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS pastas (
+    pasta       TEXT PRIMARY KEY,
+    certidoes   INTEGER,
+    positivos   INTEGER,
+    ingerida_em TEXT
+);
+
+CREATE TABLE IF NOT EXISTS certidoes (
+    pasta           TEXT NOT NULL,
+    nome            TEXT,
+    url             TEXT,
+    classificacao   TEXT,
+    class_short     TEXT,
+    resultado       TEXT,
+    cnpj            TEXT,
+    chave           TEXT,
+    nome_consultado TEXT,
+    emitido_em      TEXT,
+    emissao         TEXT,
+    validade        TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_certidoes_pasta   ON certidoes (pasta);
+CREATE INDEX IF NOT EXISTS idx_certidoes_url     ON certidoes (url);
+CREATE INDEX IF NOT EXISTS idx_certidoes_chave   ON certidoes (chave, emissao);
+CREATE INDEX IF NOT EXISTS idx_certidoes_cnpj    ON certidoes (cnpj, class_short);
+CREATE INDEX IF NOT EXISTS idx_certidoes_emissao ON certidoes (emissao);
+
+CREATE TABLE IF NOT EXISTS positivos (
+    pasta           TEXT NOT NULL,
+    nome            TEXT,
+    classificacao   TEXT,
+    numero_processo TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_positivos_nome  ON positivos (nome);
+CREATE INDEX IF NOT EXISTS idx_positivos_pasta ON positivos (pasta);
+
+-- Cubo de contagens por pasta, CPF/CNPJ, tipo de certidão, Resultado e mês de emissão
+-- (ver agregacao.conta_cubo), mantido a cada pasta ingerida
+CREATE TABLE IF NOT EXISTS cubo (
+    pasta       TEXT NOT NULL,
+    cnpj        TEXT,
+    chave       TEXT,
+    class_short TEXT,
+    resultado   TEXT,
+    mes         TEXT,
+    qt          INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_cubo_pasta ON cubo (pasta);
+CREATE INDEX IF NOT EXISTS idx_cubo_mes   ON cubo (mes);
+'''
+
+
+'''
+Funcao: abre_armazem
+Finalidade: Abrir (criando, se não existir) o armazém local do histórico de certidões, um
+            banco SQLite com as certidões e os positivos de cada pasta baixada, indexados por
+            pasta, Url, CPF/CNPJ e data de emissão. Pastas ingeridas antes da existência do
+            cubo de contagens entram nele aqui (ver atualiza_cubo)
+Parâmetros:
+             name -> Nome do arquivo do banco
+             path -> Caminho do arquivo
+Retorno: conexão com o armazém
+'''
+def abre_armazem(name='certidoes.db', path=''):
+
+    con = sqlite3.connect(path + name)
+    con.executescript(ESQUEMA)
+    with con:
+        atualiza_cubo(con)
+
+    return con
+
+
+'''
+Funcao: pastas_ingeridas
+Finalidade: Listar as pastas que já estão no armazém
+Parâmetros:
+              con -> conexão com o armazém
+Retorno: dataframe com as pastas, quantidade de linhas e data da ingestão
+'''
+def pastas_ingeridas(con):
+    return pd.read_sql_query('SELECT * FROM pastas ORDER BY pasta', con)
+
+
+'''
+Funcao: ingere_pasta
+Finalidade: Carregar no armazém os arquivos de uma pasta já baixada (caso-<id>.xlsx e
+            positivos-caso-<id>.csv). Colunas que o armazém não conhece são ignoradas
+Parâmetros:
+           folder -> Número da pasta
+             path -> Caminho onde estão os arquivos
+       substituir -> Se a pasta já estiver no armazém, apaga e carrega de novo (True) ou
+                     mantém a que já está (False)
+Retorno: quantidade de certidões carregadas (0 se a pasta já estava no armazém)
+'''
+@medir
+def ingere_pasta(con, folder, path='', substituir=False):
+
+    pasta = str(folder)
+    existe = con.execute('SELECT 1 FROM pastas WHERE pasta = ?', (pasta,)).fetchone()
+    if existe and not substituir:
+        print(f'WARNING: pasta { pasta } já está no armazém, não carregando de novo.')
+        return 0
+
+    # Os arquivos são lidos antes de apagar a versão antiga: se a leitura falhar, a pasta
+    # continua no armazém como estava
+    df = get_main_dataset(folder, path=path)
+    dfp = get_positive_dataset(folder, path=path)
+
+    with fase('gravação no armazém', linhas_entrada=df.shape[0]):
+        tabela = pd.DataFrame({'pasta': pasta}, index=range(df.shape[0]))
+        for col, col_sql in COLUNAS_CERTIDOES.items():
+            tabela[col_sql] = df[col].to_numpy() if col in df.columns else None
+
+        tabela['class_short'] = tabela['classificacao'].str[0:4]
+        tabela['chave'] = chave_cpf_cnpj(tabela['cnpj']).astype(object).to_numpy()
+        tabela['emissao'] = pd.to_datetime(tabela['emitido_em'], format='%d/%m/%Y', errors='coerce').dt.strftime('%Y-%m-%d')
+
+        positivos = pd.DataFrame({'pasta': pasta}, index=range(dfp.shape[0]))
+        for col, col_sql in COLUNAS_POSITIVOS.items():
+            positivos[col_sql] = dfp[col].to_numpy() if col in dfp.columns else None
+
+        with con:   # substituição numa transação só: apaga e grava, ou nada
+            if existe:
+                for nome in ['certidoes', 'positivos', 'cubo', 'pastas']:
+                    con.execute('DELETE FROM ' + nome + ' WHERE pasta = ?', (pasta,))
+            insere_linhas(con, 'certidoes', tabela)
+            insere_linhas(con, 'positivos', positivos)
+            atualiza_cubo(con, pasta)
+            con.execute('INSERT INTO pastas VALUES (?, ?, ?, ?)',
+                        (pasta, df.shape[0], dfp.shape[0], time.strftime("%Y-%m-%d %H:%M:%S")))
+
+    return df.shape[0]
+
+
+'''
+Funcao auxiliar: insere_linhas
+Finalidade: Gravar as linhas de um dataframe numa tabela do armazém, dentro da transação de
+            quem chama. O to_sql do pandas faz commit ao terminar, o que deixaria uma
+            substituição pela metade gravada se um passo seguinte falhasse
+Parâmetros:
+              con -> conexão com o armazém
+             nome -> nome da tabela
+           tabela -> dataframe com as colunas da tabela (nulos viram NULL)
+Retorno: None
+'''
+def insere_linhas(con, nome, tabela):
+
+    valores = tabela.astype(object).where(tabela.notna(), None)
+    con.executemany('INSERT INTO ' + nome + ' (' + ', '.join(tabela.columns) + ') VALUES (' +
+                    ', '.join('?' * tabela.shape[1]) + ')', valores.itertuples(index=False, name=None))
+
+
+'''
+Funcao: atualiza_cubo
+Finalidade: Acrescentar ao cubo de contagens as pastas do armazém que ainda não estão nele. A
+            agregação é feita dentro do armazém, uma pasta por vez, sem recontar as demais.
+            Não faz commit: roda dentro da transação de quem chama (ex.: ingere_pasta)
+Parâmetros:
+              con -> conexão com o armazém
+           pastas -> Número da pasta, ou lista de pastas (padrão: todas as que faltam no cubo)
+Retorno: lista com as pastas acrescentadas
+'''
+def atualiza_cubo(con, pastas=None):
+
+    if pastas is None:
+        pastas = [p for (p,) in con.execute('SELECT pasta FROM pastas WHERE pasta NOT IN (SELECT DISTINCT pasta FROM cubo)')]
+    else:
+        pastas = [str(p) for p in (pastas if type(pastas) is list else [pastas])]
+
+    for pasta in pastas:
+        con.execute('INSERT INTO cubo '
+                    'SELECT pasta, cnpj, MAX(chave), class_short, resultado, substr(emissao, 1, 7), COUNT(*) '
+                    'FROM certidoes WHERE pasta = ? AND cnpj IS NOT NULL AND class_short IS NOT NULL '
+                    'GROUP BY pasta, cnpj, class_short, resultado, substr(emissao, 1, 7)', (pasta,))
+
+    return pastas
+
+
+'''
+Funcao auxiliar: monta_filtros
+Finalidade: Montar a cláusula WHERE (e seus parâmetros) a partir dos filtros das consultas
+Parâmetros:
+           pastas -> Número da pasta, ou lista de pastas
+             cnpj -> CPF/CNPJ, formatado ou não, ou lista deles
+        resultado -> Resultado, ou lista de Resultados
+    classificacao -> tipo de certidão (3 primeiros caracteres da Classificação), ou lista deles
+       emitido_de -> data de emissão inicial ('dd/mm/aaaa'), inclusive
+      emitido_ate -> data de emissão final ('dd/mm/aaaa'), inclusive
+           tabela -> apelido da tabela que qualifica as colunas (ex.: 'c' gera c.pasta), para consultas com JOIN
+Retorno: tupla (cláusula WHERE, lista de parâmetros)
+'''
+def monta_filtros(pastas=None, cnpj=None, resultado=None, classificacao=None, emitido_de=None, emitido_ate=None,
+                  tabela=None):
+
+    condicoes = []
+    parametros = []
+    q = (tabela + '.') if tabela else ''
+
+    def em(coluna, valores):
+        valores = valores if type(valores) is list else [valores]
+        condicoes.append(coluna + ' IN (' + ', '.join('?' * len(valores)) + ')')
+        parametros.extend(valores)
+
+    if pastas is not None:
+        em(q + 'pasta', [str(p) for p in (pastas if type(pastas) is list else [pastas])])
+    if cnpj is not None:
+        chaves = chave_cpf_cnpj(pd.Series(cnpj if type(cnpj) is list else [cnpj]))
+        em(q + 'chave', chaves.astype(object).dropna().tolist())
+    if resultado is not None:
+        em(q + 'resultado', resultado)
+    if classificacao is not None:
+        em('trim(' + q + 'class_short)', [str(c).strip() for c in (classificacao if type(classificacao) is list else [classificacao])])
+    if emitido_de is not None:
+        condicoes.append(q + 'emissao >= ?')
+        parametros.append(pd.to_datetime(emitido_de, format='%d/%m/%Y').strftime('%Y-%m-%d'))
+    if emitido_ate is not None:
+        condicoes.append(q + 'emissao <= ?')
+        parametros.append(pd.to_datetime(emitido_ate, format='%d/%m/%Y').strftime('%Y-%m-%d'))
+
+    where = (' WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+
+    return where, parametros
+
+
+'''
+Funcao: consulta_certidoes
+Finalidade: Obter do armazém só as certidões que atendem aos filtros, com as mesmas colunas
+            do dataset lido das planilhas (mais a coluna 'Pasta'), pronto para os validadores
+Parâmetros:
+              con -> conexão com o armazém
+          filtros -> ver monta_filtros (pastas, cnpj, resultado, classificacao, emitido_de, emitido_ate)
+Retorno: dataframe com as certidões
+'''
+@medir('consulta_certidoes')
+def consulta_certidoes(con, **filtros):
+
+    where, parametros = monta_filtros(**filtros)
+    colunas = ', '.join(col_sql + ' AS "' + col + '"' for col, col_sql in COLUNAS_CERTIDOES.items())
+
+    return pd.read_sql_query('SELECT ' + colunas + ', pasta AS "Pasta" FROM certidoes' + where + ' ORDER BY rowid',
+                             con, params=parametros)
+
+
+'''
+Funcao: le_partes_armazem
+Finalidade: Ler do armazém as certidões que atendem aos filtros em blocos de linhas, para o
+            processamento em partes (agregacao.processa_em_partes). Só um bloco fica em memória
+            por vez, qualquer que seja o tamanho do histórico
+Parâmetros:
+              con -> conexão com o armazém
+           linhas -> quantidade de certidões de cada bloco
+          filtros -> ver monta_filtros (pastas, cnpj, resultado, classificacao, emitido_de, emitido_ate)
+Retorno: gerador de tuplas (número do bloco, dataframe com as colunas de consulta_certidoes)
+'''
+def le_partes_armazem(con, linhas=LINHAS_POR_PARTE, **filtros):
+
+    where, parametros = monta_filtros(**filtros)
+    colunas = ', '.join(col_sql + ' AS "' + col + '"' for col, col_sql in COLUNAS_CERTIDOES.items())
+    blocos = pd.read_sql_query('SELECT ' + colunas + ', pasta AS "Pasta" FROM certidoes' + where + ' ORDER BY rowid',
+                               con, params=parametros, chunksize=linhas)
+
+    for numero, df in enumerate(blocos):
+        yield numero, df
+
+
+'''
+Funcao: consulta_positivos
+Finalidade: Obter do armazém as anotações positivas de um conjunto de pastas e/ou certidões
+Parâmetros:
+              con -> conexão com o armazém
+           pastas -> Número da pasta, ou lista de pastas (opcional)
+            nomes -> lista com os Nomes das certidões (opcional)
+Retorno: dataframe com as mesmas colunas do dataset de positivos
+'''
+def consulta_positivos(con, pastas=None, nomes=None):
+
+    where, parametros = monta_filtros(pastas=pastas)
+    if nomes is not None:
+        where += (' AND ' if where else ' WHERE ') + 'nome IN (SELECT value FROM json_each(?))'
+        parametros.append(pd.Series(list(nomes), dtype=object).to_json(orient='values'))
+
+    colunas = ', '.join(col_sql + ' AS "' + col + '"' for col, col_sql in COLUNAS_POSITIVOS.items())
+
+    return pd.read_sql_query('SELECT ' + colunas + ' FROM positivos' + where + ' ORDER BY rowid',
+                             con, params=parametros)
+
+
+'''
+Funcao: ultimas_certidoes_armazem
+Finalidade: Mesma planilha de ultimas_certidoes (maior Resultado por CPF/CNPJ e tipo de
+            certidão), mas com o agrupamento feito dentro do armazém
+Parâmetros:
+              con -> conexão com o armazém
+          filtros -> ver monta_filtros
+Retorno: dataframe com os CPF/CNPJs no índice, os tipos de certidão nas colunas e ''
+         onde não há certidão
+'''
+@medir('ultimas_certidoes_armazem')
+def ultimas_certidoes_armazem(con, **filtros):
+
+    where, parametros = monta_filtros(**filtros)
+    where += (' AND ' if where else ' WHERE ') + 'cnpj IS NOT NULL AND class_short IS NOT NULL'
+
+    ultimas = pd.read_sql_query('SELECT cnpj AS "Consultado (CPF/CNPJ)", class_short, MAX(resultado) AS "Resultado" '
+                                'FROM certidoes' + where + ' GROUP BY cnpj, class_short',
+                                con, params=parametros)
+
+    return monta_ultimas(ultimas.set_index(['Consultado (CPF/CNPJ)', 'class_short'])['Resultado'])
+
+
+'''
+Funcao: contagens_armazem
+Finalidade: Mesma agregação de conta_certidoes (quantidade de certidões por CPF/CNPJ e
+            tipo/resultado), mas com a contagem feita dentro do armazém
+Parâmetros:
+              con -> conexão com o armazém
+      show_result -> lista com os Resultados que entram no mapa
+          filtros -> ver monta_filtros
+Retorno: dataframe com os CPF/CNPJs no índice e uma coluna por tipo/resultado
+'''
+@medir('contagens_armazem')
+def contagens_armazem(con, show_result=TODOS_RESULTADOS, **filtros):
+
+    where, parametros = monta_filtros(resultado=show_result, **filtros)
+    where += ' AND cnpj IS NOT NULL AND class_short IS NOT NULL'
+
+    contagem = pd.read_sql_query('SELECT cnpj AS "Consultado (CPF/CNPJ)", class_short, resultado, COUNT(*) AS qt '
+                                 'FROM certidoes' + where + ' GROUP BY cnpj, class_short, resultado',
+                                 con, params=parametros)
+
+    contagem['classif_result'] = contagem['class_short'] + contagem['resultado'].map(SUFIXOS).fillna('PN')
+    tabela = contagem.groupby(['Consultado (CPF/CNPJ)', 'classif_result'])['qt'].sum().unstack(fill_value=0)
+    tabela.columns.name = None
+
+    return tabela.astype('int64')
+
+
+'''
+Funcao: duplicidades_armazem
+Finalidade: Fazer dentro do armazém o agrupamento de validar_duplicidade: só as certidões
+            que se repetem nas colunas verificadas (e os positivos delas) vêm para a memória
+Parâmetros:
+              con -> conexão com o armazém
+    cols_to_check -> lista com as colunas que devem ser verificadas
+           pastas -> Número da pasta, ou lista de pastas
+Retorno: tupla (certidões candidatas a duplicadas, positivos dessas certidões)
+'''
+@medir('duplicidades_armazem')
+def duplicidades_armazem(con, cols_to_check, pastas=None):
+
+    desconhecidas = [col for col in cols_to_check if col not in COLUNAS_CERTIDOES]
+    if desconhecidas:
+        raise ValueError('Colunas não disponíveis no armazém: ' + ', '.join(desconhecidas))
+
+    cols_sql = [COLUNAS_CERTIDOES[col] for col in cols_to_check]
+    where, parametros = monta_filtros(pastas=pastas)
+    where_c, _ = monta_filtros(pastas=pastas, tabela='c')
+
+    # "IS" compara nulos como iguais, como o duplicated do pandas
+    sql = ('SELECT ' + ', '.join('c.' + col_sql + ' AS "' + col + '"' for col, col_sql in COLUNAS_CERTIDOES.items()) +
+           ', c.pasta AS "Pasta" FROM certidoes c JOIN ('
+           'SELECT ' + ', '.join(cols_sql) + ' FROM certidoes' + where +
+           ' GROUP BY ' + ', '.join(cols_sql) + ' HAVING COUNT(*) > 1) d ON ' +
+           ' AND '.join('c.' + col + ' IS d.' + col for col in cols_sql) + where_c + ' ORDER BY c.rowid')
+
+    df = pd.read_sql_query(sql, con, params=parametros + parametros)
+    dfp = consulta_positivos(con, pastas=pastas, nomes=df.loc[df['Resultado'] == 'Positiva', 'Nome'].tolist())
+
+    return df, dfp
+
+
+'''
+Funcao: cubo_armazem
+Finalidade: Obter do armazém o cubo de contagens (mesmo formato de agregacao.conta_cubo), já
+            somado entre as pastas e restrito aos filtros. É pequeno: o mapa, os totais e as
+            últimas certidões de qualquer período saem dele (contagens_do_cubo, ultimas_do_cubo),
+            sem ler as certidões
+Parâmetros:
+              con -> conexão com o armazém
+           mes_de -> mês de emissão inicial ('mm/aaaa'), inclusive
+          mes_ate -> mês de emissão final ('mm/aaaa'), inclusive
+          filtros -> ver monta_filtros (pastas, cnpj, resultado, classificacao)
+Retorno: dataframe com as colunas de COLS_CUBO e a quantidade 'qt'
+'''
+@medir('cubo_armazem')
+def cubo_armazem(con, mes_de=None, mes_ate=None, **filtros):
+
+    where, parametros = monta_filtros(**filtros)
+    condicoes = [where[len(' WHERE '):]] if where else []
+    if mes_de is not None:
+        condicoes.append('mes >= ?')
+        parametros.append(mes_iso(mes_de))
+    if mes_ate is not None:
+        condicoes.append('mes <= ?')
+        parametros.append(mes_iso(mes_ate))
+    where = (' WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+
+    cubo = pd.read_sql_query('SELECT cnpj, class_short, resultado, mes, SUM(qt) AS qt FROM cubo' + where +
+                             ' GROUP BY cnpj, class_short, resultado, mes', con, params=parametros)
+    cubo.columns = COLS_CUBO + ['qt']
+
+    return cubo
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+import subprocess
+
+import matplotlib
+matplotlib.use('Agg')   # benchmark roda sem interface gráfica
+import matplotlib.pyplot as plt
+
+import validacoes as vl
+from carregadores import compacta_dataset
+from dados_sinteticos import gera_dataset_sintetico, gera_fornecedores_sinteticos, gera_pasta_sintetica
+
+
+TAMANHOS = [1000, 10000, 100000]
+TOLERANCIA = 0.20
+
+# Nenhum módulo do projeto pode carregar estas dependências só por ser importado
+MODULOS_PROJETO = ['validacoes', 'documentos', 'carregadores', 'processos', 'validadores', 'quase_duplicadas', 'correspondencia', 'agrupamento', 'agregacao', 'armazem', 'pontuacao', 'agendador', 'pipeline', 'diferencas', 'servico', 'graficos', 'visualizador']
+MODULOS_PESADOS = ['matplotlib', 'requests', 'fuzzywuzzy']
+LIMITE_IMPORTACAO = 1.5   # segundos
+
+
+'''
+Casos do benchmark: nome -> (função que recebe o contexto e executa o caso, maior tamanho suportado)
+O tamanho máximo evita que casos quadráticos (validar_cnpj_razao) ou muito lentos de preparar
+(leitura de Excel) dominem a execução
+'''
+CASOS = {
+    'validar_datas':       (lambda c: vl.validar_datas(c['df'], ['Emitido em'], save=False), None),
+    'checar_validade':     (lambda c: vl.checar_validade(c['df'], save=False), None),
+    'validar_duplicidade': (lambda c: vl.validar_duplicidade(c['df'], c['dfp'], c['cols_dup'], save=False), None),
+    'duplicidade_aproximada': (lambda c: vl.validar_duplicidade(c['df'], c['dfp'], c['cols_dup'], save=False, aproximada=True), None),
+    'validar_cnpj_razao':  (lambda c: vl.validar_cnpj_razao(c['df'].copy(), save=False), 10000),
+    'cnpj_razao_normalizado': (lambda c: vl.validar_cnpj_razao(c['df'].copy(), save=False, normalizar=True), 10000),
+    'cnpj_razao_agrupado': (lambda c: vl.validar_cnpj_razao(c['df'].copy(), save=False, normalizar=True, agrupar=True), None),
+    'mapa_do_cubo':        (lambda c: vl.gera_mapa_certidoes(None, save=False, plotar=False, cubo=c['cubo']), None),
+    'validar_cpf_cnpj':    (lambda c: vl.validar_cpf_cnpj(c['df'], save=False), None),
+    'get_main_dataset':    (lambda c: vl.get_main_dataset(1, path=c['pasta']), 100000),
+    'get_positive_dataset': (lambda c: vl.get_positive_dataset(1, path=c['pasta']), 100000),
+    'mask_map':            (lambda c: vl.mask_map(c['sheet'], c['sheet'].columns.tolist(), totais=False), None),
+    'suppliers_score':     (lambda c: vl.suppliers_score(c['df_cadastrados'], c['fornecedores'], c['special_scores'], save=False), None),
+    'pontua_30_cenarios':  (lambda c: vl.pontua_cenarios(vl.prepara_pontuacao(c['df_cadastrados'], c['fornecedores']),
+                                                         {str(k): c['special_scores'] for k in range(30)}), None),
+}
+
+
+'''
+Funcao auxiliar: prepara_contexto
+Finalidade: Gerar os dados sintéticos usados por todos os casos de um tamanho
+Parâmetros:
+         n_linhas -> quantidade de certidões
+            casos -> casos que serão executados (a pasta em disco só é gravada se necessário)
+         tmp_path -> diretório temporário para a pasta sintética
+         compacto -> usa o dataset compacto (colunas categóricas) nos casos em memória
+Retorno: dicionário com os dados de entrada dos casos
+'''
+def prepara_contexto(n_linhas, casos, tmp_path, compacto=False):
+    fornecedores = gera_fornecedores_sinteticos(max(n_linhas // 20, 1))
+    df, dfp = gera_dataset_sintetico(n_linhas, fornecedores)
+
+    if compacto:
+        df = compacta_dataset(df)
+        dfp = compacta_dataset(dfp, colunas=['Nome', 'Classificação'])
+
+    contexto = {'df': df,
+                'dfp': dfp,
+                'fornecedores': fornecedores,
+                'special_scores': vl.read_parameters(path=os.path.dirname(os.path.abspath(__file__)) + os.sep),
+                'cols_dup': ['Classificação', 'Resultado', 'Consultado (CPF/CNPJ)', 'Emitido em', 'Validade'],
+                'pasta': tmp_path + os.sep}
+
+    # suppliers_score exige que todo CPF/CNPJ esteja no cadastro de fornecedores
+    contexto['df_cadastrados'] = df[df['Consultado (CPF/CNPJ)'].isin(fornecedores['CNPJ_CPF'])]
+
+    if 'mapa_do_cubo' in casos:
+        contexto['cubo'] = vl.conta_cubo(df)
+
+    if 'mask_map' in casos:
+        contexto['sheet'] = vl.gera_sheet_certidoes(df, save=False, plotar=False)
+
+    if ('get_main_dataset' in casos) or ('get_positive_dataset' in casos):
+        gera_pasta_sintetica(1, n_linhas, fornecedores, path=contexto['pasta'])
+
+    return contexto
+
+
+'''
+Funcao: executa_benchmark
+Finalidade: Medir cada caso em cada tamanho, com repetições
+Parâmetros:
+         tamanhos -> lista com as quantidades de certidões
+            casos -> lista com os nomes dos casos (padrão: todos)
+       repeticoes -> quantidade de execuções de cada caso; é registrada a mediana
+         compacto -> usa o dataset compacto (colunas categóricas) nos casos em memória
+Retorno: dicionário {caso: {tamanho: segundos}}
+'''
+def executa_benchmark(tamanhos=TAMANHOS, casos=None, repeticoes=3, compacto=False):
+    if casos is None:
+        casos = list(CASOS.keys())
+
+    resultados = {caso: {} for caso in casos}
+
+    for n in tamanhos:
+        with tempfile.TemporaryDirectory() as tmp_path:
+            ativos = [caso for caso in casos if (CASOS[caso][1] is None) or (n <= CASOS[caso][1])]
+            contexto = prepara_contexto(n, ativos, tmp_path, compacto)
+
+            for caso in ativos:
+                tempos = []
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    CASOS[caso][0](contexto)
+                    tempos.append(time.perf_counter() - inicio)
+                    plt.close('all')
+
+                resultados[caso][str(n)] = statistics.median(tempos)
+                print(f'{caso:<22} {n:>9} linhas  {resultados[caso][str(n)]:10.4f} s')
+
+    return resultados
+
+
+'''
+Funcao: compara_benchmark
+Finalidade: Comparar uma execução com uma execução de referência e apontar regressões
+Parâmetros:
+            atual -> resultados da execução atual
+       referencia -> resultados da execução de referência
+       tolerancia -> aumento relativo de tempo aceito antes de considerar regressão
+Retorno: lista de tuplas (caso, tamanho, tempo referência, tempo atual) com as regressões
+'''
+def compara_benchmark(atual, referencia, tolerancia=TOLERANCIA):
+    regressoes = []
+    for caso, tempos in atual.items():
+        for n, tempo in tempos.items():
+            ref = referencia.get(caso, {}).get(n)
+            if (ref is not None) and (tempo > ref * (1 + tolerancia)):
+                regressoes.append((caso, n, ref, tempo))
+
+    return regressoes
+
+
+'''
+Funcao: mede_importacao
+Finalidade: Medir, em um processo novo, o tempo de importação de um módulo do projeto e
+            quais dependências pesadas ele carregou
+Parâmetros:
+           modulo -> nome do módulo
+       repeticoes -> quantidade de processos; é registrado o menor tempo
+Retorno: tupla (segundos, lista de dependências pesadas carregadas)
+'''
+def mede_importacao(modulo, repeticoes=3):
+    codigo = ('import sys, time, json\n'
+              't = time.perf_counter()\n'
+              'import ' + modulo + '\n'
+              't = time.perf_counter() - t\n'
+              'print(json.dumps({"tempo": t, "pesados": [m for m in ' + repr(MODULOS_PESADOS) +
+              ' if m in sys.modules]}))\n')
+
+    tempos = []
+    pesados = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+        medida = json.loads(saida.stdout.strip().splitlines()[-1])
+        tempos.append(medida['tempo'])
+        pesados = medida['pesados']
+
+    return min(tempos), pesados
+
+
+'''
+Funcao: verifica_importacao
+Finalidade: Garantir que os módulos do projeto continuam leves para importar
+Parâmetros:
+           limite -> tempo máximo de importação aceito, em segundos
+Retorno: lista com as mensagens de problemas encontrados (vazia se estiver tudo certo)
+'''
+def verifica_importacao(limite=LIMITE_IMPORTACAO):
+    problemas = []
+    for modulo in MODULOS_PROJETO:
+        tempo, pesados = mede_importacao(modulo)
+        print(f'import {modulo:<22} {tempo:10.4f} s')
+
+        if pesados:
+            problemas.append(f'{modulo} importa dependências pesadas: {", ".join(pesados)}')
+        if tempo > limite:
+            problemas.append(f'{modulo} demora {tempo:.4f} s para importar (limite {limite:.4f} s)')
+
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dos validadores com dados sintéticos')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS)
+    parser.add_argument('--casos', nargs='+', choices=list(CASOS.keys()), default=None)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--compacto', action='store_true', help='usa o dataset compacto (categórico)')
+    parser.add_argument('--salvar', default='', help='grava os resultados neste arquivo JSON')
+    parser.add_argument('--comparar', default='', help='compara com os resultados deste arquivo JSON')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--importacao', action='store_true',
+                        help='só verifica o tempo de importação dos módulos do projeto')
+    parser.add_argument('--limite-importacao', type=float, default=LIMITE_IMPORTACAO)
+    args = parser.parse_args(argv)
+
+    if args.importacao:
+        problemas = verifica_importacao(args.limite_importacao)
+        for problema in problemas:
+            print('REGRESSÃO: ' + problema)
+
+        return 1 if problemas else 0
+
+    resultados = executa_benchmark(args.tamanhos, args.casos, args.repeticoes, args.compacto)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arq:
+            json.dump(resultados, arq, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arq:
+            referencia = json.load(arq)
+
+        regressoes = compara_benchmark(resultados, referencia, args.tolerancia)
+        for caso, n, ref, tempo in regressoes:
+            print(f'REGRESSÃO: {caso} com {n} linhas: {ref:.4f} s -> {tempo:.4f} s')
+
+        if regressoes:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
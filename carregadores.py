@@ -0,0 +1,258 @@
+import os
+
+import pandas as pd
+import numpy as np
+
+from instrumentacao import medir
+from documentos import COL_CHAVE, normaliza_digitos
+
+
+# Colunas com poucos valores distintos, que ficam categóricas no dataset compacto
+COLUNAS_CATEGORICAS = ['Resultado', 'Classificação', 'Consultado (CPF/CNPJ)', 'Consultado (Nome)',
+                       'Emitido em', 'Validade']
+
+
+@medir
+def get_excel_from_tcd(auth_token: str, url: str, folders_: 1, path='', agendador=None):
+    '''
+    This function downloads the excel from the TCD prod server.
+
+    Args:
+
+        - auth_token: Authentication token for the TCD server.
+        - agendador: Request scheduler (rate limit, retries); defaults to the shared one.
+    '''
+    folders = []
+    if type(folders_) is not list:
+        folders.append(folders_)
+    else:
+        folders = folders_.copy()
+
+    if (path != '') and (not os.path.exists(path)):
+        try:
+            os.mkdir(path)
+        except OSError:
+            print ("Creation of the directory %s failed" % path)
+        else:
+            print ("Successfully created the directory %s " % path)
+
+    for folder_id in folders:
+        
+        EXCEL_FILE = 'caso-'+str(folder_id)+'.xlsx'
+        if os.path.exists(path+EXCEL_FILE):
+
+            print(f'WARNING: requested file { str(folder_id) } already exists, not downloading again.')
+            continue
+
+        print(f'Downoading data [ {str(folder_id)} ] from TCD site ...')
+
+        baixa_arquivo(auth_token, url, folder_id, 'xlsx', path+EXCEL_FILE, agendador)
+
+
+@medir
+def get_positive_excel_from_tcd(auth_token: str, url: str, folders_: 1, path='', agendador=None):
+    '''
+    This function downloads the excel from the TCD prod server.
+
+    Args:
+
+        - auth_token: Authentication token for the TCD server.
+        - agendador: Request scheduler (rate limit, retries); defaults to the shared one.
+    '''
+    folders = []
+    if type(folders_) is not list:
+        folders.append(folders_)
+    else:
+        folders = folders_.copy()
+    
+    if (path != '') and (not os.path.exists(path)):
+        try:
+            os.mkdir(path)
+        except OSError:
+            print ("Creation of the directory %s failed" % path)
+            return
+        else:
+            print ("Successfully created the directory %s " % path)
+
+    for folder_id in folders:
+
+        POSITIVE_FILE = 'positivos-caso-'+str(folder_id)+'.csv'
+        if os.path.exists(path+POSITIVE_FILE):
+
+            print(f'WARNING: requested file { str(folder_id) } already exists, not downloading again.')
+            continue
+        
+        print(f'Downoading positive data { str(folder_id) } from TCD site ...')
+
+        baixa_arquivo(auth_token, url, folder_id, 'csv', path+POSITIVE_FILE, agendador)
+
+
+'''
+Funcao auxiliar: baixa_arquivo
+Finalidade: Baixar um arquivo de uma pasta do servidor do TCD e gravá-lo em disco
+Parâmetros:
+       auth_token -> Token de autenticação no servidor do TCD
+              url -> Endereço do serviço
+        folder_id -> Número da pasta
+          formato -> Formato do arquivo ('xlsx' para as certidões, 'csv' para os positivos)
+          arquivo -> Caminho completo do arquivo a ser gravado
+        agendador -> Agendador das requisições (padrão: o compartilhado, ver agendador.py), que
+                     aplica timeout, limite de taxa e novas tentativas
+Retorno: True se o arquivo foi baixado e gravado, False caso contrário
+'''
+def baixa_arquivo(auth_token, url, folder_id, formato, arquivo, agendador=None):
+    from agendador import agendador_padrao
+
+    agendador = agendador or agendador_padrao()
+
+    querystring = {"folder":str(folder_id),"format":formato}
+
+    payload = ""
+    headers = {'Authorization': f'Token {auth_token}'}
+
+    try:
+        response = agendador.requisita("GET", url, data=payload,
+                                       headers=headers, params=querystring)
+    except Exception as e:
+        print(f'WARNING: download of folder [ {str(folder_id)} ] ({formato}) failed: {e}')
+        return False
+
+    if response.status_code == 200:
+        print('Download succeeded! Writing file ...')
+        open(arquivo,'wb').write(response.content)
+        return True
+
+    print(f'WARNING: download of folder [ {str(folder_id)} ] ({formato}) failed with status {response.status_code}')
+    return False
+
+
+'''
+Funcao auxiliar: chave_cpf_cnpj
+Finalidade: Gerar a chave de CPF/CNPJ só com dígitos, com tamanho fixo (11 para CPF, 14 para CNPJ).
+            O cálculo é feito sobre os valores distintos da coluna, e não linha a linha
+Parâmetros:
+            serie -> coluna com os CPF/CNPJs, formatados ou não
+Retorno: coluna categórica com as chaves (nula quando não há dígitos)
+'''
+def chave_cpf_cnpj(serie):
+    cat = serie.astype('category').cat
+
+    chaves = normaliza_digitos(cat.categories)
+
+    # Várias grafias podem levar à mesma chave: reaproveita os códigos já calculados
+    codigos_chave, chaves_unicas = pd.factorize(chaves, sort=True)
+    codigos = cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, codigos_chave[codigos], -1)
+
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=chaves_unicas, ordered=True),
+                     index=serie.index, name=COL_CHAVE)
+
+
+'''
+Funcao auxiliar: categoriza
+Finalidade: Converter uma coluna texto em categórica. As categorias ficam ordenadas
+            alfabeticamente, para que max/min/ordenação deem o mesmo resultado da coluna texto
+Parâmetros:
+            serie -> coluna a ser convertida
+Retorno: coluna categórica
+'''
+def categoriza(serie):
+    valores = serie.dropna().unique()
+    try:
+        return serie.astype(pd.CategoricalDtype(sorted(valores), ordered=True))
+    except TypeError: # tipos misturados (ex.: textos e datas), não dá para ordenar
+        return serie.astype('category')
+
+
+'''
+Funcao: compacta_dataset
+Finalidade: Reduzir a memória ocupada por um dataset de certidões ou de positivos: colunas
+            repetitivas viram categóricas (os nomes ficam armazenados uma única vez) e é criada
+            a chave de CPF/CNPJ só com dígitos. Os validadores e gráficos funcionam direto
+            sobre o dataset compacto
+Parâmetros:
+               df -> dataset carregado (é alterado e devolvido)
+          colunas -> colunas que sempre viram categóricas
+    cardinalidade -> demais colunas texto viram categóricas se a razão entre valores
+                     distintos e linhas for menor que este limite
+         col_cnpj -> coluna com o CPF/CNPJ, usada para gerar a chave
+Retorno: o próprio dataset, compactado
+'''
+def compacta_dataset(df, colunas=COLUNAS_CATEGORICAS, cardinalidade=0.5, col_cnpj='Consultado (CPF/CNPJ)'):
+
+    if col_cnpj in df.columns:
+        df[COL_CHAVE] = chave_cpf_cnpj(df[col_cnpj])
+
+    for col in df.columns:
+        if (df[col].dtype != object) or (df.shape[0] == 0):
+            continue
+
+        if (col in colunas) or (df[col].nunique() / df.shape[0] < cardinalidade):
+            df[col] = categoriza(df[col])
+
+    return df
+
+
+@medir
+def get_main_dataset(folders_, path='', compacto=False, armazem=None):
+
+    folders = []
+    if type(folders_) is not list:
+        folders.append(folders_)
+    else:
+        folders = folders_.copy()
+
+    if armazem is not None: # lê do armazém local, sem abrir as planilhas
+        from armazem import consulta_certidoes
+        df = consulta_certidoes(armazem, pastas=folders)
+    else:
+        dfs = []
+
+        for folder_id in folders:
+
+            EXCEL_FILE = path+'caso-'+str(folder_id)+'.xlsx'
+            dfs.append(pd.read_excel(EXCEL_FILE))
+
+        df = pd.concat(dfs) if dfs else pd.DataFrame()
+
+    if compacto:
+        df = compacta_dataset(df)
+
+    return df
+
+
+@medir
+def get_positive_dataset(folders_, path='', compacto=False, armazem=None):
+
+    folders = []
+    if type(folders_) is not list:
+        folders.append(folders_)
+    else:
+        folders = folders_.copy()
+
+    if armazem is not None: # lê do armazém local, sem abrir os CSVs
+        from armazem import consulta_positivos
+        dfp = consulta_positivos(armazem, pastas=folders)
+    else:
+        dfps = []
+
+        for folder_id in folders:
+
+            POSITIVE_FILE = path+'positivos-caso-'+str(folder_id)+'.csv'
+            dfps.append(pd.read_csv(POSITIVE_FILE))
+
+        dfp = pd.concat(dfps) if dfps else pd.DataFrame()
+
+    if compacto:
+        dfp = compacta_dataset(dfp, colunas=['Nome', 'Classificação'])
+
+    return dfp
+
+
+@medir
+def read_parameters(name='special-scores.xlsx', path=''):
+
+    EXCEL_FILE = path + name
+    df = pd.read_excel(EXCEL_FILE)
+
+    return df
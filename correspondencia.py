@@ -0,0 +1,228 @@
+import pandas as pd
+
+import time
+
+from instrumentacao import medir, fase
+from documentos import COL_CHAVE, COL_VALIDO, documentos_cpf_cnpj, formata_documento
+
+
+'''
+Funcao: validar_cnpj_razao
+Finalidade: Verificar se os nomes/razões sociais das certidões estão de acordo com os CPF/CNPJs
+Parâmetros: 
+               df -> dataset que se deseja verificar 
+    col_reference -> Coluna que será usada como base
+    cols_to_check -> Coluna que desejamos checar a consistência com a coluna de referência
+    col_to_report -> coluna que será informada no caso de erro
+        threshold -> percentual de similaridade a partir do qual uma razao social 
+                     será considerada igual a outra
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+       normalizar -> Normaliza os CPF/CNPJs (só dígitos, com zeros à esquerda) e confere os dígitos
+                     verificadores antes da comparação dos nomes. Grafias diferentes do mesmo
+                     documento passam a ser o mesmo CPF/CNPJ, os inválidos são reportados e tratados
+                     como certidão sem CPF/CNPJ, e o df devolvido ganha a coluna 'Chave CPF/CNPJ'
+          agrupar -> Agrupa os nomes de uma vez (ver agrupamento.agrupa_nomes) e deriva as
+                     situações dos grupos, em vez de comparar os nomes linha a linha. O resultado
+                     não depende da ordem das linhas. threshold vale só entre grupos diferentes
+                     do mesmo CPF/CNPJ
+           grupos -> tabela de nomes já agrupados (agrupa_nomes ou carrega_grupos), para
+                     reaproveitar um agrupamento salvo; implica agrupar=True
+
+Situações inválidas:
+1) Razão Social inconsistente: Razão social da certidão é bem diferente da
+   esperada para aquele CPF/CNPJ
+2) Nome/Razão Social sem CPF/CNPJ identificado: Certidão veio com Nome/Razão 
+   social, mas sem CPF/CNPJ possível de ser identificado
+3) Certidão sem CPF/CNPJ e sem Nome/Razão Social: Certidão sem CPF/CNPJ e sem 
+   Nome/Razão social
+4) Certidão sem CPF/CNPJ, porém identificável e atualizado para: A certidão 
+   veio sem CPF/CNPJ, mas foi possível encontrar um com base no Nome/Razão social
+5) Certidão sem CPF/CNPJ, mas Nome/Razão social [xxx] pode pertencer ao 
+   CPF/CNPJ [xxx]:  A certidão veio sem CPF/CNPJ, e além disso sua razão social
+   pode pertencer a mais de um CPF/CNPJ
+6) CPF/CNPJ inválido (só com normalizar=True): tamanho ou dígitos verificadores
+   não conferem
+
+Retorno: dataframe com as linhas e mensagem
+'''
+@medir
+def validar_cnpj_razao( df, 
+                        col_reference='Consultado (CPF/CNPJ)', 
+                        col_to_check='Consultado (Nome)', 
+                        col_to_report='Url', 
+                        threshold=60, 
+                        folder='',
+                        save=True, 
+                        path='',
+                        normalizar=False,
+                        agrupar=False,
+                        grupos=None):
+
+    from fuzzywuzzy import process   # importado sob demanda, só é usado aqui
+
+    urls = []
+    urls_ref = []
+    erros = []
+
+    col_original = col_reference
+    exibe = str
+    if normalizar: # a comparação passa a ser feita pela chave canônica, só dos CPF/CNPJs válidos
+        with fase('normalização CPF/CNPJ', linhas_entrada=df.shape[0]) as f:
+            docs = documentos_cpf_cnpj(df[col_original])
+            invalidos = docs[COL_CHAVE].notna() & ~docs[COL_VALIDO]
+            df[COL_CHAVE] = docs[COL_CHAVE].astype(object).where(docs[COL_VALIDO])
+            f.linhas_saida = int(invalidos.sum())
+
+        # No dataset compacto a coluna é categórica, e o CPF/CNPJ formatado que é gravado nela
+        # abaixo pode não ser uma das categorias
+        if isinstance(df[col_original].dtype, pd.CategoricalDtype):
+            df[col_original] = df[col_original].astype(object)
+
+        for url, valor in zip(df.loc[invalidos, col_to_report], df.loc[invalidos, col_original]):
+            urls.append(url)
+            urls_ref.append('')
+            erros.append('CPF/CNPJ inválido [ ' + str(valor) + ' ]')
+
+        col_reference = COL_CHAVE
+        exibe = formata_documento
+
+    if agrupar or (grupos is not None):
+        from agrupamento import agrupa_nomes, erros_por_grupos
+
+        if grupos is None:
+            grupos, _ = agrupa_nomes(df, col_to_check, col_reference)
+
+        resultado = erros_por_grupos(df, grupos, col_reference, col_to_check, col_to_report, exibe, threshold)
+        urls += resultado[0]
+        urls_ref += resultado[1]
+        erros += resultado[2]
+        for idx, cnpj in resultado[3].items():
+            df.loc[idx, col_reference] = cnpj
+            if normalizar:
+                df.loc[idx, col_original] = exibe(cnpj)
+
+        erros_df = pd.DataFrame.from_dict({'Url': urls, 'Mensagem': erros, 'Url Referência': urls_ref})
+
+        if (save) and (erros_df.shape[0] > 0):
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            save_to = path + 'Certidões com CPF ou CNPJ Inconsistente Folder [ ' + folder + ' ] - ' + timestr + '.xlsx'
+            erros_df.to_excel(save_to, sheet_name='Erros')
+
+        return df, erros_df
+
+    cols = df.columns.to_list()
+    col_ref_idx = cols.index(col_reference) + 1
+    col_che_idx = cols.index(col_to_check) + 1
+    col_rep_idx = cols.index(col_to_report) + 1
+
+    df_sem = df[df[col_reference].isna()]
+    df_com = df[~df[col_reference].isna()]
+
+    ###### Processa certidões COM CPF/CNPJ
+    #    1) SEM RAZÃO SOCIAL -> ok
+    #    2) COM RAZÃO SOCIAL -> verificar se aquele CPF/CNPJ possui mais de uma razão social diferente de nula
+    #     2.1) Se não possuir -> ok
+    #     2.2) Se possuir -> Erro
+
+    # Nomes de cada CPF/CNPJ, calculados uma vez só (na ordem em que aparecem), e pontuação fuzzy
+    # reaproveitada entre as certidões com o mesmo CPF/CNPJ e o mesmo Nome/Razão
+    nomes_por_cnpj = df.dropna(subset=[col_to_check]).groupby(col_reference, observed=True, sort=False)[col_to_check].unique()
+    similares_por_nome = {}
+
+    with fase('certidões com CPF/CNPJ', linhas_entrada=df_com.shape[0]):
+        for row in df_com.itertuples(): 
+            if pd.isna(row[col_che_idx]) or (not row[col_che_idx]): # Sem Nome/Razão = OK
+                continue
+            else: # Se tiver Nome/Razão, verificar se tem outros Nomes/Razões diferentes para o mesmo CPF/CNPJ
+                chave = (row[col_ref_idx], row[col_che_idx])
+                if chave not in similares_por_nome:
+                    nomes = nomes_por_cnpj[row[col_ref_idx]]
+                    with fase('pontuação fuzzy'):
+                        similares_por_nome[chave] = process.extract(row[col_che_idx], nomes, limit=len(nomes))
+                nomes_similares = similares_por_nome[chave]
+                for nome in nomes_similares:
+                    if nome[1] < threshold: # Tem razão social, mas é bem diferente da atual
+                        url_ref = df[df[col_to_check] == nome[0]][df[col_reference] == row[col_ref_idx]]['Url'].max()
+                        urls.append(row[col_rep_idx])
+                        urls_ref.append(url_ref)
+                        erros.append('Mesmo CPF/CNPJ com Nomes/Razão Social distintos: [ '+row[col_che_idx]+' ] / [ '+nome[0]+' ]')
+                        #erros.append('Razão Social inconsistente: Encontrado [ '+row[col_che_idx]+' ] Esperado [ '+nome[0]+' ]')
+                        continue
+
+    ###### Processa certidões SEM CPF/CNPJ
+    #    1) SEM RAZÃO SOCIAL -> ERRO
+    #    2) COM RAZAO SOCIAL -> Checar quais CPF/CNPJs, diferentes de nulo, com razão social igual
+    #     2.1) Se não existir nenhuma outra certidão com a mesma razão social com CPF/CNPJ válido:
+    #      2.1.1) Procurar CPF/CNPJs, diferentes de nulo, de razoes sociais parecidas
+    #       2.1.1.1) Se não existir -> ERRO (Certidão sem CPF/CNPJ identificável)
+    #       2.1.1.2) Se só existir apenas um, então associo o CPN/CNPJ à certidão
+    #       2.1.1.3) Se existir mais de um CNPJ -> ERRO 
+    #     2.2) Se só existir apenas um, então associo o CPN/CNPJ à certidão, porque ele tem a mesma
+    #          razão social
+    #     2.3) Se existir mais de um CNPJ para a mesma razão social -> ERRO 
+
+    nomes_geral = df[col_to_check].dropna().unique()
+    tam_nomes_geral = len(nomes_geral)
+
+    with fase('certidões sem CPF/CNPJ', linhas_entrada=df_sem.shape[0]):
+        for row in df_sem.itertuples(): # Processa certidões SEM CPF/CNPJ
+            if pd.isna(row[col_che_idx]) or (not row[col_che_idx]): # Sem Nome/Razão = Erro
+                urls.append(row[col_rep_idx])
+                urls_ref.append('')
+                erros.append('Certidão sem CPF/CNPJ e sem Nome/Razão Social')
+           
+            else: # Se tiver Nome/Razão, verificar se tem outros Nomes/Razões diferentes
+                cnpjs = df.loc[lambda x: x[col_to_check] == row[col_che_idx]][col_reference].dropna().unique()
+                if len(cnpjs) == 1:
+                    url_ref = df[df[col_to_check] == row[col_che_idx]][df[col_reference] == cnpjs[0]]['Url'].max()
+                    urls.append(row[col_rep_idx])
+                    urls_ref.append(url_ref)
+                    erros.append('Certidão sem CPF/CNPJ, porém identificável e atualizado para [ ' + exibe(cnpjs[0]) + ' ]')
+                    df.loc[row[0], col_reference] = cnpjs[0]
+                    if normalizar:
+                        df.loc[row[0], col_original] = exibe(cnpjs[0])
+                elif len(cnpjs) > 1:
+                    for cnpj in cnpjs:
+                        url_ref = df[df[col_to_check] == row[col_che_idx]][df[col_reference] == cnpj]['Url'].max()
+                        urls.append(row[col_rep_idx])
+                        urls_ref.append(url_ref)
+                        erros.append('Certidão sem CPF/CNPJ, mas Nome/Razão social 1 [ ' + row[col_che_idx] + ' ] pode pertencer ao CPF/CNPJ [ ' + exibe(cnpj) + ' ]')
+                else: # Não há outra certidão com a mesma razao social. Verificar por razões semelhantes
+                    with fase('pontuação fuzzy'):
+                        similaridade = process.extract(row[col_che_idx], nomes_geral, limit=tam_nomes_geral)
+                    nomes_similares = []
+                    # Monta lista com as razões sociais semelhantes
+                    for nome in similaridade:
+                        if nome[1] >= threshold:
+                            nomes_similares.append(nome[0])
+
+                    cnpjs = df[df[col_to_check].isin(nomes_similares)][col_reference].dropna().unique()
+                    if len(cnpjs) == 0:
+                        urls.append(row[col_rep_idx])
+                        urls_ref.append('')
+                        erros.append('Certidão com Nome/Razão Social, mas sem CPF/CNPJ identificável [ ' + row[col_che_idx] + ' ]')
+                    elif len(cnpjs) == 1:
+                        url_ref = df[df[col_to_check] == row[col_che_idx]][df[col_reference] == cnpjs[0]]['Url'].max()
+                        urls.append(row[col_rep_idx])
+                        urls_ref.append('')
+                        erros.append('Certidão sem CPF/CNPJ, porém identificável e atualizado para [ ' + exibe(cnpjs[0]) + ' ]')
+                        df.loc[row[0], col_reference] = cnpjs[0]
+                        if normalizar:
+                            df.loc[row[0], col_original] = exibe(cnpjs[0])
+                    elif len(cnpjs) > 1:
+                        for cnpj in cnpjs:
+                            url_ref = df[df[col_to_check].isin(nomes_similares)][df[col_reference] == cnpj]['Url'].max()
+                            urls.append(row[col_rep_idx])
+                            urls_ref.append(url_ref)
+                            erros.append('Certidão sem CPF/CNPJ, mas Nome/Razão social 2 [ ' + row[col_che_idx] + ' ] pode pertencer ao CPF/CNPJ [ ' + exibe(cnpj) + ' ]')
+
+    erros_df = pd.DataFrame.from_dict({'Url': urls, 'Mensagem': erros, 'Url Referência': urls_ref}) 
+
+    if (save) and (erros_df.shape[0] > 0):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        save_to = path + 'Certidões com CPF ou CNPJ Inconsistente Folder [ ' + folder + ' ] - ' + timestr + '.xlsx'
+        erros_df.to_excel(save_to, sheet_name='Erros')
+
+    return df, erros_df
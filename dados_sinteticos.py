@@ -0,0 +1,343 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from datetime import date, timedelta
+
+
+CLASSIFICACOES = ['100 - Certidão Negativa de Débitos Federais',
+                  '110 - Certificado de Regularidade do FGTS',
+                  '120 - Certidão Negativa de Débitos Trabalhistas',
+                  '160 - Certidão da Justiça Federal',
+                  '170 - Certidão de Distribuição Cível',
+                  '200 - Certidão de Débitos Estaduais',
+                  '240 - Certidão de Protestos',
+                  '270 - Certidão de Falência e Recuperação Judicial',
+                  '300 - Certidão de Débitos Municipais',
+                  '310 - Certidão de Débitos Imobiliários']
+
+RESULTADOS = ['Negativa', 'Positiva', 'Pos./Neg.']
+PROB_RESULTADOS = [0.70, 0.15, 0.15]
+
+PALAVRAS_NOMES = ['COMERCIO', 'INDUSTRIA', 'TRANSPORTES', 'SERVICOS', 'GASES', 'QUIMICA',
+                  'ENGENHARIA', 'LOGISTICA', 'EQUIPAMENTOS', 'BRASIL', 'NORDESTE', 'PAULISTA',
+                  'MINERACAO', 'METALURGICA', 'CONSTRUTORA', 'TECNOLOGIA', 'ALIMENTOS', 'AGRO']
+SUFIXOS_NOMES = ['LTDA', 'S/A', 'EIRELI', 'ME', 'LTDA EPP']
+
+PESOS_CNPJ = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+DIAS_EMISSAO = 720   # emissões sorteadas nos últimos DIAS_EMISSAO dias
+DIAS_VALIDADE = [30, 60, 90, 180]
+MESES_VALIDADE = [3, 6, 12]
+
+
+'''
+Funcao auxiliar: digitos_cnpj
+Finalidade: Calcular os dígitos verificadores de CNPJs, de forma vetorizada
+Parâmetros:
+            bases -> np.array (n x 12) com os 12 primeiros dígitos de cada CNPJ
+Retorno: np.array (n x 14) com os CNPJs completos
+'''
+def digitos_cnpj(bases):
+    d1 = (bases * PESOS_CNPJ).sum(axis=1) % 11
+    d1 = np.where(d1 < 2, 0, 11 - d1)
+    com_d1 = np.column_stack([bases, d1])
+    d2 = (com_d1 * np.concatenate([[6], PESOS_CNPJ])).sum(axis=1) % 11
+    d2 = np.where(d2 < 2, 0, 11 - d2)
+    return np.column_stack([com_d1, d2])
+
+
+'''
+Funcao auxiliar: formata_cnpjs
+Finalidade: Formatar CNPJs (99.999.999/9999-99) de forma vetorizada, montando os caracteres
+            numa matriz (n x 18) e lendo cada linha como uma string
+Parâmetros:
+          digitos -> np.array (n x 14) com os dígitos dos CNPJs
+Retorno: np.array de strings com os CNPJs formatados
+'''
+def formata_cnpjs(digitos):
+    chars = np.empty((digitos.shape[0], 18), dtype='U1')
+    chars[:, [2, 6]] = '.'
+    chars[:, 10] = '/'
+    chars[:, 15] = '-'
+    chars[:, [0, 1, 3, 4, 5, 7, 8, 9, 11, 12, 13, 14, 16, 17]] = digitos.astype('U1')
+    return chars.view('U18').ravel()
+
+
+'''
+Funcao auxiliar: como_matriz
+Finalidade: Ver strings como uma matriz de caracteres (uma linha por string, completada com
+            caracteres nulos), para que edições por posição sejam feitas sem laço por linha
+Parâmetros:
+          valores -> sequência de strings
+Retorno: np.array (n x maior comprimento) de caracteres; volta a strings com .view('U<m>').ravel()
+'''
+def como_matriz(valores):
+    strings = np.asarray(valores, dtype=str)
+    largura = max(strings.dtype.itemsize // 4, 1)
+    return strings.astype('U' + str(largura)).view('U1').reshape(len(strings), largura)
+
+
+'''
+Funcao: gera_fornecedores_sinteticos
+Finalidade: Gerar um cadastro de fornecedores sintético, no formato de suppliers.xlsx
+Parâmetros:
+    n_fornecedores -> quantidade de fornecedores
+              seed -> semente do gerador aleatório
+Retorno: dataframe com as colunas CNPJ_CPF, Classificação, Terceiro e Razao Social
+'''
+def gera_fornecedores_sinteticos(n_fornecedores, seed=0):
+    rng = np.random.default_rng(seed)
+
+    bases = rng.integers(0, 10, size=(n_fornecedores, 12))
+    bases[:, 8:11] = 0   # filial 0001, como na maioria dos cadastros
+    bases[:, 11] = 1
+    cnpjs = formata_cnpjs(digitos_cnpj(bases)).astype(object)
+
+    palavras = rng.choice(PALAVRAS_NOMES, size=(n_fornecedores, 2)).astype(object)
+    sufixos = rng.choice(SUFIXOS_NOMES, size=n_fornecedores).astype(object)
+    nomes = palavras[:, 0] + ' ' + palavras[:, 1] + ' ' + sufixos + ' ' + np.arange(n_fornecedores).astype(str).astype(object)
+
+    return pd.DataFrame({'CNPJ_CPF': cnpjs,
+                         'Classificação': rng.choice(['A', 'B', 'C'], size=n_fornecedores, p=[0.3, 0.4, 0.3]),
+                         'Terceiro': rng.choice([0, 1], size=n_fornecedores, p=[0.7, 0.3]),
+                         'Razao Social': nomes})
+
+
+'''
+Funcao auxiliar: ruido_nomes
+Finalidade: Gerar variações de grafia de nomes/razões sociais (caixa, pontuação, letra
+            faltando, espaços), um tipo de ruído sorteado por nome
+Parâmetros:
+            nomes -> np.array com os nomes originais
+              rng -> gerador aleatório do numpy
+Retorno: np.array com os nomes com ruído
+'''
+def ruido_nomes(nomes, rng):
+    serie = pd.Series(nomes, dtype=object)
+    tipo = rng.integers(0, 4, size=len(serie))
+    comprimentos = serie.str.len().to_numpy()
+    tipo[(tipo == 2) & (comprimentos <= 4)] = 3
+
+    ruidos = pd.Series('  ', index=serie.index, dtype=object) + serie + ' '
+    ruidos[tipo == 0] = serie[tipo == 0].str.title()
+    ruidos[tipo == 1] = serie[tipo == 1].str.replace(' LTDA', ' LTDA.', regex=False).str.replace(' S/A', ' SA', regex=False)
+
+    # Letra faltando: desloca para a esquerda os caracteres a partir de uma posição sorteada
+    faltando = np.nonzero(tipo == 2)[0]
+    if len(faltando) > 0:
+        chars = como_matriz(serie.to_numpy()[faltando])
+        chars = np.column_stack([chars, np.full(len(faltando), '', dtype='U1')])
+        pos = rng.integers(1, comprimentos[faltando] - 1)
+        colunas = np.arange(chars.shape[1] - 1)
+        origem = colunas + (colunas >= pos[:, None])
+        chars = np.take_along_axis(chars, origem, axis=1)
+        ruidos[faltando] = np.ascontiguousarray(chars).view('U' + str(chars.shape[1])).ravel()
+
+    return ruidos.to_numpy()
+
+
+'''
+Funcao: gera_dataset_sintetico
+Finalidade: Gerar um dataset de certidões e o respectivo dataset de anotações positivas,
+            com as mesmas colunas das pastas baixadas do TCD e com ruído realista
+            (validades em dias, meses ou datas, campos vazios, CNPJs e nomes com ruído,
+            datas inválidas e certidões duplicadas)
+Parâmetros:
+         n_linhas -> quantidade de certidões
+      fornecedores -> cadastro de fornecedores (se vazio, é gerado um, com n_linhas/20 fornecedores)
+           folder -> número da pasta, usado nas Urls e nomes dos arquivos
+             seed -> semente do gerador aleatório
+Retorno: tupla (df, dfp) com as certidões e as anotações positivas
+'''
+def gera_dataset_sintetico(n_linhas, fornecedores=None, folder=1, seed=0):
+    rng = np.random.default_rng(seed)
+
+    if fornecedores is None:
+        fornecedores = gera_fornecedores_sinteticos(max(n_linhas // 20, 1), seed=seed)
+
+    n = n_linhas
+    forn = rng.integers(0, fornecedores.shape[0], size=n)
+    cnpjs = fornecedores['CNPJ_CPF'].to_numpy()[forn].astype(object)
+    nomes = fornecedores['Razao Social'].to_numpy()[forn].astype(object)
+
+    # Ruído nos CPF/CNPJs: sem pontuação, vazios ou com um dígito trocado
+    sorteio = rng.random(n)
+    sem_pontuacao = sorteio < 0.05
+    cnpjs[sem_pontuacao] = pd.Series(cnpjs[sem_pontuacao], dtype=object).str.replace(r'\D', '', regex=True).to_numpy()
+    trocados = np.nonzero((sorteio >= 0.05) & (sorteio < 0.07))[0]
+    if len(trocados) > 0:
+        chars = como_matriz(cnpjs[trocados])
+        pos = rng.choice([0, 1, 3, 4, 5, 7, 8, 9], size=len(trocados))
+        linhas = np.arange(len(trocados))
+        chars[linhas, pos] = ((chars[linhas, pos].astype(int) + 1) % 10).astype('U1')
+        cnpjs[trocados] = chars.view('U' + str(chars.shape[1])).ravel()
+    cnpjs[(sorteio >= 0.07) & (sorteio < 0.10)] = np.nan
+
+    # Ruído nos nomes: variações de grafia ou vazios
+    sorteio = rng.random(n)
+    com_ruido = sorteio < 0.10
+    nomes[com_ruido] = ruido_nomes(nomes[com_ruido], rng)
+    nomes[(sorteio >= 0.10) & (sorteio < 0.12)] = np.nan
+
+    classificacoes = rng.choice(CLASSIFICACOES, size=n)
+    resultados = rng.choice(RESULTADOS, size=n, p=PROB_RESULTADOS)
+
+    # As datas são formatadas uma vez por dia possível (tabela indexada pelo deslocamento em
+    # relação a hoje), e não uma vez por certidão
+    hoje = date.today()
+    max_dias = max(DIAS_VALIDADE)
+    datas = np.array([(hoje + timedelta(days=d)).strftime('%d/%m/%Y')
+                      for d in range(-DIAS_EMISSAO, max_dias + 1)], dtype=object)
+    dias_atras = rng.integers(0, DIAS_EMISSAO, size=n)
+    emitido_em = datas[DIAS_EMISSAO - dias_atras]
+
+    # Validades: 'NN dias', 'NN meses', datas ou vazias
+    tipo_val = rng.choice(4, size=n, p=[0.35, 0.25, 0.30, 0.10])
+    qt_dias = rng.choice(DIAS_VALIDADE, size=n)
+    qt_meses = rng.choice(MESES_VALIDADE, size=n)
+    validades = np.select([tipo_val == 0, tipo_val == 1, tipo_val == 2],
+                          [qt_dias.astype(str).astype(object) + ' dias',
+                           qt_meses.astype(str).astype(object) + ' meses',
+                           datas[DIAS_EMISSAO - dias_atras + qt_dias]],
+                          default=np.nan).astype(object)
+
+    # Emissões inválidas ou vazias só aparecem sem validade, como nas pastas reais
+    sorteio = rng.random(n)
+    invalidas = (sorteio < 0.01)
+    emitido_em[invalidas] = '31/02/2020'
+    vazias = (sorteio >= 0.01) & (sorteio < 0.02)
+    emitido_em[vazias] = np.nan
+    validades[invalidas | vazias] = np.nan
+
+    ids = np.arange(n).astype(str).astype(object)
+    df = pd.DataFrame({'Nome': 'certidao-' + str(folder) + '-' + ids + '.pdf',
+                       'Url': 'https://tcd.local/certidoes/' + str(folder) + '/' + ids,
+                       'Classificação': classificacoes,
+                       'Resultado': resultados,
+                       'Consultado (CPF/CNPJ)': cnpjs,
+                       'Consultado (Nome)': nomes,
+                       'Emitido em': emitido_em,
+                       'Validade': validades})
+
+    # Certidões duplicadas: mesma certidão baixada mais de uma vez, com outra Url
+    n_dup = n // 50
+    if n_dup > 0:
+        dup = df.iloc[rng.integers(0, n, size=n_dup)].copy()
+        ids_dup = np.arange(n, n + n_dup).astype(str).astype(object)
+        dup['Nome'] = 'certidao-' + str(folder) + '-' + ids_dup + '.pdf'
+        dup['Url'] = 'https://tcd.local/certidoes/' + str(folder) + '/' + ids_dup
+        df = pd.concat([df.iloc[:n - n_dup], dup], ignore_index=True)
+
+    # Anotações positivas: um ou mais processos por certidão positiva
+    positivas = df[df['Resultado'] == 'Positiva']
+    qt_proc = rng.integers(1, 4, size=positivas.shape[0])
+    nomes_p = np.repeat(positivas['Nome'].to_numpy(), qt_proc)
+    class_p = np.repeat(positivas['Classificação'].to_numpy(), qt_proc)
+    seq = rng.integers(0, 10**7, size=nomes_p.shape[0])
+    ano = rng.integers(2005, hoje.year + 1, size=nomes_p.shape[0])
+    processos = (pd.Series(seq).astype(str).str.zfill(7) + '-' + pd.Series(seq % 97).astype(str).str.zfill(2)
+                 + '.' + pd.Series(ano).astype(str) + '.8.26.' + pd.Series(seq % 10000).astype(str).str.zfill(4))
+    dfp = pd.DataFrame({'Nome': nomes_p,
+                        'Classificação': class_p,
+                        'Número do Processo': processos})
+
+    return df, dfp
+
+
+'''
+Funcao: gera_pasta_sintetica
+Finalidade: Gravar uma pasta sintética no mesmo formato dos arquivos baixados do TCD
+            (caso-<id>.xlsx e positivos-caso-<id>.csv)
+Parâmetros:
+           folder -> número da pasta
+         n_linhas -> quantidade de certidões (o Excel comporta até 1.048.575 linhas)
+     fornecedores -> cadastro de fornecedores (opcional)
+             seed -> semente do gerador aleatório
+             path -> Caminho para salvar os arquivos
+Retorno: tupla (df, dfp) com os dados gravados
+'''
+def gera_pasta_sintetica(folder, n_linhas, fornecedores=None, seed=0, path=''):
+
+    if (path != '') and (not os.path.exists(path)):
+        os.makedirs(path)
+
+    df, dfp = gera_dataset_sintetico(n_linhas, fornecedores, folder=folder, seed=seed)
+
+    df.to_excel(path + 'caso-' + str(folder) + '.xlsx', index=False)
+    dfp.to_csv(path + 'positivos-caso-' + str(folder) + '.csv', index=False)
+
+    return df, dfp
+
+
+'''
+Funcao: inicia_servidor_sintetico
+Finalidade: Subir, numa thread, um servidor HTTP local que imita o servidor do TCD, servindo os
+            arquivos de uma pasta sintética (?folder=<id>&format=xlsx|csv). Serve para testar os
+            downloads e o agendador sem acessar o servidor real: pode simular latência,
+            limite de requisições por segundo (429 com Retry-After) e falhas 503
+Parâmetros:
+             path -> Caminho onde estão os arquivos (ver gera_pasta_sintetica)
+            porta -> porta do servidor (0 escolhe uma livre)
+           atraso -> latência de cada resposta, em segundos
+ limite_por_segundo -> requisições aceitas por segundo; acima disso responde 429 (None = sem limite)
+      retry_after -> valor do cabeçalho Retry-After das respostas 429, em segundos
+       taxa_falha -> fração das requisições que respondem 503
+Retorno: tupla (servidor, url). Para parar: servidor.shutdown()
+'''
+def inicia_servidor_sintetico(path='', porta=0, atraso=0.0, limite_por_segundo=None, retry_after=1,
+                              taxa_falha=0.0):
+    import time
+    import random
+    import threading
+    from urllib.parse import urlsplit, parse_qs
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    estado = {'segundo': 0, 'quantidade': 0, 'respostas': {}}
+    trava = threading.Lock()
+
+    class Tratador(BaseHTTPRequestHandler):
+        def responde(self, status, conteudo=b'', cabecalhos=None):
+            with trava:
+                estado['respostas'][status] = estado['respostas'].get(status, 0) + 1
+            self.send_response(status)
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.send_header('Content-Length', str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def do_GET(self):
+            if limite_por_segundo is not None:
+                with trava:
+                    agora = int(time.monotonic())
+                    if agora != estado['segundo']:
+                        estado['segundo'], estado['quantidade'] = agora, 0
+                    estado['quantidade'] += 1
+                    excedeu = estado['quantidade'] > limite_por_segundo
+                if excedeu:
+                    return self.responde(429, cabecalhos={'Retry-After': str(retry_after)})
+
+            time.sleep(atraso)
+            if random.random() < taxa_falha:
+                return self.responde(503)
+
+            query = parse_qs(urlsplit(self.path).query)
+            folder = query.get('folder', [''])[0]
+            formato = query.get('format', [''])[0]
+            arquivo = path + ('caso-' + folder + '.xlsx' if formato == 'xlsx' else 'positivos-caso-' + folder + '.csv')
+            if not os.path.exists(arquivo):
+                return self.responde(404)
+
+            with open(arquivo, 'rb') as f:
+                self.responde(200, f.read())
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), Tratador)
+    servidor.respostas = estado['respostas']
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    return servidor, 'http://127.0.0.1:' + str(servidor.server_address[1]) + '/'
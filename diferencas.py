@@ -0,0 +1,324 @@
+import os
+import re
+import glob
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir, fase
+from armazem import insere_linhas
+
+
+COLS_EXECUCAO = ['Regra', 'Pasta', 'Url', 'Mensagem', 'Url Referência']
+
+# Planilha que cada validador grava (ver validadores, documentos e correspondencia), por regra
+PLANILHAS = {'duplicidade': 'Certidões Duplicadas',
+             'datas': 'Certidões com Datas Erradas',
+             'validade': 'Certidões com Validade Errada',
+             'cpf_cnpj': 'Certidões com CPF ou CNPJ Inválido',
+             'cnpj_razao': 'Certidões com CPF ou CNPJ Inconsistente'}
+
+LIMITE_EXCEL = 1048575   # linhas de uma aba do Excel, sem o cabeçalho
+
+ESQUEMA_EXECUCOES = '''
+CREATE TABLE IF NOT EXISTS execucoes (
+    execucao  TEXT PRIMARY KEY,
+    criada_em TEXT,
+    erros     INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS erros_execucao (
+    execucao       TEXT NOT NULL,
+    regra          TEXT,
+    pasta          TEXT,
+    url            TEXT,
+    mensagem       TEXT,
+    url_referencia TEXT,
+    chave          INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_erros_execucao ON erros_execucao (execucao);
+
+CREATE TABLE IF NOT EXISTS pastas_execucao (
+    execucao TEXT NOT NULL,
+    pasta    TEXT
+);
+'''
+
+
+'''
+Funcao auxiliar: chave_erros
+Finalidade: Calcular a chave de cada erro, um hash de 64 bits de (Regra, Pasta, Url, Mensagem), que
+            é o que identifica o mesmo erro em execuções diferentes. A comparação entre execuções é
+            feita só sobre as chaves (junção por hash), sem comparar textos
+Parâmetros:
+          consolidado -> dataframe com as colunas Regra, Pasta, Url e Mensagem
+Retorno: np.array (int64) com as chaves
+'''
+def chave_erros(consolidado):
+    colunas = consolidado[['Regra', 'Pasta', 'Url', 'Mensagem']].astype(str)
+    return pd.util.hash_pandas_object(colunas, index=False).to_numpy().view(np.int64)
+
+
+'''
+Funcao auxiliar: pastas_validadas
+Finalidade: Obter as pastas validadas numa execução. Uma pasta validada sem nenhum erro não tem
+            linhas no consolidado, por isso as pastas ficam registradas em attrs['pastas']; sem
+            esse registro (dataframe montado à mão, execução gravada antes dele), usa as pastas
+            que aparecem nos erros
+Parâmetros:
+      consolidado -> dataframe consolidado (ver consolida_erros)
+Retorno: conjunto com os números das pastas, como texto
+'''
+def pastas_validadas(consolidado):
+    if 'pastas' in consolidado.attrs:
+        return set(consolidado.attrs['pastas'])
+
+    return set(str(p) for p in consolidado['Pasta'].unique())
+
+
+'''
+Funcao: consolida_erros
+Finalidade: Juntar os dataframes de erros de uma execução dos validadores (um por regra) em um
+            conjunto só, com a chave de cada erro (ver chave_erros). Erros repetidos dentro da
+            mesma execução contam uma vez. A pasta fica registrada como validada (ver
+            pastas_validadas), mesmo sem erros
+Parâmetros:
+            erros -> dicionário regra -> dataframe de erros (ex.: resultado de valida_pasta)
+           folder -> Número da pasta dos erros
+Retorno: dataframe com as colunas de COLS_EXECUCAO e a Chave
+'''
+def consolida_erros(erros, folder=''):
+
+    partes = []
+    for regra, tabela in erros.items():
+        if (tabela is None) or (tabela.shape[0] == 0):
+            continue
+        partes.append(pd.DataFrame({'Regra': regra,
+                                    'Pasta': str(folder),
+                                    'Url': tabela['Url'].astype(object).to_numpy(),
+                                    'Mensagem': tabela['Mensagem'].astype(object).to_numpy(),
+                                    'Url Referência': (tabela['Url Referência'].astype(object).to_numpy()
+                                                       if 'Url Referência' in tabela.columns else '')}))
+
+    if not partes:
+        consolidado = pd.DataFrame(columns=COLS_EXECUCAO + ['Chave'])
+    else:
+        consolidado = pd.concat(partes, ignore_index=True)
+        consolidado['Url Referência'] = consolidado['Url Referência'].fillna('')
+        consolidado['Chave'] = chave_erros(consolidado)
+        consolidado = consolidado.drop_duplicates('Chave', ignore_index=True)
+
+    consolidado.attrs['pastas'] = [str(folder)]
+    return consolidado
+
+
+'''
+Funcao: consolida_pipeline
+Finalidade: Consolidar os erros de várias pastas de uma vez (ver consolida_erros), no formato
+            devolvido por executa_pipeline (pasta -> dicionário regra -> erros). Pastas que
+            falharam (exceção ou mensagem no lugar dos erros) ficam de fora, com aviso; as
+            demais ficam registradas como validadas, mesmo sem erros
+Parâmetros:
+       resultados -> dicionário pasta -> dicionário regra -> dataframe de erros
+Retorno: dataframe consolidado
+'''
+def consolida_pipeline(resultados):
+
+    partes = []
+    pastas = []
+    for folder_id, erros in resultados.items():
+        if not isinstance(erros, dict):
+            print('WARNING: pasta ' + str(folder_id) + ' sem resultado de validação, fora da comparação: ' + str(erros))
+            continue
+        partes.append(consolida_erros(erros, folder_id))
+        pastas.append(str(folder_id))
+
+    consolidado = pd.concat(partes, ignore_index=True) if partes else consolida_erros({})
+    consolidado.attrs['pastas'] = pastas
+    return consolidado
+
+
+'''
+Funcao: le_planilhas_erros
+Finalidade: Montar o conjunto de erros de uma execução a partir das planilhas que os validadores
+            gravam (ex.: 'Certidões com Validade Errada Folder [ 1 ] - <timestamp>.xlsx'). De cada
+            regra é usada a planilha mais recente, até o instante informado
+Parâmetros:
+           folder -> Número da pasta
+             path -> Caminho onde estão as planilhas
+              ate -> timestamp máximo das planilhas ('aaaammdd-hhmmss'), para reconstituir uma
+                     execução anterior (padrão: as mais recentes)
+Retorno: dataframe consolidado (ver consolida_erros)
+'''
+@medir
+def le_planilhas_erros(folder, path='', ate=None):
+
+    erros = {}
+    for regra, prefixo in PLANILHAS.items():
+        padrao = path + glob.escape(prefixo + ' Folder [ ' + str(folder) + ' ] - ') + '*.xlsx'
+        arquivos = []
+        for arquivo in glob.glob(padrao):
+            instante = re.search(r'(\d{8}-\d{6})\.xlsx$', arquivo)
+            if instante and ((ate is None) or (instante.group(1) <= ate)):
+                arquivos.append((instante.group(1), arquivo))
+
+        if arquivos:
+            erros[regra] = pd.read_excel(max(arquivos)[1], sheet_name='Erros', dtype=str, keep_default_na=False)
+
+    return consolida_erros(erros, folder)
+
+
+'''
+Funcao: grava_execucao
+Finalidade: Guardar no armazém o conjunto de erros consolidado de uma execução, com as pastas
+            validadas (ver pastas_validadas)
+Parâmetros:
+              con -> conexão com o armazém (ver abre_armazem)
+      consolidado -> dataframe consolidado (ver consolida_erros)
+         execucao -> identificação da execução (padrão: o instante atual, 'aaaammdd-hhmmss')
+Retorno: identificação da execução gravada
+'''
+@medir
+def grava_execucao(con, consolidado, execucao=None):
+
+    execucao = execucao or time.strftime("%Y%m%d-%H%M%S")
+    con.executescript(ESQUEMA_EXECUCOES)
+
+    tabela = pd.DataFrame({'execucao': execucao,
+                           'regra': consolidado['Regra'].to_numpy(),
+                           'pasta': consolidado['Pasta'].astype(str).to_numpy(),
+                           'url': consolidado['Url'].to_numpy(),
+                           'mensagem': consolidado['Mensagem'].to_numpy(),
+                           'url_referencia': consolidado['Url Referência'].to_numpy(),
+                           'chave': consolidado['Chave'].to_numpy()})
+
+    with con:
+        con.execute('DELETE FROM erros_execucao WHERE execucao = ?', (execucao,))
+        con.execute('DELETE FROM pastas_execucao WHERE execucao = ?', (execucao,))
+        con.execute('DELETE FROM execucoes WHERE execucao = ?', (execucao,))
+        insere_linhas(con, 'erros_execucao', tabela)
+        con.executemany('INSERT INTO pastas_execucao VALUES (?, ?)',
+                        [(execucao, pasta) for pasta in sorted(pastas_validadas(consolidado))])
+        con.execute('INSERT INTO execucoes VALUES (?, ?, ?)',
+                    (execucao, time.strftime("%Y-%m-%d %H:%M:%S"), tabela.shape[0]))
+
+    return execucao
+
+
+'''
+Funcao: execucoes_gravadas / carrega_execucao
+Finalidade: Listar as execuções guardadas no armazém / ler o conjunto de erros de uma delas
+Parâmetros:
+              con -> conexão com o armazém
+         execucao -> identificação da execução
+Retorno: dataframe com as execuções / dataframe consolidado (ver consolida_erros)
+'''
+def execucoes_gravadas(con):
+    con.executescript(ESQUEMA_EXECUCOES)
+    return pd.read_sql_query('SELECT * FROM execucoes ORDER BY execucao', con)
+
+
+def carrega_execucao(con, execucao):
+    con.executescript(ESQUEMA_EXECUCOES)
+    consolidado = pd.read_sql_query('SELECT regra, pasta, url, mensagem, url_referencia, chave '
+                                    'FROM erros_execucao WHERE execucao = ?', con, params=[execucao])
+    consolidado.columns = COLS_EXECUCAO + ['Chave']
+
+    pastas = [linha[0] for linha in con.execute('SELECT pasta FROM pastas_execucao WHERE execucao = ?', (execucao,))]
+    if pastas:   # execuções gravadas antes do registro das pastas ficam sem ele
+        consolidado.attrs['pastas'] = pastas
+
+    return consolidado
+
+
+'''
+Funcao: compara_execucoes
+Finalidade: Comparar os erros de duas execuções: novos (só na atual), resolvidos (só na anterior)
+            e mantidos (nas duas). A comparação é uma junção por hash sobre as chaves dos erros,
+            e escala para milhões de linhas
+Parâmetros:
+         anterior -> dataframe consolidado da execução anterior
+            atual -> dataframe consolidado da execução atual
+    pastas_comuns -> Compara só as pastas validadas nas duas execuções (True), para que uma pasta
+                     que não foi validada de novo não apareça com todos os erros resolvidos. Uma
+                     pasta validada de novo sem nenhum erro entra (ver pastas_validadas)
+           folder -> Identificação do relatório no nome do arquivo
+             save -> O relatório deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o relatório
+Retorno: tupla (delta, resumo):
+         delta  -> dataframe com os erros novos e resolvidos (coluna 'Situação')
+         resumo -> quantidades de erros Novos, Resolvidos e Mantidos por Regra e Pasta
+'''
+@medir
+def compara_execucoes(anterior, atual, pastas_comuns=True, folder='', save=False, path=''):
+
+    if pastas_comuns:
+        pastas_anterior = pastas_validadas(anterior)
+        pastas_atual = pastas_validadas(atual)
+        comuns = pastas_anterior & pastas_atual
+        fora = sorted((pastas_anterior | pastas_atual) - comuns)
+        if fora:
+            print('WARNING: pastas presentes em só uma das execuções, fora da comparação: ' + ', '.join(fora))
+            anterior = anterior[anterior['Pasta'].astype(str).isin(comuns)]
+            atual = atual[atual['Pasta'].astype(str).isin(comuns)]
+
+    with fase('junção por hash', linhas_entrada=anterior.shape[0] + atual.shape[0]) as f:
+        na_anterior = atual['Chave'].isin(anterior['Chave'].to_numpy()).to_numpy()
+        na_atual = anterior['Chave'].isin(atual['Chave'].to_numpy()).to_numpy()
+
+        f.linhas_saida = int((~na_anterior).sum() + (~na_atual).sum())
+
+    # Só as diferenças vão para o relatório; os mantidos entram apenas nas contagens
+    delta = pd.concat([atual.loc[~na_anterior, COLS_EXECUCAO], anterior.loc[~na_atual, COLS_EXECUCAO]],
+                      ignore_index=True)
+    delta.insert(0, 'Situação', np.repeat(['Novo', 'Resolvido'], [int((~na_anterior).sum()), int((~na_atual).sum())]))
+
+    # Uma contagem por execução: total e quantos estão na outra (o resto é novo ou resolvido)
+    def conta(df, na_outra, total):
+        return pd.DataFrame({'Regra': df['Regra'].to_numpy(), 'Pasta': df['Pasta'].astype(str).to_numpy(),
+                             'comum': na_outra}).groupby(['Regra', 'Pasta']).agg(**{total: ('comum', 'size'),
+                                                                                    'Mantidos': ('comum', 'sum')})
+
+    contagem_atual = conta(atual, na_anterior, 'Atual')
+    contagem_anterior = conta(anterior, na_atual, 'Anterior')
+    resumo = pd.concat([contagem_anterior['Anterior'], contagem_atual], axis=1).fillna(0).astype('int64')
+    resumo['Novos'] = resumo['Atual'] - resumo['Mantidos']
+    resumo['Resolvidos'] = resumo['Anterior'] - resumo['Mantidos']
+    resumo = resumo[['Novos', 'Resolvidos', 'Mantidos', 'Anterior', 'Atual']]
+
+    if save:
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        save_to = path + 'Diferenças entre Validações Folder [ ' + str(folder) + ' ] - ' + timestr + '.xlsx'
+        with pd.ExcelWriter(save_to) as planilha:
+            resumo.to_excel(planilha, sheet_name='Resumo')
+            if delta.shape[0] <= LIMITE_EXCEL:
+                delta.to_excel(planilha, sheet_name='Diferenças', index=False)
+        if delta.shape[0] > LIMITE_EXCEL:
+            print('WARNING: diferenças acima do limite do Excel, gravadas em CSV.')
+            delta.to_csv(os.path.splitext(save_to)[0] + '.csv', index=False)
+
+    return delta, resumo
+
+
+'''
+Funcao: compara_execucoes_armazem
+Finalidade: Comparar duas execuções guardadas no armazém (ver compara_execucoes)
+Parâmetros:
+              con -> conexão com o armazém
+         anterior -> identificação da execução anterior (padrão: a penúltima gravada)
+            atual -> identificação da execução atual (padrão: a última gravada)
+           kwargs -> demais parâmetros de compara_execucoes
+Retorno: tupla (delta, resumo)
+'''
+def compara_execucoes_armazem(con, anterior=None, atual=None, **kwargs):
+
+    execucoes = execucoes_gravadas(con)['execucao'].tolist()
+    if (anterior is None) or (atual is None):
+        if len(execucoes) < 2:
+            raise ValueError('O armazém precisa de pelo menos duas execuções gravadas para comparar')
+        anterior = anterior or execucoes[-2]
+        atual = atual or execucoes[-1]
+
+    return compara_execucoes(carrega_execucao(con, anterior), carrega_execucao(con, atual), **kwargs)
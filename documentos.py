@@ -0,0 +1,171 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir, fase
+
+
+COL_CHAVE = 'Chave CPF/CNPJ'
+COL_TIPO = 'Tipo CPF/CNPJ'
+COL_VALIDO = 'CPF/CNPJ Válido'
+
+# Pesos do primeiro dígito verificador. O segundo usa o peso seguinte na frente (11 ou 6)
+PESOS_CPF = np.array([10, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_CNPJ = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+'''
+Funcao auxiliar: normaliza_digitos
+Finalidade: Tirar a pontuação dos CPF/CNPJs e completar com zeros à esquerda (11 dígitos para CPF,
+            14 para CNPJ), que somem quando a planilha trata o campo como número. Uma coluna
+            numérica com vazios é lida como float (11222333000181.0): o ".0" final sai antes
+            da pontuação, para não virar um dígito a mais
+Parâmetros:
+           textos -> valores distintos dos CPF/CNPJs, formatados ou não
+Retorno: np.array com as chaves só com dígitos (None quando não há dígitos)
+'''
+def normaliza_digitos(textos):
+    textos = pd.Index(textos).astype(str).str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+    digitos = textos.str.replace(r'\D', '', regex=True)
+    chaves = np.where(digitos.str.len() > 11, digitos.str.zfill(14), digitos.str.zfill(11))
+
+    return np.where(digitos.str.len() == 0, None, chaves).astype(object)
+
+
+'''
+Funcao auxiliar: digitos_verificadores
+Finalidade: Conferir os dois dígitos verificadores de várias chaves do mesmo tamanho de uma vez,
+            tratando as chaves como uma matriz de dígitos (uma linha por chave)
+Parâmetros:
+           chaves -> np.array com chaves só com dígitos, todas do mesmo tamanho
+            pesos -> pesos do primeiro dígito verificador (PESOS_CPF ou PESOS_CNPJ)
+Retorno: np.array de booleanos, True quando os dois dígitos conferem
+'''
+def digitos_verificadores(chaves, pesos):
+    tamanho = len(pesos) + 2
+    if len(chaves) == 0:
+        return np.zeros(0, dtype=bool)
+
+    matriz = np.frombuffer(''.join(chaves).encode('ascii'), dtype=np.uint8).reshape(-1, tamanho)
+    matriz = matriz.astype(np.int64) - ord('0')
+
+    pesos2 = np.concatenate([[pesos[0] + 1], pesos])
+    d1 = (matriz[:, :-2] @ pesos) % 11
+    d1 = np.where(d1 < 2, 0, 11 - d1)
+    d2 = (np.column_stack([matriz[:, :-2], d1]) @ pesos2) % 11
+    d2 = np.where(d2 < 2, 0, 11 - d2)
+
+    # Sequências de um dígito só (000.000.000-00, 11.111.111/1111-11 ...) passam na conta,
+    # mas não são documentos válidos
+    repetidos = (matriz == matriz[:, [0]]).all(axis=1)
+
+    return (d1 == matriz[:, -2]) & (d2 == matriz[:, -1]) & ~repetidos
+
+
+'''
+Funcao auxiliar: valida_chaves
+Finalidade: Validar chaves de CPF/CNPJ já normalizadas (ver normaliza_digitos)
+Parâmetros:
+           chaves -> np.array com as chaves (None quando não há chave)
+Retorno: tupla (np.array com o tipo, 'CPF', 'CNPJ' ou None, np.array de booleanos com a validade)
+'''
+def valida_chaves(chaves):
+    chaves = np.asarray(chaves, dtype=object)
+    tamanhos = np.array([len(c) if c is not None else 0 for c in chaves])
+
+    tipos = np.full(len(chaves), None, dtype=object)
+    validos = np.zeros(len(chaves), dtype=bool)
+    for tipo, pesos in [('CPF', PESOS_CPF), ('CNPJ', PESOS_CNPJ)]:
+        mask = tamanhos == len(pesos) + 2
+        tipos[mask] = tipo
+        validos[mask] = digitos_verificadores(chaves[mask].astype(str), pesos)
+
+    return tipos, validos
+
+
+'''
+Funcao: documentos_cpf_cnpj
+Finalidade: Normalizar e validar (dígitos verificadores) uma coluna de CPF/CNPJs inteira de uma vez.
+            As contas são feitas só sobre os valores distintos da coluna, e não linha a linha
+Parâmetros:
+            serie -> coluna com os CPF/CNPJs, formatados ou não
+Retorno: dataframe com o mesmo índice da coluna e as colunas:
+         'Chave CPF/CNPJ'  -> chave canônica, só com dígitos (categórica, nula se não há dígitos)
+         'Tipo CPF/CNPJ'   -> 'CPF', 'CNPJ' ou nulo (sem dígitos ou com tamanho inválido)
+         'CPF/CNPJ Válido' -> True quando os dígitos verificadores conferem
+'''
+def documentos_cpf_cnpj(serie):
+    cat = serie.astype('category').cat
+    chaves = normaliza_digitos(cat.categories)
+    tipos, validos = valida_chaves(chaves)
+
+    # Várias grafias podem levar à mesma chave: reaproveita os códigos já calculados
+    codigos_chave, chaves_unicas = pd.factorize(chaves, sort=True)
+    codigos = cat.codes.to_numpy()
+    presentes = codigos >= 0
+    codigos_linha = np.where(presentes, codigos_chave[codigos], -1)
+
+    return pd.DataFrame({
+        COL_CHAVE: pd.Categorical.from_codes(codigos_linha, categories=chaves_unicas, ordered=True),
+        COL_TIPO: np.where(presentes, tipos[codigos], None),
+        COL_VALIDO: presentes & validos[codigos],
+    }, index=serie.index)
+
+
+'''
+Funcao auxiliar: formata_documento
+Finalidade: Formatar uma chave de CPF/CNPJ (só dígitos) com a pontuação usual
+Parâmetros:
+            chave -> chave com 11 ou 14 dígitos
+Retorno: string formatada (a própria chave, se o tamanho não for de CPF nem de CNPJ)
+'''
+def formata_documento(chave):
+    if len(chave) == 11:
+        return chave[0:3] + '.' + chave[3:6] + '.' + chave[6:9] + '-' + chave[9:11]
+    if len(chave) == 14:
+        return chave[0:2] + '.' + chave[2:5] + '.' + chave[5:8] + '/' + chave[8:12] + '-' + chave[12:14]
+    return chave
+
+
+'''
+Funcao: validar_cpf_cnpj
+Finalidade: Verificar os CPF/CNPJs das certidões: tamanho e dígitos verificadores.
+            Certidões sem CPF/CNPJ não são reportadas aqui (ver validar_cnpj_razao)
+Parâmetros:
+               df -> dataset que se deseja verificar
+    col_reference -> Coluna com os CPF/CNPJs
+    col_to_report -> coluna que será informada no caso de erro
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: dataframe com as linhas e mensagens de erro
+'''
+@medir
+def validar_cpf_cnpj(   df,
+                        col_reference='Consultado (CPF/CNPJ)',
+                        col_to_report='Url',
+                        folder='',
+                        save=True,
+                        path=''):
+
+    with fase('dígitos verificadores', linhas_entrada=df.shape[0]) as f:
+        docs = documentos_cpf_cnpj(df[col_reference])
+        invalidos = docs[COL_CHAVE].notna().to_numpy() & ~docs[COL_VALIDO].to_numpy()
+        f.linhas_saida = int(invalidos.sum())
+
+    valores = df.loc[invalidos, col_reference].astype(str)
+    tipos = docs.loc[invalidos, COL_TIPO]
+    mensagens = np.where(tipos.isna(),
+                         'CPF/CNPJ com tamanho inválido [ ' + valores + ' ]',
+                         'CPF/CNPJ com dígito verificador inválido [ ' + valores + ' ]')
+
+    erros_df = pd.DataFrame.from_dict({'Url': df.loc[invalidos, col_to_report].to_numpy(),
+                                       'Mensagem': mensagens})
+
+    if (save) and (erros_df.shape[0] > 0):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        save_to = path + 'Certidões com CPF ou CNPJ Inválido Folder [ ' + folder + ' ] - ' + timestr + '.xlsx'
+        erros_df.to_excel(save_to, sheet_name='Erros')
+
+    return erros_df
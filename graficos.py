@@ -0,0 +1,840 @@
+import os
+import time
+
+import numpy as np
+
+from instrumentacao import medir, fase
+from agregacao import (resultados_do_mapa, conta_certidoes, monta_mapa, ultimas_certidoes,
+                       processa_em_partes, le_pastas, contagens_do_cubo, ultimas_do_cubo)
+from pontuacao import prepara_pontuacao, pontua_cenarios, classifica_pontuacao, LIMITES
+
+
+# matplotlib é importado dentro das funções de plotagem, para que quem só
+# precisa dos dados (ou dos validadores) não pague o custo de importá-lo
+
+MAX_DIM = 65536
+DPI = 100
+
+# Renderização headless desligada por padrão; pode ser ligada por modo_headless() ou pela
+# variável de ambiente VALIDACOES_HEADLESS=1 (útil em jobs batch)
+_HEADLESS = os.environ.get('VALIDACOES_HEADLESS', '') not in ('', '0')
+
+# Cores (RGBA) do mapa de certidões, na ordem das faixas de cria_colormap
+RED    = np.array([256/256,   0/256,   0/256, 1])
+WHITE  = np.array([256/256, 256/256, 256/256, 1])
+YELLOW = np.array([256/256, 256/256,   0/256, 1])
+GREEN  = np.array([  0/256, 256/256,   0/256, 1])
+GREY1  = np.array([220/256, 220/256, 220/256, 1])
+GREY2  = np.array([211/256, 211/256, 211/256, 1])
+GREY3  = np.array([192/256, 192/256, 192/256, 1])
+
+CORES = [WHITE, RED, YELLOW, GREEN, GREY1, GREY2, GREY3]
+
+# As mesmas cores em html, por Resultado (usadas pelo visualizador de erros)
+CORES_RESULTADO = {resultado: '#' + ''.join(f'{round(c * 255):02x}' for c in cor[:3])
+                   for resultado, cor in (('Positiva', RED), ('Pos./Neg.', YELLOW), ('Negativa', GREEN))}
+
+
+'''
+Funcao auxiliar: totaliza_np
+Finalidade: totalizar a quantidade de certidões de um certo tipo para um CNPJ (linha)
+Parâmetros: 
+              row -> linha de um dataframe
+              skip -> número de colunas a pular (se houver colunas nãp acumuláveis
+                       no início da linha)
+              tipo -> P(Positiva) N(Negativa) PN(Positiva/Negativa)
+           colunas -> lista de colunas do dataframe
+Retorno: string formatada como link html
+'''
+def totaliza_np(row, skip, tipo, colunas):
+    cols = []
+    colunas = colunas[skip:] # Pular primeiras colunas sem dados a serem somados
+    for idx, col in zip(range(len(colunas)), colunas):
+        if (' '+tipo.center(2)) in col:
+            cols.append(skip+idx)
+
+    soma=0
+    for i in cols:
+        soma += row[i]
+
+    return soma
+
+
+'''
+Funcao auxiliar: classif_result
+Finalidade: criar o nome das colunas do mapa, que devem ser pequenos
+Parâmetros: 
+              row -> linha de um dataframe
+Retorno: string formatada como link html
+'''
+def classif_result(row):
+    if row['Resultado'] == 'Positiva':
+        res = 'P '
+    elif row['Resultado'] == 'Negativa':
+        res = 'N '
+    else:
+        res = 'PN'
+    return row['Classificação'][0:4] + res
+
+
+'''
+Funcao auxiliar: mask_map
+Finalidade: criar uma máscara para que as células da matriz gerada pelo imshow 
+            tenham as cores apropriadas
+Parâmetros: 
+             data -> dataframe com os dados da matriz
+          label_x -> lista com os rótulos do eixo X
+           totais -> indica se é para imprimir as colunas de totais ou não
+Retorno: np.array com o mesmo tamanho do dataframe de dados, mas, em vez dos dados,
+         os números correspondentes aos resultados das células
+
+Resultado      Valor da máscara     Cor
+----------     ----------------     ---------
+ Sem result.      0                 Branca
+ Positiva        10                 Vermelha
+ Pos./Neg.       20                 Amarela
+ Negativa        30                 Verde
+ Totais          [40, 50, 60]       Tons de cinza
+'''
+@medir
+def mask_map(data, label_x, totais=True, total_qt=3):
+    if totais:
+        inicio_total = len(label_x) - total_qt 
+    else:
+        inicio_total = len(label_x)
+
+    d = np.ones((data.shape[0], data.shape[1]))
+    for i in range(data.shape[0]):
+        for j in range(data.shape[1]):
+            valor = data.iloc[i,j]
+
+            if valor in ['Negativa', 'Positiva', 'Pos./Neg.', '']:
+                if valor == 'Negativa':
+                    d[i,j] = 30
+                elif valor == 'Positiva': 
+                    d[i,j] = 10
+                else:
+                    if valor == 'Pos./Neg.':
+                        d[i,j] = 20
+            else:
+                if j < inicio_total:
+                    if valor != 0:
+                        if 'PN' in label_x[j]:
+                            d[i,j] = 20
+                        elif ' N ' in label_x[j]:
+                            d[i,j] = 30
+                        else:
+                            d[i,j] = 10
+                else: # totalizadores
+                    d[i,j] = 40 + 10*(j - inicio_total)
+
+    return d
+
+
+'''
+Funcao auxiliar: cria_colormap
+Finalidade: criar um objeto ListedColorMap com as cores que serão utilizadas na 
+            plotagem do mapa
+Parâmetros: 
+          NFAIXAS -> divisões do espectro de cores utilizadas
+           totais -> indica se é para imprimir as colunas de totais ou não
+Retorno: objeto com o mapa de cores
+'''
+@medir
+def cria_colormap (NFAIXAS=280, totais=True):
+
+    from matplotlib import cm
+    from matplotlib.colors import ListedColormap
+
+    # A partir de um colormap existente, modifica para imprimir somente 
+    # quatro cores, conforme o Resultado da célula, ou sete cores se tiver totais
+    map_cores = cm.get_cmap('RdYlGn', 256)
+
+    # cria a representação RGB das cores desejadas
+    #
+    # Define as faixas em que as cores serão aplicadas, conforme os valores normalizados de cada 
+    # célula
+    # 280 é apenas para facilitar as faixas de cores para quando tem e não tem totais
+    newcolors = map_cores(np.linspace(0, 1, NFAIXAS))
+    ncores = 7 if totais else 4
+
+    desloc = int(NFAIXAS/ncores)
+
+    p1 = 0
+    p2 = 0
+    for c in range(ncores):
+        p2 = (p1 + desloc) if (c < ncores) else (NFAIXAS)
+
+        newcolors[p1:p2, ] = CORES[c]
+        p1 = p2
+
+    # Retorna novo colormap com a definição das faixas de cores
+    return ListedColormap(newcolors)
+
+
+'''
+Funcao: modo_headless
+Finalidade: Ligar/desligar a renderização sem interface gráfica. No modo headless as figuras são
+            criadas pela API orientada a objetos (Figure + canvas Agg), fora do estado global do
+            pyplot, e descartadas logo depois de salvas; assim, gerar relatórios de muitas pastas
+            no mesmo processo não acumula figuras em memória. Fora dele, as figuras continuam
+            sendo exibidas pelo pyplot (notebooks)
+            Também pode ser ligado pela variável de ambiente VALIDACOES_HEADLESS=1
+Parâmetros:
+            ativo -> True para ligar, False para desligar
+Retorno: None
+'''
+def modo_headless(ativo=True):
+    global _HEADLESS
+    _HEADLESS = ativo
+
+
+'''
+Funcao auxiliar: abre_figura
+Finalidade: Criar a figura e os eixos de um gráfico, conforme o modo de renderização
+Parâmetros:
+          figsize -> tamanho da figura, em polegadas
+Retorno: tupla (figura, eixos)
+'''
+def abre_figura(figsize):
+    if _HEADLESS:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=figsize, facecolor='w')
+        FigureCanvasAgg(fig)
+        return fig, fig.subplots()
+
+    import matplotlib.pyplot as plt
+    return plt.subplots(figsize=figsize, facecolor='w')
+
+
+'''
+Funcao auxiliar: fecha_figura
+Finalidade: Exibir (fora do modo headless) e/ou salvar a figura, e fechá-la em seguida nos dois
+            modos, para que gerar muitos gráficos não acumule figuras em memória. Em notebooks a
+            figura é exibida pelo IPython antes de ser fechada; fora deles, por fig.show()
+Parâmetros:
+              fig -> figura
+          save_to -> arquivo onde a figura será salva ('' para não salvar)
+              dpi -> resolução da imagem salva
+Retorno: save_to, ou None se não salvou
+'''
+def fecha_figura(fig, save_to='', dpi=100):
+    if not _HEADLESS:
+        exibe_figura(fig)
+
+    if save_to:
+        fig.savefig(save_to, dpi=dpi)
+
+    if _HEADLESS: # a figura não é do pyplot (ver abre_figura): basta limpá-la
+        fig.clf()
+    else:
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+
+    return save_to or None
+
+
+def exibe_figura(fig):
+    try:
+        from IPython import get_ipython
+        from IPython.display import display
+    except ImportError:
+        get_ipython = None
+
+    if (get_ipython is not None) and (get_ipython() is not None):
+        display(fig)
+    else:
+        fig.show()
+
+
+'''
+Funcao auxiliar: dimensoes_mapa
+Finalidade: Calcular o tamanho da figura de um mapa, para que cada célula tenha um tamanho
+            legível e a imagem não passe do limite de pixels
+Parâmetros:
+              n_x -> quantidade de colunas do mapa
+              n_y -> quantidade de linhas do mapa
+Retorno: tupla (largura, altura) em polegadas, ou None se o mapa estiver vazio
+'''
+def dimensoes_mapa(n_x, n_y):
+    xmin,xmax = 0, n_x
+    ymin,ymax = 0, n_y
+
+    yox = (ymax-ymin)/(xmax-xmin)
+
+    # set number that should spans cell's width
+    pwidth = (int((n_x+1)/3.0))    # inches
+    
+    if yox>1.0:
+        # tall figure
+        if pwidth * yox * DPI > MAX_DIM:
+            pwidth = int(MAX_DIM/(yox*DPI))
+
+        width, height = pwidth, pwidth*yox
+    elif yox==1.0:
+        width, height = pwidth, pwidth
+    elif yox<1.0:
+        # wide figure
+        width, height = pwidth*yox, pwidth
+        if width<pwidth:
+            height = height/width*pwidth
+            width = pwidth
+    else:
+        return None
+
+    return width, height
+
+
+'''
+Funcao: gera_mapa_certidoes
+Finalidade: criar um relatório(mapa) com os tipos de certidões e seus resultados, 
+            agrupados por CPF/CNPJ
+Parâmetros: 
+               df -> dataframe com os dados já tratados
+           totais -> indica se é para imprimir as colunas de totais ou não
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+          armazem -> conexão com o armazém local (opcional). Se informada, df é ignorado e a
+                     contagem é feita no armazém, nas pastas informadas
+           pastas -> Número da pasta, ou lista de pastas, a considerar no armazém
+           plotar -> Plota o mapa (False devolve só os dados, sem importar o matplotlib)
+             cubo -> cubo de contagens (conta_cubo ou cubo_armazem), opcional. Se informado, df
+                     é ignorado e o mapa sai da soma da fatia do cubo
+           mes_de -> mês de emissão inicial ('mm/aaaa') da fatia do cubo, inclusive
+          mes_ate -> mês de emissão final ('mm/aaaa') da fatia do cubo, inclusive
+Retorno: dataframe com os dados do mapa
+'''
+@medir
+def gera_mapa_certidoes(df, 
+                        totais=True, 
+                        folder='',
+                        results='all',
+                        save=True, 
+                        path='',
+                        armazem=None,
+                        pastas=None,
+                        plotar=True,
+                        cubo=None,
+                        mes_de=None,
+                        mes_ate=None):
+
+    show_result = resultados_do_mapa(results)
+    if show_result is None:
+        return
+
+    if cubo is not None: # soma da fatia do cubo, df é ignorado
+        data = monta_mapa(contagens_do_cubo(cubo, show_result, mes_de, mes_ate), show_result, totais)
+    elif armazem is not None: # contagem feita no armazém, df é ignorado
+        from armazem import contagens_armazem
+        data = monta_mapa(contagens_armazem(armazem, show_result, pastas=pastas), show_result, totais)
+    else:
+        with fase('agregação', linhas_entrada=df.shape[0]) as f:
+            data = monta_mapa(conta_certidoes(df, show_result), show_result, totais)
+            f.linhas_saida = data.shape[0]
+
+    if plotar:
+        plota_mapa_certidoes(data, show_result, totais, folder, save, path)
+
+    return data
+
+
+'''
+Funcao: gera_mapa_certidoes_em_partes
+Finalidade: criar o mapa do histórico de certidões processando uma pasta por vez, sem
+            concatenar o histórico inteiro em memória. O pico de memória fica limitado ao
+            tamanho de uma pasta mais as contagens acumuladas
+Parâmetros: 
+          folders -> lista com os números das pastas do histórico
+             path -> Caminho onde estão os arquivos, e onde o mapa será salvo
+           totais -> indica se é para imprimir as colunas de totais ou não
+          results -> 'all', sigla de um resultado ou lista de siglas
+           folder -> Identificação do histórico no título do mapa
+      validadores -> dicionário nome -> função(df, pasta) a ser aplicada a cada pasta (opcional)
+             save -> O resultado deve ser salvo em disco (True ou False)
+           plotar -> Plota o mapa (False devolve só os dados)
+Retorno: tupla (dados do mapa, dicionário nome -> erros dos validadores)
+'''
+@medir
+def gera_mapa_certidoes_em_partes(folders,
+                                  path='',
+                                  totais=True,
+                                  folder='',
+                                  results='all',
+                                  validadores=None,
+                                  save=True,
+                                  plotar=True):
+
+    show_result = resultados_do_mapa(results)
+    if show_result is None:
+        return
+
+    contagens, _, erros = processa_em_partes(le_pastas(folders, path), show_result, validadores, ultimas=False)
+    data = monta_mapa(contagens, show_result, totais)
+
+    if plotar:
+        plota_mapa_certidoes(data, show_result, totais, folder, save, path)
+
+    return data, erros
+
+
+'''
+Funcao: plota_mapa_certidoes
+Finalidade: plotar o mapa de certidões a partir dos dados já agregados (ver monta_mapa)
+Parâmetros: 
+             data -> dados do mapa
+      show_result -> lista com os Resultados que entram no mapa
+           totais -> indica se os dados têm as colunas de totais ou não
+           folder -> Número da pasta de certidões, para o título
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: nome do arquivo salvo, ou None
+'''
+def plota_mapa_certidoes(data, show_result, totais=True, folder='', save=True, path=''):
+
+    label_y = np.array(data.index.tolist())
+    label_x = data.columns.values.tolist()
+    label_x.remove('Tot P2')
+
+    inicio_total = (len(label_x) - len(show_result)) if totais else (len(label_x))
+
+    mask = mask_map(data[label_x], label_x, totais, len(show_result))
+
+    # Obtem o novo colormap
+    newcmp = cria_colormap(totais=totais)
+
+    dimensoes = dimensoes_mapa(len(label_x), len(label_y))
+    if dimensoes is None:
+        return
+
+    import matplotlib.ticker as ticker
+    from matplotlib import colors
+
+    with fase('plotagem'):
+        fig, ax = abre_figura(dimensoes)
+
+        vmax = 60 if totais else 30
+        ax.imshow(mask, cmap=newcmp, norm=colors.Normalize(vmin=0, vmax=vmax)) 
+
+        # Exibe todos os ticks dos eixos x e y
+        ax.xaxis.set_major_locator(ticker.MultipleLocator(1)) 
+        ax.yaxis.set_major_locator(ticker.MultipleLocator(1)) 
+
+        # Exibe os rótulos nos eixos x e y
+        ax.set_xticks(range(len(label_x)))
+        ax.set_xticklabels(label_x, rotation='vertical')
+        ax.set_yticks(range(len(label_y)))
+        ax.set_yticklabels(label_y)
+
+        # rótulos na parte superior e inferior para melhor legibilidade
+        ax.tick_params(axis="x", bottom=True, top=True, labelbottom=True, labeltop=True) 
+
+        ax.set_title('Mapa do Histórico de Certidões Folder [ '+str(folder)+' ]')
+
+        # Coloca o texto nas células, que é a quantidade de cada tipo de certidão x cnpj
+        for i in range(data.shape[0]):
+            for j in range(data.shape[1] - 1):
+                cell = data.iloc[i, j]
+                if (j < inicio_total): # preenche as células de valores
+                    if cell > 0: # somente se houver uma ou mais certidões
+                        ax.text(j,i,str(cell), va='center', ha='center', fontsize=14)
+                else: # preenche as células totalizadoras
+                    ax.text(j,i,str(cell), va='center', ha='center', fontsize=14)
+
+        save_to = ''
+        if save:
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            save_to = path + 'Mapa do Histórico de Certidões Folder [ ' + str(folder) + ' ] - ' + timestr + '.jpg'
+
+        return fecha_figura(fig, save_to, DPI)
+
+
+'''
+Funcao: gera_sheet_certidoes
+Finalidade: criar o mapa das últimas certidões, com o resultado de cada tipo de certidão
+            (colunas) por CPF/CNPJ (linhas)
+Parâmetros: 
+               df -> dataframe com os dados já tratados
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+          armazem -> conexão com o armazém local (opcional). Se informada, df é ignorado
+           pastas -> Número da pasta, ou lista de pastas, a considerar no armazém
+           plotar -> Plota o mapa (False devolve só os dados)
+Retorno: dataframe com as últimas certidões
+'''
+@medir
+def gera_sheet_certidoes(df, 
+                        folder='',
+                        save=True, 
+                        path='',
+                        armazem=None,
+                        pastas=None,
+                        plotar=True):
+
+    if armazem is not None: # agrupamento feito no armazém, df é ignorado
+        from armazem import ultimas_certidoes_armazem
+        df2 = ultimas_certidoes_armazem(armazem, pastas=pastas)
+    else:
+        df2 = ultimas_certidoes(df)
+
+    if plotar:
+        plota_sheet_certidoes(df2, folder, save, path)
+
+    return df2
+
+
+'''
+Funcao: plota_sheet_certidoes
+Finalidade: plotar o mapa das últimas certidões (ver ultimas_certidoes)
+Parâmetros: 
+              df2 -> planilha das últimas certidões
+           folder -> Número da pasta de certidões, para o título
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: nome do arquivo salvo, ou None
+'''
+def plota_sheet_certidoes(df2, folder='', save=True, path=''):
+
+    label_y = np.array(df2.index.tolist())
+    label_x = df2.columns.values.tolist()
+
+    mask = mask_map(df2, label_x, totais=False, total_qt=3)
+
+    newcmp = cria_colormap(totais=False)
+
+    dimensoes = dimensoes_mapa(len(label_x), len(label_y))
+    if dimensoes is None:
+        return
+
+    import matplotlib.ticker as ticker
+    from matplotlib import colors
+
+    with fase('plotagem'):
+        fig, ax = abre_figura(dimensoes)
+
+        ax.imshow(mask, cmap=newcmp, norm=colors.Normalize(vmin=0, vmax=30)) 
+
+        # Exibe todos os ticks dos eixos x e y
+        ax.xaxis.set_major_locator(ticker.MultipleLocator(1)) 
+        ax.yaxis.set_major_locator(ticker.MultipleLocator(1)) 
+
+        # Exibe os rótulos nos eixos x e y
+        ax.set_xticks(range(len(label_x)))
+        ax.set_xticklabels(label_x, rotation='vertical')
+        ax.set_yticks(range(len(label_y)))
+        ax.set_yticklabels(label_y)
+
+        # rótulos na parte superior e inferior para melhor legibilidade
+        ax.tick_params(axis="x", bottom=True, top=True, labelbottom=True, labeltop=True) 
+
+        ax.set_title('Mapa das Últimas Certidões Folder [ '+str(folder)+' ]')
+
+        save_to = ''
+        if save:
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            save_to = path + 'Mapa das Últimas Certidões Folder [ ' + str(folder) + ' ] - ' + timestr + '.jpg'
+
+        return fecha_figura(fig, save_to, DPI)
+
+
+'''
+Funcao: gera_sheet_certidoesT
+Finalidade: criar o mapa das últimas certidões transposto (CPF/CNPJs nas colunas), mais
+            adequado quando há muitos CPF/CNPJs
+Parâmetros: 
+               df -> dataframe com os dados já tratados
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+          armazem -> conexão com o armazém local (opcional). Se informada, df é ignorado
+           pastas -> Número da pasta, ou lista de pastas, a considerar no armazém
+           plotar -> Plota o mapa (False devolve só os dados)
+Retorno: dataframe com as últimas certidões
+'''
+@medir
+def gera_sheet_certidoesT(df, 
+                        folder='',
+                        save=True, 
+                        path='',
+                        armazem=None,
+                        pastas=None,
+                        plotar=True):
+
+    if armazem is not None: # agrupamento feito no armazém, df é ignorado
+        from armazem import ultimas_certidoes_armazem
+        df2 = ultimas_certidoes_armazem(armazem, pastas=pastas)
+    else:
+        df2 = ultimas_certidoes(df)
+
+    if plotar:
+        plota_sheet_certidoesT(df2, folder, save, path)
+
+    return df2
+
+
+'''
+Funcao: plota_sheet_certidoesT
+Finalidade: plotar o mapa das últimas certidões transposto (ver gera_sheet_certidoesT)
+Parâmetros: 
+              df2 -> planilha das últimas certidões
+           folder -> Número da pasta de certidões, para o título
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: nome do arquivo salvo, ou None
+'''
+def plota_sheet_certidoesT(df2, folder='', save=True, path=''):
+
+    label_y = np.array(df2.index.tolist())
+    label_x = df2.columns.values.tolist()
+
+    mask = mask_map(df2, label_x, totais=False, total_qt=3)
+
+    newcmp = cria_colormap(totais=False)
+
+    xmin,xmax = 0, len(label_y)
+    ymin,ymax = 0, len(label_x)
+
+    yox = (ymax-ymin)/(xmax-xmin)
+
+    # set number that should spans cell's width
+    pwidth = (int((len(label_y)+1)/3.0))    # inches
+
+    width = pwidth
+    height = pwidth * yox + 3
+
+    import matplotlib.ticker as ticker
+    from matplotlib import colors
+
+    with fase('plotagem'):
+        fig, ax = abre_figura((width, height))
+
+        ax.imshow(mask.transpose(), cmap=newcmp, norm=colors.Normalize(vmin=0, vmax=30)) 
+
+        # Exibe todos os ticks dos eixos x e y
+        ax.xaxis.set_major_locator(ticker.MultipleLocator(1)) 
+        ax.yaxis.set_major_locator(ticker.MultipleLocator(1)) 
+
+        # Exibe os rótulos nos eixos x e y
+        ax.set_xticks(range(len(label_y)))
+        ax.set_xticklabels(label_y, rotation='vertical')
+        ax.set_yticks(range(len(label_x)))
+        ax.set_yticklabels(label_x)
+
+        # rótulos na parte superior e inferior para melhor legibilidade
+        ax.tick_params(axis="x", bottom=True, top=False, labelbottom=True, labeltop=False) 
+
+        ax.set_title('Mapa das Últimas Certidões Folder [ '+str(folder)+' ]')
+
+        save_to = ''
+        if save:
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            save_to = path + 'Mapa das Últimas Certidões Folder [ ' + str(folder) + ' ] - ' + timestr + '.jpg'
+
+        return fecha_figura(fig, save_to, DPI)
+
+
+def get_supplier_score(row, exception_rules, columns):
+    total = 0.0
+    for pos, col in zip(range(len(columns)), columns):
+        col = col.strip()
+        if row[pos] == 'Positiva':
+            if col in exception_rules:
+                total += exception_rules[col]
+            else:
+                total += 1
+        elif row[pos] == 'Pos./Neg.':
+            total += 0.5
+    
+    return total
+
+
+'''
+Funcao: suppliers_score
+Finalidade: Pontuar os fornecedores pelas últimas certidões de cada tipo (ver pontuacao) e,
+            opcionalmente, plotar a pontuação
+Parâmetros: 
+               df -> dataset com as certidões
+        suppliers -> cadastro de fornecedores (CNPJ_CPF, Classificação, Terceiro)
+   special_scores -> tabela de pontuações especiais (special-scores.xlsx)
+           folder -> Identificação do gráfico no título
+             save -> O gráfico deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o gráfico
+           plotar -> Plota a pontuação (ver plota_suppliers_score)
+             cubo -> cubo de contagens (opcional); se informado, df é ignorado
+   mes_de/mes_ate -> período da fatia do cubo
+Retorno: planilha das últimas certidões com a coluna 'score'. CPF/CNPJs fora do cadastro de
+         fornecedores não são pontuados e ficam com score NaN
+'''
+@medir
+def suppliers_score(df, 
+                    suppliers,
+                    special_scores,
+                    folder='',
+                    save=True, 
+                    path='',
+                    plotar=True,
+                    cubo=None,
+                    mes_de=None,
+                    mes_ate=None):
+
+    if cubo is not None: # últimas certidões da fatia do cubo, df é ignorado
+        df2 = ultimas_do_cubo(cubo, mes_de, mes_ate)
+    else:
+        df2 = ultimas_certidoes(df)
+
+    # Pontuação pela matriz fornecedor x tipo de certidão (ver pontuacao), em vez de
+    # percorrer os fornecedores um a um com get_supplier_score
+    matriz = prepara_pontuacao(df, suppliers, ultimas=df2)
+    df2['score'] = pontua_cenarios(matriz, special_scores)['score'].reindex(df2.index)
+
+#    df2 = df2.sort_values(by='score')
+
+    if plotar:
+        plota_suppliers_score(df2, folder, save, path)
+
+    return df2
+
+
+'''
+Funcao: plota_suppliers_score
+Finalidade: plotar a pontuação dos fornecedores, em vermelho acima de 70% da maior pontuação,
+            em verde até 30% e em amarelo entre as duas (ver classifica_pontuacao)
+Parâmetros: 
+              df2 -> dataframe com a coluna 'score' e os CPF/CNPJs no índice
+           folder -> Identificação do gráfico no título
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: nome do arquivo salvo, ou None (também quando nenhum fornecedor foi pontuado)
+'''
+def plota_suppliers_score(df2, folder='', save=True, path=''):
+
+    if not np.isfinite(df2.score.to_numpy(dtype=np.float64)).any():
+        print('WARNING: nenhum fornecedor pontuado (CPF/CNPJs fora do cadastro), gráfico não gerado.')
+        return None
+
+    max_score = df2.score.max()
+
+    labels_x = df2.index.values
+
+    colors = classifica_pontuacao(df2.score, LIMITES).tolist()
+
+    xmin,xmax = 0, int(max_score) + 1
+    ymin,ymax = 0, len(labels_x)
+
+    yox = (ymax-ymin)/(xmax-xmin)
+
+    width = max_score/5.0 + 3
+    if width < 2:
+        width = 2
+
+    if (width * DPI) > MAX_DIM:
+        width = int(MAX_DIM/DPI)
+
+    height = width * yox
+    if height < 2:
+        height = 2
+
+    if (height * DPI) > MAX_DIM:
+        height = int(MAX_DIM/DPI)
+        width = height / yox
+
+    import matplotlib.ticker as ticker
+
+    with fase('plotagem'):
+        fig, ax = abre_figura((width, height))
+        ax.set_title('Pontuação de Fornecedores [ '+str(folder)+' ]')
+        ax.scatter(df2.score, labels_x, c=colors, s=200)
+        ax.grid(True, which='major', color='#666666', linestyle='-')
+
+        ticker.Locator.MAXTICKS = 3000
+        ax.minorticks_on()
+        ax.grid(True, which='minor', color='#999999', linestyle='--', alpha=0.2, axis='x')
+
+        save_to = ''
+        if save:
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            save_to = path + 'Pontuação de Fornecedores [ ' + str(folder) + ' ] - ' + timestr + '.jpg'
+
+        return fecha_figura(fig, save_to, DPI)
+
+
+# Funções de plotagem que podem ser chamadas por renderiza_em_lote
+PLOTAGENS = {'mapa': plota_mapa_certidoes,
+             'sheet': plota_sheet_certidoes,
+             'sheetT': plota_sheet_certidoesT,
+             'score': plota_suppliers_score}
+
+
+def _inicia_processo_headless():
+    import matplotlib
+    matplotlib.use('Agg')
+    modo_headless(True)
+
+
+def _renderiza(tarefa):
+    tipo, args, kwargs = tarefa
+    return PLOTAGENS[tipo](*args, **kwargs)
+
+
+'''
+Funcao: renderiza_em_lote
+Finalidade: Renderizar vários gráficos (ex.: os mapas de várias pastas) em paralelo, em um pool
+            de processos no modo headless. Os dados são calculados antes, no processo principal
+            (com plotar=False), e só a plotagem vai para o pool
+Parâmetros:
+          tarefas -> lista de tuplas (tipo, args, kwargs), com tipo em PLOTAGENS, e args/kwargs os
+                     argumentos da função de plotagem. Ex.:
+                     ('mapa', (data, show_result), {'folder': 12, 'path': 'saida/'})
+         processos -> quantidade de processos (padrão: quantidade de CPUs)
+Retorno: lista com o nome dos arquivos salvos, na ordem das tarefas
+'''
+@medir
+def renderiza_em_lote(tarefas, processos=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicia_processo_headless) as pool:
+        return list(pool.map(_renderiza, tarefas))
+
+
+'''
+Funcao: gera_mapas_pastas
+Finalidade: Gerar e salvar o mapa de certidões de cada pasta, separadamente, com a plotagem
+            em paralelo (ver renderiza_em_lote)
+Parâmetros:
+          folders -> lista com os números das pastas
+             path -> Caminho onde estão os arquivos, e onde os mapas serão salvos
+           totais -> indica se é para imprimir as colunas de totais ou não
+          results -> 'all', sigla de um resultado ou lista de siglas
+        processos -> quantidade de processos da plotagem (padrão: quantidade de CPUs)
+Retorno: dicionário pasta -> nome do arquivo salvo
+'''
+@medir
+def gera_mapas_pastas(folders, path='', totais=True, results='all', processos=None):
+
+    show_result = resultados_do_mapa(results)
+    if show_result is None:
+        return
+
+    tarefas = []
+    for folder_id, df in le_pastas(folders, path):
+        data = gera_mapa_certidoes(df, totais, results=results, plotar=False)
+        tarefas.append(('mapa', (data, show_result, totais, folder_id), {'path': path}))
+        del df
+
+    arquivos = renderiza_em_lote(tarefas, processos)
+
+    return dict(zip([tarefa[1][3] for tarefa in tarefas], arquivos))
+
+
+'''
+Funcao auxiliar: make_clickable
+Finalidade: exibir uma URL clicável
+Parâmetros: 
+              url -> campo string que contém uma URL
+Retorno: string formatada como link html
+'''
+def make_clickable(url):
+  return f'<a href="{url}">{url}</a>'
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import functools
+import threading
+import tracemalloc
+
+
+# Perfil desligado por padrão; pode ser ligado por ativar_perfil() ou pela
+# variável de ambiente VALIDACOES_PERFIL=1 (útil em jobs batch)
+_ATIVO = os.environ.get('VALIDACOES_PERFIL', '') not in ('', '0')
+_MEMORIA = False
+_MEDIU_MEMORIA = False   # alguma coleta deste perfil mediu memória (exportado em exportar_perfil)
+_REGISTROS = {}
+_TRAVA = threading.Lock()
+# Cada thread tem a sua pilha de fases, para que fases de threads diferentes (pipeline, serviço)
+# não se aninhem umas nas outras
+_LOCAL = threading.local()
+_CPROFILE = None
+_PYINSTRUMENT = None
+
+
+class _FaseNula:
+    '''
+    Contexto vazio devolvido por fase() quando o perfil está desligado,
+    para que o custo da instrumentação seja praticamente zero
+    '''
+    linhas_saida = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_FASE_NULA = _FaseNula()
+
+
+def _pilha():
+    pilha = getattr(_LOCAL, 'pilha', None)
+    if pilha is None:
+        pilha = _LOCAL.pilha = []
+    return pilha
+
+
+class _Fase:
+
+    def __init__(self, nome, linhas_entrada=None):
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+
+    def __enter__(self):
+        pilha = _pilha()
+        self.caminho = (pilha[-1].caminho + '/' + self.nome) if pilha else self.nome
+        self.nivel = len(pilha)
+        self.pico = 0
+        self.mem_inicio = 0
+        if _MEMORIA and tracemalloc.is_tracing():
+            self.mem_inicio, pico = tracemalloc.get_traced_memory()
+            if pilha:
+                pilha[-1].pico = max(pilha[-1].pico, pico)
+            tracemalloc.reset_peak()
+        pilha.append(self)
+        self.cpu_inicio = time.process_time()
+        self.parede_inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        parede = time.perf_counter() - self.parede_inicio
+        cpu = time.process_time() - self.cpu_inicio
+        pilha = _pilha()
+        pilha.pop()
+
+        pico_mb = None
+        if _MEMORIA and tracemalloc.is_tracing():
+            self.pico = max(self.pico, tracemalloc.get_traced_memory()[1])
+            if pilha:
+                pilha[-1].pico = max(pilha[-1].pico, self.pico)
+            pico_mb = max(self.pico - self.mem_inicio, 0) / (1024 * 1024)
+
+        with _TRAVA:
+            reg = _REGISTROS.get(self.caminho)
+            if reg is None:
+                reg = {'fase': self.caminho,
+                       'nome': self.nome,
+                       'nivel': self.nivel,
+                       'chamadas': 0,
+                       'tempo_parede_s': 0.0,
+                       'tempo_cpu_s': 0.0,
+                       'linhas_entrada': None,
+                       'linhas_saida': None,
+                       'memoria_pico_mb': None}
+                _REGISTROS[self.caminho] = reg
+
+            reg['chamadas'] += 1
+            reg['tempo_parede_s'] += parede
+            reg['tempo_cpu_s'] += cpu
+            if self.linhas_entrada is not None:
+                reg['linhas_entrada'] = (reg['linhas_entrada'] or 0) + self.linhas_entrada
+            if self.linhas_saida is not None:
+                reg['linhas_saida'] = (reg['linhas_saida'] or 0) + self.linhas_saida
+            if pico_mb is not None:
+                reg['memoria_pico_mb'] = max(reg['memoria_pico_mb'] or 0.0, pico_mb)
+
+        return False
+
+
+'''
+Funcao: ativar_perfil
+Finalidade: Ligar a coleta de tempos (parede e CPU), linhas e memória das funções e fases instrumentadas
+Parâmetros:
+          memoria -> Mede também o pico de memória de cada fase (usa tracemalloc, bem mais lento)
+         cprofile -> Liga também o cProfile, exportado junto com o perfil
+     pyinstrument -> Liga também o pyinstrument (se instalado), exportado junto com o perfil
+Retorno: None
+'''
+def ativar_perfil(memoria=False, cprofile=False, pyinstrument=False):
+    global _ATIVO, _MEMORIA, _MEDIU_MEMORIA, _CPROFILE, _PYINSTRUMENT
+
+    _ATIVO = True
+    _MEMORIA = memoria
+    _MEDIU_MEMORIA = _MEDIU_MEMORIA or memoria
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    if cprofile:
+        if _CPROFILE is None:
+            import cProfile
+            _CPROFILE = cProfile.Profile()
+        _CPROFILE.enable()
+
+    if pyinstrument and _PYINSTRUMENT is None:
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print('WARNING: pyinstrument não está instalado, seguindo sem ele.')
+        else:
+            _PYINSTRUMENT = Profiler()
+            _PYINSTRUMENT.start()
+
+
+'''
+Funcao: desativar_perfil
+Finalidade: Desligar a coleta, mantendo os registros já coletados
+Retorno: None
+'''
+def desativar_perfil():
+    global _ATIVO, _MEMORIA
+
+    _ATIVO = False
+    if _MEMORIA and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _MEMORIA = False
+
+    if _CPROFILE is not None:
+        _CPROFILE.disable()
+    if (_PYINSTRUMENT is not None) and _PYINSTRUMENT.is_running:
+        _PYINSTRUMENT.stop()
+
+
+def perfil_ativo():
+    return _ATIVO
+
+
+'''
+Funcao: limpar_perfil
+Finalidade: Descartar os registros coletados e os profilers auxiliares
+Retorno: None
+'''
+def limpar_perfil():
+    global _CPROFILE, _PYINSTRUMENT, _MEDIU_MEMORIA
+
+    with _TRAVA:
+        _REGISTROS.clear()
+    _MEDIU_MEMORIA = _MEMORIA
+    _CPROFILE = None
+    _PYINSTRUMENT = None
+
+
+'''
+Funcao auxiliar: conta_linhas
+Finalidade: Obter a quantidade de linhas de um objeto tabular (dataframe, array)
+Parâmetros:
+              obj -> objeto a ser medido. Para tuplas, considera o último elemento
+                     tabular (ex.: o dataframe de erros de validar_cnpj_razao)
+Retorno: quantidade de linhas, ou None se o objeto não for tabular
+'''
+def conta_linhas(obj):
+    if isinstance(obj, tuple):
+        for item in reversed(obj):
+            linhas = conta_linhas(item)
+            if linhas is not None:
+                return linhas
+        return None
+
+    shape = getattr(obj, 'shape', None)
+    if shape:
+        return int(shape[0])
+
+    return None
+
+
+'''
+Funcao: fase
+Finalidade: Context manager que mede uma fase interna de uma função (laços por linha,
+            pontuação fuzzy, plotagem etc.). Chamadas repetidas da mesma fase são acumuladas
+Parâmetros:
+             nome -> Nome da fase
+   linhas_entrada -> Quantidade de linhas que entram na fase (opcional)
+Retorno: objeto da fase; o chamador pode preencher o atributo linhas_saida
+
+Exemplo:
+    with fase('laço por linha', linhas_entrada=df.shape[0]) as f:
+        ...
+        f.linhas_saida = len(erros)
+'''
+def fase(nome, linhas_entrada=None):
+    if not _ATIVO:
+        return _FASE_NULA
+
+    return _Fase(nome, linhas_entrada)
+
+
+'''
+Funcao: medir
+Finalidade: Decorator que mede cada chamada de uma função. As linhas de entrada são
+            obtidas do primeiro argumento tabular e as de saída do retorno
+Parâmetros:
+             nome -> Nome a ser registrado (padrão: nome da função). Pode ser usado
+                     como @medir ou @medir('nome')
+Retorno: função decorada
+'''
+def medir(nome=None):
+
+    def decorator(func):
+        nome_fase = nome or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ATIVO:
+                return func(*args, **kwargs)
+
+            linhas_entrada = conta_linhas(args[0]) if args else None
+            with _Fase(nome_fase, linhas_entrada) as f:
+                resultado = func(*args, **kwargs)
+                f.linhas_saida = conta_linhas(resultado)
+
+            return resultado
+
+        return wrapper
+
+    if callable(nome):
+        func, nome = nome, None
+        return decorator(func)
+
+    return decorator
+
+
+'''
+Funcao: obter_perfil
+Finalidade: Obter os registros coletados (fases internas aparecem antes das externas)
+Retorno: lista de dicionários, um por fase
+'''
+def obter_perfil():
+    with _TRAVA:
+        return [dict(reg) for reg in _REGISTROS.values()]
+
+
+'''
+Funcao: resumo_perfil
+Finalidade: Obter os registros coletados como dataframe, ordenados pelo tempo de parede
+Retorno: dataframe com uma linha por fase
+'''
+def resumo_perfil():
+    import pandas as pd
+
+    return pd.DataFrame(obter_perfil()).sort_values('tempo_parede_s', ascending=False)
+
+
+'''
+Funcao: exportar_perfil
+Finalidade: Gravar o perfil da execução em JSON e, se ligados, as saídas do cProfile (.prof)
+            e do pyinstrument (.html)
+Parâmetros:
+             nome -> Nome base do arquivo (sem extensão)
+             path -> Caminho para salvar o resultado
+Retorno: caminho do arquivo JSON gravado
+'''
+def exportar_perfil(nome='', path=''):
+
+    if nome == '':
+        nome = 'Perfil de Execução - ' + time.strftime("%Y%m%d-%H%M%S")
+
+    save_to = path + nome + '.json'
+    with open(save_to, 'w', encoding='utf-8') as arq:
+        json.dump({'gerado_em': time.strftime("%Y-%m-%d %H:%M:%S"),
+                   'memoria': _MEDIU_MEMORIA,
+                   'fases': obter_perfil()}, arq, ensure_ascii=False, indent=2)
+
+    if _CPROFILE is not None:
+        _CPROFILE.dump_stats(path + nome + '.prof')
+
+    if _PYINSTRUMENT is not None:
+        if _PYINSTRUMENT.is_running:
+            _PYINSTRUMENT.stop()
+        with open(path + nome + '.html', 'w', encoding='utf-8') as arq:
+            arq.write(_PYINSTRUMENT.output_html())
+
+    return save_to
@@ -0,0 +1,175 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from instrumentacao import medir
+from carregadores import baixa_arquivo, get_main_dataset, get_positive_dataset
+
+
+COLS_DUPLICIDADE = ['Classificação', 'Resultado', 'Consultado (CPF/CNPJ)', 'Emitido em', 'Validade']
+
+_FIM = None   # marca de fim da fila, uma por consumidor
+
+
+'''
+Funcao: valida_pasta
+Finalidade: Carregar uma pasta já baixada e passar pelos validadores. É a etapa de validação
+            padrão do pipeline; roda em outro processo, por isso recebe só o número da pasta
+Parâmetros:
+        folder_id -> Número da pasta
+             path -> Caminho onde estão os arquivos (e onde os erros são salvos)
+             save -> Os erros devem ser salvos em disco (True ou False)
+Retorno: dicionário nome do validador -> dataframe de erros
+'''
+def valida_pasta(folder_id, path='', save=False):
+    from validadores import validar_duplicidade, validar_datas, checar_validade
+    from documentos import validar_cpf_cnpj
+    from correspondencia import validar_cnpj_razao
+
+    df = get_main_dataset(folder_id, path=path)
+    dfp = get_positive_dataset(folder_id, path=path)
+    folder = str(folder_id)
+
+    erros = {}
+    erros['duplicidade'] = validar_duplicidade(df, dfp, COLS_DUPLICIDADE, folder=folder, save=save, path=path)
+    erros['datas'] = validar_datas(df, ['Emitido em'], folder=folder, save=save, path=path)
+    erros['validade'] = checar_validade(df, folder=folder, save=save, path=path)
+    erros['cpf_cnpj'] = validar_cpf_cnpj(df, folder=folder, save=save, path=path)
+    _, erros['cnpj_razao'] = validar_cnpj_razao(df, folder=folder, save=save, path=path, normalizar=True)
+
+    return erros
+
+
+'''
+Funcao auxiliar: baixa_pasta
+Finalidade: Baixar os dois arquivos de uma pasta (certidões e positivos), pulando os que já
+            estão em disco
+Parâmetros:
+       auth_token -> Token de autenticação no servidor do TCD
+              url -> Endereço do serviço das certidões
+    url_positivos -> Endereço do serviço dos positivos
+        folder_id -> Número da pasta
+             path -> Caminho onde os arquivos serão gravados
+        agendador -> Agendador das requisições (padrão: o compartilhado)
+Retorno: True se os dois arquivos estão em disco
+'''
+def baixa_pasta(auth_token, url, url_positivos, folder_id, path='', agendador=None):
+    arquivos = [('xlsx', url, path + 'caso-' + str(folder_id) + '.xlsx'),
+                ('csv', url_positivos, path + 'positivos-caso-' + str(folder_id) + '.csv')]
+
+    for formato, endereco, arquivo in arquivos:
+        if not os.path.exists(arquivo):
+            baixa_arquivo(auth_token, endereco, folder_id, formato, arquivo, agendador)
+
+    return all(os.path.exists(arquivo) for _, _, arquivo in arquivos)
+
+
+'''
+Funcao: executa_pipeline_async
+Finalidade: Baixar e validar várias pastas com as duas etapas sobrepostas: enquanto uma pasta
+            é validada, as próximas já estão sendo baixadas. Cada pasta baixada (certidões e
+            positivos) entra numa fila, e a validação começa assim que há um validador livre.
+            Uma pasta só começa a ser baixada se houver vaga: no máximo max_fila + validadores
+            pastas ficam entre o início do download e o fim da validação, então downloads
+            rápidos esperam a validação lenta, o que limita a memória/disco usados. O tempo
+            total tende ao da etapa mais lenta, e não à soma das duas
+            Em notebooks, usar "await executa_pipeline_async(...)"
+Parâmetros:
+       auth_token -> Token de autenticação no servidor do TCD
+              url -> Endereço do serviço das certidões
+          folders -> lista com os números das pastas
+             path -> Caminho onde os arquivos serão gravados
+    url_positivos -> Endereço do serviço dos positivos (padrão: o mesmo de url)
+           valida -> função(folder_id, path) da validação; precisa poder ser enviada a outro
+                     processo (função de módulo, não lambda)
+            baixa -> função(folder_id) do download (padrão: baixa_pasta com os dados acima)
+        downloads -> quantidade de downloads simultâneos (limitada também pelas vagas)
+         max_fila -> quantidade máxima de pastas baixadas (ou baixando) esperando validação
+      validadores -> quantidade de processos de validação
+        agendador -> Agendador das requisições (padrão: o compartilhado). O limite de taxa e a
+                     concorrência adaptativa dele valem para todos os downloads juntos
+Retorno: dicionário pasta -> resultado da validação, ou a exceção/mensagem de erro da pasta
+'''
+async def executa_pipeline_async(auth_token,
+                                 url,
+                                 folders,
+                                 path='',
+                                 url_positivos=None,
+                                 valida=valida_pasta,
+                                 baixa=None,
+                                 downloads=4,
+                                 max_fila=2,
+                                 validadores=1,
+                                 agendador=None):
+
+    loop = asyncio.get_running_loop()
+    folders = folders if type(folders) is list else [folders]
+    url_positivos = url_positivos or url
+    if baixa is None:
+        def baixa(folder_id):
+            return baixa_pasta(auth_token, url, url_positivos, folder_id, path, agendador)
+
+    fila = asyncio.Queue()
+    limite_downloads = asyncio.Semaphore(downloads)
+    # Vagas de pastas em andamento (baixando, na fila ou sendo validadas): a vaga é ocupada
+    # antes do download e só é liberada quando a validação da pasta termina
+    vagas = asyncio.Semaphore(max_fila + validadores)
+    resultados = {}
+
+    async def produtor(folder_id):
+        await vagas.acquire()   # espera aqui se a validação estiver atrasada
+        async with limite_downloads:
+            try:
+                ok = await loop.run_in_executor(pool_io, baixa, folder_id)
+            except Exception as e:
+                ok = False
+                resultados[folder_id] = e
+
+        if ok:
+            await fila.put(folder_id)
+        else:
+            vagas.release()
+            if folder_id not in resultados:
+                resultados[folder_id] = 'Download da pasta [ ' + str(folder_id) + ' ] não concluído'
+
+    async def consumidor():
+        while True:
+            folder_id = await fila.get()
+            if folder_id is _FIM:
+                break
+            try:
+                resultados[folder_id] = await loop.run_in_executor(pool_cpu, valida, folder_id, path)
+            except Exception as e:
+                resultados[folder_id] = e
+            finally:
+                vagas.release()
+
+    with ThreadPoolExecutor(max_workers=downloads) as pool_io, \
+         ProcessPoolExecutor(max_workers=validadores) as pool_cpu:
+
+        consumidores = [asyncio.ensure_future(consumidor()) for _ in range(validadores)]
+
+        await asyncio.gather(*[produtor(folder_id) for folder_id in folders])
+        for _ in consumidores:
+            await fila.put(_FIM)
+
+        await asyncio.gather(*consumidores)
+
+    return {folder_id: resultados[folder_id] for folder_id in folders}
+
+
+'''
+Funcao: executa_pipeline
+Finalidade: Versão síncrona de executa_pipeline_async, para scripts e jobs batch
+Parâmetros: os mesmos de executa_pipeline_async
+Retorno: dicionário pasta -> resultado da validação, ou a exceção/mensagem de erro da pasta
+'''
+@medir
+def executa_pipeline(auth_token, url, folders, path='', **kwargs):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(executa_pipeline_async(auth_token, url, folders, path, **kwargs))
+
+    raise RuntimeError('Já existe um loop asyncio rodando (ex.: notebook). '
+                       'Use "await executa_pipeline_async(...)"')
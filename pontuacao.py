@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir, fase
+from agregacao import ultimas_certidoes
+
+
+# Colunas de special-scores.xlsx, na ordem do segmento do fornecedor:
+# curva ABC (A, B, C) x Terceiro (S = 0, C = 1)
+SEGMENTOS = ['AS', 'BS', 'CS', 'AC', 'BC', 'CC']
+
+PESO_POSITIVA = 1.0   # peso de uma Positiva fora da tabela de pontuações especiais
+PESO_POS_NEG = 0.5    # peso de uma Pos./Neg., qualquer que seja o tipo de certidão
+
+# Limites da classificação, em fração da maior pontuação: (bom, ruim)
+LIMITES = (0.3, 0.7)
+
+
+'''
+Funcao: prepara_pontuacao
+Finalidade: Montar, uma vez só, a matriz fornecedor x tipo de certidão com os resultados das
+            últimas certidões e o segmento de cada fornecedor. A partir dela, a pontuação em
+            qualquer tabela de pesos é só um produto de matrizes (ver pontua_cenarios)
+Parâmetros:
+               df -> dataset com as certidões
+        suppliers -> cadastro de fornecedores (CNPJ_CPF, Classificação, Terceiro)
+          ultimas -> planilha das últimas certidões já calculada (opcional, evita recalcular)
+Retorno: dicionário com:
+         'cnpjs'     -> CPF/CNPJs das linhas das matrizes
+         'classes'   -> tipos de certidão das colunas (ex.: '160')
+         'positivas' -> matriz 0/1 com as certidões Positivas
+         'pos_neg'   -> matriz 0/1 com as certidões Pos./Neg.
+         'segmentos' -> índice do segmento de cada fornecedor em SEGMENTOS
+'''
+@medir
+def prepara_pontuacao(df, suppliers, ultimas=None):
+
+    df2 = ultimas_certidoes(df) if ultimas is None else ultimas
+    df2 = df2.drop(columns=['score'], errors='ignore')
+
+    cadastro = suppliers.drop_duplicates('CNPJ_CPF').set_index('CNPJ_CPF').reindex(df2.index)
+    sem_cadastro = cadastro['Classificação'].isna().to_numpy()
+    if sem_cadastro.any():
+        print('WARNING: ' + str(sem_cadastro.sum()) + ' CPF/CNPJ(s) fora do cadastro de fornecedores, '
+              'não pontuados: ' + ', '.join(df2.index[sem_cadastro][:5].astype(str)) +
+              (' ...' if sem_cadastro.sum() > 5 else ''))
+        df2 = df2[~sem_cadastro]
+        cadastro = cadastro[~sem_cadastro]
+
+    with fase('matriz de resultados', linhas_entrada=df2.shape[0]):
+        valores = df2.to_numpy()
+        curva = np.array([ord(c) - 65 for c in cadastro['Classificação'].astype(str)], dtype=np.int64)
+
+        matriz = {'cnpjs': df2.index.to_numpy(),
+                  'classes': [str(col).strip() for col in df2.columns],
+                  'positivas': (valores == 'Positiva').astype(np.float64),
+                  'pos_neg': (valores == 'Pos./Neg.').astype(np.float64),
+                  'segmentos': curva + 3 * cadastro['Terceiro'].astype(np.int64).to_numpy()}
+
+    return matriz
+
+
+'''
+Funcao: pesos_cenario
+Finalidade: Converter uma tabela de pontuações especiais (no formato de special-scores.xlsx) na
+            matriz segmento x tipo de certidão usada por pontua_cenarios
+Parâmetros:
+   special_scores -> dataframe com a coluna Certidão e uma coluna por segmento (SEGMENTOS)
+          classes -> tipos de certidão das colunas da matriz (ver prepara_pontuacao)
+Retorno: np.array (segmentos x tipos de certidão) com o peso de uma Positiva. Tipos de certidão
+         fora da tabela pesam PESO_POSITIVA; um peso vazio ou não numérico de um tipo que está na
+         tabela gera ValueError, em vez de virar PESO_POSITIVA sem aviso
+'''
+def pesos_cenario(special_scores, classes):
+
+    tabela = special_scores.set_index(special_scores.columns[0])
+    tabela.index = tabela.index.astype(str).str.strip()
+
+    faltando = [seg for seg in SEGMENTOS if seg not in tabela.columns]
+    if faltando:
+        raise ValueError('Tabela de pontuações especiais sem as colunas: ' + ', '.join(faltando))
+
+    tabela = tabela[SEGMENTOS].apply(pd.to_numeric, errors='coerce')
+    invalidos = tabela.isna().stack()
+    invalidos = invalidos[invalidos]
+    if not invalidos.empty:
+        raise ValueError('Pesos vazios ou inválidos na tabela de pontuações especiais: ' +
+                         ', '.join(f'{cert}/{seg}' for cert, seg in invalidos.index[:5]) +
+                         (' ...' if len(invalidos) > 5 else ''))
+
+    return tabela.reindex(classes).fillna(PESO_POSITIVA).to_numpy(dtype=np.float64).T
+
+
+'''
+Funcao: pontua_cenarios
+Finalidade: Pontuar os fornecedores em vários cenários de pesos de uma vez. Cada fornecedor
+            soma o peso (do seu segmento) de cada Positiva e PESO_POS_NEG de cada Pos./Neg.
+Parâmetros:
+           matriz -> resultado de prepara_pontuacao
+         cenarios -> dicionário nome -> tabela de pontuações especiais (formato de
+                     special-scores.xlsx), ou uma tabela só
+Retorno: dataframe com os CPF/CNPJs no índice e uma coluna de pontuação por cenário
+'''
+@medir
+def pontua_cenarios(matriz, cenarios):
+
+    if isinstance(cenarios, pd.DataFrame):
+        cenarios = {'score': cenarios}
+
+    if len(matriz['cnpjs']) == 0:   # nenhum fornecedor do cadastro nas certidões
+        return pd.DataFrame(index=matriz['cnpjs'], columns=list(cenarios.keys()), dtype=np.float64)
+
+    # pesos: cenários x segmentos x tipos de certidão
+    pesos = np.stack([pesos_cenario(tabela, matriz['classes']) for tabela in cenarios.values()])
+
+    with fase('produto de matrizes', linhas_entrada=len(matriz['cnpjs'])):
+        # Cada fornecedor usa a linha de pesos do seu segmento
+        positivas = np.einsum('nc,knc->nk', matriz['positivas'], pesos[:, matriz['segmentos'], :])
+        pos_neg = matriz['pos_neg'].sum(axis=1, keepdims=True) * PESO_POS_NEG
+
+    return pd.DataFrame(positivas + pos_neg, index=matriz['cnpjs'], columns=list(cenarios.keys()))
+
+
+'''
+Funcao: classifica_pontuacao
+Finalidade: Classificar as pontuações em relação à maior pontuação de cada cenário: 'red' acima
+            do limite ruim, 'green' até o limite bom e 'yellow' entre os dois
+Parâmetros:
+           scores -> series ou dataframe (uma coluna por cenário) com as pontuações
+          limites -> tupla (bom, ruim), em fração da maior pontuação
+Retorno: objeto do mesmo formato de scores, com as classificações
+'''
+def classifica_pontuacao(scores, limites=LIMITES):
+
+    valores = scores.to_numpy(dtype=np.float64)
+    maximo = np.nanmax(valores, axis=0) if len(valores) else np.nan
+    classes = np.where(valores > maximo * limites[1], 'red',
+                       np.where(valores <= maximo * limites[0], 'green', 'yellow'))
+
+    if isinstance(scores, pd.Series):
+        return pd.Series(classes, index=scores.index, name=scores.name)
+
+    return pd.DataFrame(classes, index=scores.index, columns=scores.columns)
+
+
+'''
+Funcao: compara_cenarios
+Finalidade: Comparar lado a lado a pontuação e a classificação dos fornecedores em vários
+            cenários de pesos e de limites
+Parâmetros:
+           matriz -> resultado de prepara_pontuacao
+         cenarios -> dicionário nome -> tabela de pontuações especiais
+          limites -> dicionário nome -> tupla (bom, ruim), ou uma tupla só para todos
+Retorno: tupla (detalhe, resumo):
+         detalhe -> dataframe por CPF/CNPJ, com colunas (cenário, limite) x ('score', 'classe') e
+                    a coluna 'Muda' indicando os fornecedores que mudam de classificação
+         resumo  -> quantidade de fornecedores em cada classificação, por cenário e limite
+'''
+@medir
+def compara_cenarios(matriz, cenarios, limites=LIMITES):
+
+    if type(limites) is tuple:
+        limites = {str(limites): limites}
+
+    scores = pontua_cenarios(matriz, cenarios)
+
+    partes = {}
+    for nome in scores.columns:
+        for nome_limite, limite in limites.items():
+            partes[(nome, nome_limite, 'score')] = scores[nome]
+            partes[(nome, nome_limite, 'classe')] = classifica_pontuacao(scores[nome], limite)
+
+    detalhe = pd.DataFrame(partes)
+    classes = detalhe.xs('classe', axis=1, level=2)
+    detalhe['Muda'] = classes.nunique(axis=1) > 1
+
+    resumo = classes.apply(lambda col: col.value_counts()).reindex(['green', 'yellow', 'red']).fillna(0).astype(int)
+
+    return detalhe, resumo
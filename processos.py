@@ -0,0 +1,223 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir, fase
+from documentos import COL_CHAVE, normaliza_digitos
+from carregadores import get_main_dataset, get_positive_dataset
+
+
+COL_PROCESSO = 'Número do Processo'
+COL_NOME = 'Nome'
+COL_CNPJ = 'Consultado (CPF/CNPJ)'
+
+# Tamanho do número único de processo do CNJ (NNNNNNN-DD.AAAA.J.TR.OOOO), só com dígitos
+DIGITOS_PROCESSO = 20
+
+
+'''
+Funcao auxiliar: normaliza_processo
+Finalidade: Normalizar os números de processo para uma chave só com dígitos, com os zeros à
+            esquerda completados (mesma forma para '0001234-...' e '1234-...'). O cálculo é feito
+            sobre os valores distintos da coluna
+Parâmetros:
+            serie -> coluna com os números de processo
+Retorno: series com as chaves (nula quando não há dígitos)
+'''
+def normaliza_processo(serie):
+    cat = serie.astype('category').cat
+    digitos = pd.Index(cat.categories).astype(str).str.replace(r'\D', '', regex=True)
+    chaves = np.where(digitos.str.len() == 0, None, digitos.str.zfill(DIGITOS_PROCESSO)).astype(object)
+
+    codigos = cat.codes.to_numpy()
+    return pd.Series(np.where(codigos >= 0, chaves[codigos], None), index=serie.index, name='Processo')
+
+
+'''
+Funcao auxiliar: formata_processo
+Finalidade: Formatar uma chave de processo (20 dígitos) no padrão do CNJ
+Parâmetros:
+            chave -> chave só com dígitos
+Retorno: string formatada (a própria chave, se não tiver 20 dígitos)
+'''
+def formata_processo(chave):
+    if len(chave) != DIGITOS_PROCESSO:
+        return chave
+    return chave[0:7] + '-' + chave[7:9] + '.' + chave[9:13] + '.' + chave[13] + '.' + chave[14:16] + '.' + chave[16:20]
+
+
+'''
+Funcao: monta_indice_processos
+Finalidade: Montar o índice invertido dos processos das certidões positivas: processo ->
+            certidões/CPF/CNPJs e certidão -> processos (ordenados). Monta-se uma vez por carga,
+            e as consultas (quem compartilha um processo, processos novos, assinatura de
+            processos usada em validar_duplicidade) passam a ser buscas no índice, sem varrer dfp
+Parâmetros:
+              dfp -> dataset com as anotações positivas
+               df -> dataset das certidões (opcional), para ligar cada certidão ao seu CPF/CNPJ
+Retorno: dicionário com:
+         'pares'        -> dataframe (Processo, Nome[, Chave CPF/CNPJ]) sem repetições, ordenado
+         'por_processo' -> dicionário processo -> posições em 'pares'
+         'por_certidao' -> series Nome -> tupla ordenada dos processos
+'''
+@medir
+def monta_indice_processos(dfp, df=None):
+
+    with fase('índice de processos', linhas_entrada=dfp.shape[0]) as f:
+        pares = pd.DataFrame({'Processo': normaliza_processo(dfp[COL_PROCESSO]),
+                              COL_NOME: dfp[COL_NOME].astype(object)})
+        pares = pares.dropna().drop_duplicates()
+
+        if df is not None:
+            certidoes = df[[COL_NOME, COL_CNPJ]].astype(object).drop_duplicates(COL_NOME)
+            chaves = normaliza_digitos(certidoes[COL_CNPJ].fillna(''))
+            pares[COL_CHAVE] = pares[COL_NOME].map(pd.Series(chaves, index=certidoes[COL_NOME].to_numpy()))
+
+        indice = indice_de_pares(pares)
+        f.linhas_saida = pares.shape[0]
+
+    return indice
+
+
+'''
+Funcao: indice_de_pares
+Finalidade: Reconstruir o índice a partir da tabela de pares já normalizada (ex.: lida do disco)
+Parâmetros:
+            pares -> dataframe com as colunas Processo, Nome e, opcionalmente, Chave CPF/CNPJ
+Retorno: o índice (ver monta_indice_processos)
+'''
+def indice_de_pares(pares):
+    pares = pares.sort_values(['Processo', COL_NOME]).reset_index(drop=True)
+
+    return {'pares': pares,
+            'por_processo': pares.groupby('Processo').indices,
+            'por_certidao': pares.groupby(COL_NOME)['Processo'].agg(tuple)}
+
+
+'''
+Funcao: certidoes_do_processo
+Finalidade: Consultar as certidões (e os CPF/CNPJs, se o índice tiver) de um processo
+Parâmetros:
+           indice -> índice de processos
+         processo -> número do processo, formatado ou não
+Retorno: dataframe com as linhas do índice daquele processo
+'''
+def certidoes_do_processo(indice, processo):
+    chave = normaliza_processo(pd.Series([processo])).iloc[0]
+    posicoes = indice['por_processo'].get(chave, [])
+
+    return indice['pares'].iloc[posicoes]
+
+
+'''
+Funcao: processos_da_certidao
+Finalidade: Consultar os processos de uma certidão
+Parâmetros:
+           indice -> índice de processos
+             nome -> Nome do arquivo da certidão
+Retorno: tupla ordenada com os processos (vazia se a certidão não tiver processos)
+'''
+def processos_da_certidao(indice, nome):
+    return indice['por_certidao'].get(nome, ())
+
+
+'''
+Funcao: assinatura_processos
+Finalidade: Montar, para várias certidões de uma vez, a assinatura dos seus processos (os
+            processos ordenados e concatenados), usada para comparar certidões duplicadas
+Parâmetros:
+           indice -> índice de processos
+            nomes -> Nomes dos arquivos das certidões
+Retorno: lista com as assinaturas ('' para certidões sem processos)
+'''
+def assinatura_processos(indice, nomes):
+    assinaturas = indice['por_certidao'].map(''.join)
+    return pd.Series(nomes).map(assinaturas).fillna('').tolist()
+
+
+'''
+Funcao: processos_compartilhados
+Finalidade: Encontrar os processos que aparecem em certidões de CPF/CNPJs diferentes
+            (ligações entre fornecedores)
+Parâmetros:
+           indice -> índice de processos, montado com o df das certidões
+           minimo -> quantidade mínima de CPF/CNPJs distintos no processo
+Retorno: dataframe com o processo (formatado), a quantidade e a lista dos CPF/CNPJs
+'''
+def processos_compartilhados(indice, minimo=2):
+    pares = indice['pares'].dropna(subset=[COL_CHAVE])
+    cnpjs = pares.groupby('Processo')[COL_CHAVE].agg(lambda x: sorted(set(x)))
+    qtd = cnpjs.map(len)
+    cnpjs = cnpjs[qtd >= minimo]
+
+    return pd.DataFrame({COL_PROCESSO: [formata_processo(p) for p in cnpjs.index],
+                         'Quantidade': qtd[qtd >= minimo].to_numpy(),
+                         'CPF/CNPJs': cnpjs.to_numpy()}).sort_values('Quantidade', ascending=False, kind='stable')
+
+
+'''
+Funcao: processos_novos
+Finalidade: Listar os processos de um índice que não aparecem em outro (ex.: os processos que
+            surgiram desde a última pasta)
+Parâmetros:
+           indice -> índice atual
+         anterior -> índice de referência
+Retorno: dataframe com as linhas do índice atual cujos processos são novos
+'''
+def processos_novos(indice, anterior):
+    pares = indice['pares']
+    return pares[~pares['Processo'].isin(list(anterior['por_processo'].keys()))]
+
+
+'''
+Funcao: salva_indice_processos
+Finalidade: Gravar o índice de uma pasta junto com os arquivos dela (indice-processos-caso-<id>.csv)
+Parâmetros:
+           indice -> índice de processos
+           folder -> número da pasta
+             path -> Caminho onde estão os arquivos da pasta
+Retorno: nome do arquivo gravado
+'''
+def salva_indice_processos(indice, folder, path=''):
+    arquivo = path + 'indice-processos-caso-' + str(folder) + '.csv'
+    indice['pares'].to_csv(arquivo, index=False)
+
+    return arquivo
+
+
+'''
+Funcao: indice_processos
+Finalidade: Obter o índice de processos de uma ou mais pastas. O índice de cada pasta é lido do
+            disco se já existir e for mais novo que os arquivos da pasta que existem; senão é
+            montado e gravado (vazio, para pasta sem arquivo de positivos)
+Parâmetros:
+          folders -> Número da pasta, ou lista de pastas
+             path -> Caminho onde estão os arquivos
+Retorno: o índice de processos das pastas
+'''
+@medir
+def indice_processos(folders_, path=''):
+
+    folders = folders_ if type(folders_) is list else [folders_]
+    partes = []
+    for folder_id in folders:
+        arquivo = path + 'indice-processos-caso-' + str(folder_id) + '.csv'
+        fontes = [path + 'caso-' + str(folder_id) + '.xlsx', path + 'positivos-caso-' + str(folder_id) + '.csv']
+
+        existentes = [f for f in fontes if os.path.exists(f)]   # pasta pode vir sem o arquivo de positivos
+
+        if os.path.exists(arquivo) and all(os.path.getmtime(arquivo) >= os.path.getmtime(f) for f in existentes):
+            partes.append(pd.read_csv(arquivo, dtype=str))
+        else:
+            if fontes[1] in existentes:
+                dfp = get_positive_dataset(folder_id, path=path)
+            else:
+                print(f'WARNING: pasta { folder_id } sem arquivo de positivos, índice de processos vazio.')
+                dfp = pd.DataFrame(columns=[COL_NOME, COL_PROCESSO])
+            df = get_main_dataset(folder_id, path=path) if fontes[0] in existentes else None
+            indice = monta_indice_processos(dfp, df)
+            salva_indice_processos(indice, folder_id, path)
+            partes.append(indice['pares'])
+
+    return indice_de_pares(pd.concat(partes, ignore_index=True).drop_duplicates())
@@ -0,0 +1,337 @@
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir, fase
+
+
+# Peso (quantidade de fichas) de cada coluna no conjunto de uma certidão. Colunas que separam
+# certidões diferentes pesam mais, para que uma diferença nelas derrube a similaridade
+PESOS = {'Classificação': 3, 'Resultado': 3, 'Consultado (CPF/CNPJ)': 3}
+PESO_PADRAO = 2
+
+LIMIAR = 0.8         # similaridade (Jaccard) mínima entre quase duplicadas
+PERMUTACOES = 96     # tamanho da assinatura MinHash
+BANDAS = 16          # bandas do LSH, de 6 linhas: pares com similaridade 0.8 caem juntos em 99% dos casos
+MAX_BALDE = 100      # baldes maiores que isso geram pares em estrela, e não todos com todos
+BLOCO = 8            # permutações calculadas de uma vez (limita a memória)
+FOLGA = 0.15         # candidatos com similaridade estimada abaixo de LIMIAR - FOLGA nem são verificados
+BLOCO_PARES = 100000 # pares estimados de uma vez (limita a memória)
+
+_MISTURA = np.uint64(0x9E3779B97F4A7C15)
+
+
+'''
+Funcao auxiliar: hash_textos
+Finalidade: Calcular o hash de 64 bits de textos, salgado pelo nome do campo, para que o mesmo
+            valor em colunas diferentes gere fichas diferentes. O cálculo é feito sobre os
+            valores distintos
+Parâmetros:
+          valores -> array ou series com os textos
+              sal -> texto que identifica o campo (ex.: 'Resultado#0')
+Retorno: np.array (uint64) com os hashes
+'''
+def hash_textos(valores, sal):
+    codigos, distintos = pd.factorize(np.asarray(valores), use_na_sentinel=False)
+    hashes = pd.util.hash_array(np.asarray(distintos).astype(str).astype(object))
+    semente = pd.util.hash_array(np.array([sal], dtype=object))[0]
+
+    return ((hashes ^ semente) * _MISTURA)[codigos]
+
+
+'''
+Funcao auxiliar: normaliza_valores
+Finalidade: Normalizar os valores de uma coluna para a comparação: maiúsculo, sem espaços e sem
+            pontuação ('12.345.678/0001-90' e '12345678 0001 90' ficam iguais)
+Parâmetros:
+            serie -> coluna do dataset
+Retorno: np.array com os valores normalizados (nulos viram '<nulo>')
+'''
+def normaliza_valores(serie):
+    codigos, distintos = pd.factorize(serie.astype(object), use_na_sentinel=True)
+    normalizados = pd.Index(distintos).astype(str).str.upper().str.replace(r'[\W_]+', '', regex=True).to_numpy(dtype=object)
+
+    return np.where(codigos >= 0, normalizados[np.maximum(codigos, 0)] if len(normalizados) else '', '<nulo>')
+
+
+'''
+Funcao auxiliar: dias_datas
+Finalidade: Converter as datas ('dd/mm/aaaa') de uma coluna em números de dias
+Parâmetros:
+            serie -> coluna do dataset
+Retorno: np.array (float) com os dias, nan onde o valor não é uma data
+'''
+def dias_datas(serie):
+    codigos, distintos = pd.factorize(serie.astype(object), use_na_sentinel=True)
+    datas = pd.to_datetime(pd.Series(distintos, dtype=object).astype(str), format='%d/%m/%Y', errors='coerce')
+    dias = (datas - pd.Timestamp('1970-01-01')).dt.days.to_numpy(dtype=np.float64)
+
+    return np.where(codigos >= 0, dias[np.maximum(codigos, 0)] if len(dias) else np.nan, np.nan)
+
+
+'''
+Funcao: fichas_certidoes
+Finalidade: Montar o conjunto de fichas (shingles) de cada certidão:
+            - cada coluna verificada entra com o valor normalizado, repetido conforme o peso
+            - datas entram como dois baldes de 2 dias (dia // 2 e (dia + 1) // 2): uma diferença
+              de um dia troca só uma das duas fichas
+            - certidões positivas entram também com cada um dos seus processos (a ordem e um
+              processo a mais ou a menos pouco mudam o conjunto)
+Parâmetros:
+               df -> dataset com as certidões
+    cols_to_check -> lista com as colunas verificadas
+           indice -> índice de processos (ver processos.monta_indice_processos), opcional
+Retorno: tupla (linhas, fichas) de arrays do mesmo tamanho, ordenados por linha e sem
+         repetições: a posição da certidão em df e o hash da ficha
+'''
+@medir
+def fichas_certidoes(df, cols_to_check, indice=None):
+
+    n = df.shape[0]
+    posicoes = np.arange(n)
+    linhas, fichas = [], []
+
+    def acrescenta(onde, hashes):
+        linhas.append(posicoes[onde])
+        fichas.append(hashes[onde])
+
+    for col in cols_to_check:
+        dias = dias_datas(df[col])
+        data = ~np.isnan(dias)
+        if data.any():
+            dias_int = np.nan_to_num(dias).astype(np.int64)
+            acrescenta(data, hash_textos(dias_int // 2, col + '#b0'))
+            acrescenta(data, hash_textos((dias_int + 1) // 2, col + '#b1'))
+
+        valores = normaliza_valores(df[col])
+        for i in range(PESOS.get(col, PESO_PADRAO) if not data.all() else 0):
+            acrescenta(~data, hash_textos(valores, col + '#' + str(i)))
+
+    if indice is not None:
+        positivas = (df['Resultado'] == 'Positiva').to_numpy()
+        processos = df['Nome'].astype(object).map(indice['por_certidao']).to_numpy()
+        tem = positivas & pd.notna(processos)
+        quantidades = np.array([len(p) for p in processos[tem]], dtype=np.int64)
+        if quantidades.sum() > 0:
+            linhas.append(np.repeat(posicoes[tem], quantidades))
+            fichas.append(hash_textos(np.concatenate([np.asarray(p, dtype=object) for p in processos[tem]]), 'processo'))
+
+    linhas = np.concatenate(linhas) if linhas else np.zeros(0, dtype=np.int64)
+    fichas = np.concatenate(fichas) if fichas else np.zeros(0, dtype=np.uint64)
+
+    linhas, fichas = linhas.astype(np.int64), fichas.astype(np.uint64)
+    ordem = np.lexsort((fichas, linhas))
+    linhas, fichas = linhas[ordem], fichas[ordem]
+    unicas = np.ones(len(linhas), dtype=bool)
+    unicas[1:] = (linhas[1:] != linhas[:-1]) | (fichas[1:] != fichas[:-1])
+
+    return linhas[unicas], fichas[unicas]
+
+
+'''
+Funcao: assinaturas_minhash
+Finalidade: Calcular a assinatura MinHash de cada certidão: para cada permutação (hash
+            multiplicativo aleatório), o menor valor entre as fichas da certidão. A fração de
+            posições iguais entre duas assinaturas estima a similaridade de Jaccard dos conjuntos
+Parâmetros:
+           linhas -> posição da certidão de cada ficha (ordenado)
+           fichas -> hash de cada ficha
+                n -> quantidade de certidões
+      permutacoes -> tamanho da assinatura
+          semente -> semente das permutações
+Retorno: np.array (n x permutacoes, uint32); certidões sem fichas ficam com o valor máximo
+'''
+@medir
+def assinaturas_minhash(linhas, fichas, n, permutacoes=PERMUTACOES, semente=0):
+
+    rng = np.random.default_rng(semente)
+    a = rng.integers(1, 2**63, size=permutacoes, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=permutacoes, dtype=np.uint64)
+
+    assinaturas = np.full((n, permutacoes), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if len(linhas) == 0:
+        return assinaturas
+
+    inicio = np.flatnonzero(np.r_[True, linhas[1:] != linhas[:-1]])
+    with fase('minhash', linhas_entrada=len(fichas)):
+        for k in range(0, permutacoes, BLOCO):
+            # hash multiplicativo (multiply-shift): os 32 bits altos de a * x + b, módulo 2**64
+            valores = ((fichas[:, None] * a[None, k:k + BLOCO] + b[None, k:k + BLOCO]) >> np.uint64(32)).astype(np.uint32)
+            assinaturas[linhas[inicio], k:k + BLOCO] = np.minimum.reduceat(valores, inicio, axis=0)
+
+    return assinaturas
+
+
+'''
+Funcao: pares_lsh
+Finalidade: Encontrar os pares candidatos por LSH: a assinatura é dividida em bandas, e
+            certidões com alguma banda inteira igual caem no mesmo balde. Pares com similaridade
+            alta quase sempre coincidem em alguma banda, e pares distantes quase nunca, sem
+            comparar todos com todos
+Parâmetros:
+      assinaturas -> assinaturas MinHash (ver assinaturas_minhash)
+           bandas -> quantidade de bandas
+        max_balde -> baldes maiores que isso geram pares em estrela (o primeiro com os demais)
+Retorno: np.array (m x 2) com os pares (i, j), i < j, sem repetições
+'''
+@medir
+def pares_lsh(assinaturas, bandas=BANDAS, max_balde=MAX_BALDE):
+
+    n, permutacoes = assinaturas.shape
+    por_banda = permutacoes // bandas
+    pares = []
+
+    for banda in range(bandas):
+        trecho = pd.DataFrame(assinaturas[:, banda * por_banda:(banda + 1) * por_banda])
+        chaves = pd.util.hash_pandas_object(trecho, index=False).to_numpy()
+
+        ordem = np.argsort(chaves, kind='stable')
+        chaves = chaves[ordem]
+        inicio = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]])
+        tamanho = np.diff(np.r_[inicio, n])
+
+        # baldes com duas certidões (a grande maioria) geram seu par de uma vez
+        dois = inicio[tamanho == 2]
+        pares.append(np.sort(np.column_stack([ordem[dois], ordem[dois + 1]]), axis=1))
+
+        for ini, tam in zip(inicio[tamanho > 2], tamanho[tamanho > 2]):
+            membros = np.sort(ordem[ini:ini + tam])
+            if tam <= max_balde:
+                i, j = np.triu_indices(tam, 1)
+                pares.append(np.column_stack([membros[i], membros[j]]))
+            else:
+                pares.append(np.column_stack([np.full(tam - 1, membros[0]), membros[1:]]))
+
+    pares = np.concatenate(pares).astype(np.int64) if pares else np.zeros((0, 2), dtype=np.int64)
+    codigos = np.unique(pares[:, 0] * n + pares[:, 1])
+
+    return np.column_stack([codigos // n, codigos % n])
+
+
+'''
+Funcao: estimativas_minhash
+Finalidade: Estimar a similaridade de Jaccard de cada par pela fração de posições iguais nas
+            assinaturas, bem mais barato que a similaridade exata. Serve para descartar os
+            candidatos do LSH claramente distantes antes da verificação
+Parâmetros:
+      assinaturas -> assinaturas MinHash (ver assinaturas_minhash)
+            pares -> np.array (m x 2) com os pares
+Retorno: np.array (float) com a similaridade estimada de cada par
+'''
+def estimativas_minhash(assinaturas, pares):
+
+    estimativas = np.zeros(len(pares))
+    for k in range(0, len(pares), BLOCO_PARES):
+        bloco = pares[k:k + BLOCO_PARES]
+        estimativas[k:k + BLOCO_PARES] = (assinaturas[bloco[:, 0]] == assinaturas[bloco[:, 1]]).mean(axis=1)
+
+    return estimativas
+
+
+'''
+Funcao auxiliar: similaridades
+Finalidade: Calcular a similaridade de Jaccard exata dos conjuntos de fichas de cada par, sem
+            laço: as fichas das duas certidões de cada par são juntadas e ordenadas, e as
+            repetidas dentro do mesmo par são a interseção
+Parâmetros:
+           linhas -> posição da certidão de cada ficha (ordenado)
+           fichas -> hash de cada ficha (sem repetições dentro da certidão)
+            pares -> np.array (m x 2) com os pares
+Retorno: np.array (float) com a similaridade de cada par
+'''
+def similaridades(linhas, fichas, pares):
+
+    inicio = np.searchsorted(linhas, pares, side='left')
+    tamanho = np.searchsorted(linhas, pares, side='right') - inicio
+
+    # posições das fichas de cada certidão, rotuladas com o número do par
+    tam = tamanho.ravel()
+    desloc = np.repeat(inicio.ravel() - np.cumsum(np.r_[0, tam[:-1]]), tam)
+    posicoes = desloc + np.arange(tam.sum())
+    rotulos = np.repeat(np.repeat(np.arange(len(pares)), 2), tam)
+
+    valores = fichas[posicoes]
+    ordem = np.lexsort((valores, rotulos))
+    rotulos, valores = rotulos[ordem], valores[ordem]
+    repetidas = (rotulos[1:] == rotulos[:-1]) & (valores[1:] == valores[:-1])
+    comum = np.bincount(rotulos[1:][repetidas], minlength=len(pares))
+
+    uniao = tamanho.sum(axis=1) - comum
+    return np.divide(comum, uniao, out=np.zeros(len(pares)), where=uniao > 0)
+
+
+'''
+Funcao: grupos_quase_duplicadas
+Finalidade: Confirmar os pares candidatos com a similaridade de Jaccard exata dos conjuntos de
+            fichas e agrupar (union-find) os pares acima do limiar
+Parâmetros:
+           linhas -> posição da certidão de cada ficha (ordenado)
+           fichas -> hash de cada ficha
+           pares -> pares candidatos (ver pares_lsh)
+           limiar -> similaridade mínima
+Retorno: dicionário posição da certidão -> (raiz do grupo, maior similaridade com outra do grupo)
+'''
+def grupos_quase_duplicadas(linhas, fichas, pares, limiar=LIMIAR):
+
+    with fase('similaridade exata', linhas_entrada=len(pares)) as f:
+        similaridade = similaridades(linhas, fichas, pares)
+        acima = similaridade >= limiar
+        pares, similaridade = pares[acima], similaridade[acima]
+        f.linhas_saida = len(pares)
+
+    pai = {}
+
+    def raiz(i):
+        while pai.get(i, i) != i:
+            pai[i] = pai.get(pai[i], pai[i])
+            i = pai[i]
+        return i
+
+    maior = {}
+    for (i, j), s in zip(pares.tolist(), similaridade.tolist()):
+        maior[i] = max(maior.get(i, 0.0), s)
+        maior[j] = max(maior.get(j, 0.0), s)
+        ri, rj = raiz(i), raiz(j)
+        if ri != rj:
+            pai[max(ri, rj)] = min(ri, rj)   # a raiz é sempre a primeira certidão do grupo
+
+    return {i: (raiz(i), s) for i, s in maior.items()}
+
+
+'''
+Funcao: quase_duplicadas
+Finalidade: Encontrar certidões quase duplicadas (espaços, processos fora de ordem ou faltando,
+            emissão com um dia de diferença) em tempo próximo do linear: fichas por certidão,
+            MinHash, LSH por bandas, descarte dos candidatos com similaridade estimada baixa e
+            confirmação pela similaridade exata dos demais
+Parâmetros:
+               df -> dataset com as certidões
+    cols_to_check -> lista com as colunas verificadas
+           indice -> índice de processos (opcional)
+    col_to_report -> coluna que será informada no caso de erro
+           limiar -> similaridade (Jaccard) mínima
+      permutacoes -> tamanho da assinatura MinHash
+           bandas -> quantidade de bandas do LSH
+Retorno: dataframe com Grupo, Url, Mensagem e Similaridade (a maior similaridade da certidão com
+         outra do grupo; 1.0 para duplicadas exatas), no mesmo formato de validar_duplicidade
+'''
+@medir
+def quase_duplicadas(df, cols_to_check, indice=None, col_to_report='Url', limiar=LIMIAR,
+                     permutacoes=PERMUTACOES, bandas=BANDAS):
+
+    linhas, fichas = fichas_certidoes(df, cols_to_check, indice)
+    assinaturas = assinaturas_minhash(linhas, fichas, df.shape[0], permutacoes)
+    pares = pares_lsh(assinaturas, bandas)
+    with fase('estimativa minhash', linhas_entrada=len(pares)) as f:
+        pares = pares[estimativas_minhash(assinaturas, pares) >= limiar - FOLGA]
+        f.linhas_saida = len(pares)
+    grupos = grupos_quase_duplicadas(linhas, fichas, pares, limiar)
+
+    posicoes = sorted(grupos, key=lambda i: (grupos[i][0], i))
+    numeros = {raiz: n + 1 for n, raiz in enumerate(sorted(set(r for r, _ in grupos.values())))}
+    reportar = df[col_to_report].to_numpy()
+
+    return pd.DataFrame({'Grupo': [numeros[grupos[i][0]] for i in posicoes],
+                         'Url': [reportar[i] for i in posicoes],
+                         'Mensagem': ['Possível certidão duplicada' if grupos[i][1] == 1.0
+                                      else 'Possível certidão duplicada (aproximada)' for i in posicoes],
+                         'Similaridade': [round(grupos[i][1], 3) for i in posicoes]})
@@ -0,0 +1,414 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from carregadores import get_main_dataset, get_positive_dataset, read_parameters
+from agregacao import resultados_do_mapa, conta_cubo, combina_cubos, mes_iso
+from pipeline import COLS_DUPLICIDADE
+
+
+PORTA = 8765
+CAPACIDADE = 8   # pastas mantidas em memória (dados, índices, cubo e validação)
+ROTAS = ['/valida', '/pontua', '/mapa', '/estado']
+
+
+class ErroRequisicao(ValueError):
+    '''Requisição inválida (parâmetro faltando ou mal formado): respondida com 400'''
+
+
+class SelecaoVazia(LookupError):
+    '''Os filtros da requisição não deixaram nenhuma certidão: respondida com 404'''
+
+
+class CacheLRU:
+    '''
+    Cache com descarte do item usado há mais tempo (LRU), seguro entre threads. O valor é
+    calculado fora da trava, então requisições de chaves diferentes não esperam umas pelas outras
+    '''
+    def __init__(self, capacidade=CAPACIDADE):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.estatisticas = {'acertos': 0, 'faltas': 0, 'descartes': 0}
+        self._trava = threading.Lock()
+
+    def obtem(self, chave, calcula):
+        with self._trava:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                self.estatisticas['acertos'] += 1
+                return self.itens[chave]
+            self.estatisticas['faltas'] += 1
+
+        valor = calcula()
+
+        with self._trava:
+            self.itens[chave] = valor
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.capacidade:
+                self.itens.popitem(last=False)
+                self.estatisticas['descartes'] += 1
+
+        return valor
+
+    def descarta(self, chave):
+        with self._trava:
+            self.itens.pop(chave, None)
+
+    def limpa(self):
+        with self._trava:
+            self.itens.clear()
+
+    def resumo(self):
+        with self._trava:
+            return {'itens': list(self.itens.keys()), **self.estatisticas}
+
+
+'''
+Funcao auxiliar: versao_arquivos
+Finalidade: Identificar a versão de um conjunto de arquivos pela data de modificação, para que
+            o cache nunca devolva dados de um arquivo que mudou em disco
+Parâmetros:
+         arquivos -> lista com os caminhos dos arquivos
+Retorno: tupla com as datas de modificação (None para arquivo inexistente)
+'''
+def versao_arquivos(arquivos):
+    return tuple(os.path.getmtime(a) if os.path.exists(a) else None for a in arquivos)
+
+
+'''
+Funcao auxiliar: tabela_json / json_tabela
+Finalidade: Converter um dataframe para o formato JSON das respostas do serviço (e de volta)
+Parâmetros:
+               df -> dataframe (tabela_json) ou dicionário da resposta (json_tabela)
+Retorno: dicionário com 'columns', 'index' e 'data' / dataframe
+'''
+def tabela_json(df):
+    return json.loads(df.to_json(orient='split', date_format='iso', force_ascii=False))
+
+
+def json_tabela(tabela):
+    return pd.DataFrame(tabela['data'], index=tabela['index'], columns=tabela['columns'])
+
+
+class Servico:
+    '''
+    Estado do serviço de validação: mantém em memória, com descarte LRU, as pastas já lidas (e o
+    índice de processos, o agrupamento de nomes, o cubo de contagens e o resultado da validação de
+    cada uma), além do cadastro de fornecedores e da tabela de pontuações especiais. Cada item é
+    identificado pela versão dos arquivos de origem, então um arquivo alterado é lido de novo.
+    Os mapas já renderizados também ficam guardados (o arquivo salvo), por pastas e filtros
+    '''
+    def __init__(self, path='', capacidade=CAPACIDADE, fornecedores=None, pontuacoes=None):
+        self.path = path
+        self.arquivo_fornecedores = fornecedores or (path + 'suppliers.xlsx')
+        self.arquivo_pontuacoes = pontuacoes or (path + 'special-scores.xlsx')
+        self.pastas = CacheLRU(capacidade)
+        self.validacoes = CacheLRU(capacidade)
+        self.parametros = CacheLRU(4)
+        self.mapas = CacheLRU(capacidade)
+        self.inicio = time.time()
+        self._trava_graficos = threading.Lock()   # o matplotlib não é seguro entre threads
+
+    def aquece(self):
+        # Paga as importações pesadas uma vez, na subida, e não na primeira requisição
+        import validadores, documentos, correspondencia, agrupamento, processos   # noqa: F401
+        from fuzzywuzzy import fuzz   # noqa: F401
+        from matplotlib.backends.backend_agg import FigureCanvasAgg   # noqa: F401
+        import graficos
+        graficos.modo_headless(True)
+
+    def _fontes(self, folder_id):
+        return [self.path + 'caso-' + str(folder_id) + '.xlsx', self.path + 'positivos-caso-' + str(folder_id) + '.csv']
+
+    def pasta(self, folder_id):
+        from processos import monta_indice_processos
+        from agrupamento import agrupa_nomes
+
+        def carrega():
+            df = get_main_dataset(folder_id, path=self.path)
+            dfp = get_positive_dataset(folder_id, path=self.path)
+            return {'df': df,
+                    'dfp': dfp,
+                    'indice': monta_indice_processos(dfp),
+                    'grupos': agrupa_nomes(df)[0],
+                    'cubo': conta_cubo(df)}
+
+        return self.pastas.obtem((str(folder_id), versao_arquivos(self._fontes(folder_id))), carrega)
+
+    def fornecedores(self):
+        arquivo = self.arquivo_fornecedores
+        return self.parametros.obtem((arquivo, versao_arquivos([arquivo])), lambda: pd.read_excel(arquivo))
+
+    def pontuacoes(self):
+        arquivo = self.arquivo_pontuacoes
+        return self.parametros.obtem((arquivo, versao_arquivos([arquivo])),
+                                     lambda: read_parameters(os.path.basename(arquivo), os.path.dirname(arquivo) + os.sep))
+
+    def valida(self, folder_id):
+        from validadores import validar_duplicidade, validar_datas, checar_validade
+        from documentos import validar_cpf_cnpj
+        from correspondencia import validar_cnpj_razao
+
+        def calcula():
+            dados = self.pasta(folder_id)
+            df, folder = dados['df'], str(folder_id)
+            erros = {}
+            erros['duplicidade'] = validar_duplicidade(df, dados['dfp'], COLS_DUPLICIDADE, folder=folder,
+                                                       save=False, indice=dados['indice'])
+            erros['datas'] = validar_datas(df, ['Emitido em'], folder=folder, save=False)
+            erros['validade'] = checar_validade(df, folder=folder, save=False)
+            erros['cpf_cnpj'] = validar_cpf_cnpj(df, folder=folder, save=False)
+            # cópia: validar_cnpj_razao preenche os CPF/CNPJs resolvidos no df, que fica no cache
+            _, erros['cnpj_razao'] = validar_cnpj_razao(df.copy(), folder=folder, save=False,
+                                                        normalizar=True, grupos=dados['grupos'])
+            return erros
+
+        return self.validacoes.obtem((str(folder_id), versao_arquivos(self._fontes(folder_id))), calcula)
+
+    def cubo(self, folders):
+        cubo = None
+        for folder_id in folders:
+            cubo = combina_cubos(cubo, self.pasta(folder_id)['cubo'])
+        return cubo
+
+    def pontua(self, folders, mes_de=None, mes_ate=None):
+        from graficos import suppliers_score
+
+        scores = suppliers_score(None, self.fornecedores(), self.pontuacoes(), save=False, plotar=False,
+                                 cubo=self.cubo(folders), mes_de=mes_de, mes_ate=mes_ate)
+        if scores.empty:   # mesma resposta do mapa para uma seleção sem certidões
+            raise SelecaoVazia('Nenhuma certidão nas pastas e no período informados')
+        return scores
+
+    def mapa(self, folders, results='all', totais=True, mes_de=None, mes_ate=None, folder=''):
+        from graficos import gera_mapa_certidoes, plota_mapa_certidoes
+
+        if resultados_do_mapa(results) is None:
+            raise ErroRequisicao('Resultados inválidos: ' + str(results))
+
+        def renderiza():
+            data = gera_mapa_certidoes(None, totais, folder, results, save=False, plotar=False,
+                                       cubo=self.cubo(folders), mes_de=mes_de, mes_ate=mes_ate)
+            if data.empty:   # nada é guardado no cache: a exceção sai antes
+                raise SelecaoVazia('Nenhuma certidão nas pastas e no período informados')
+            with self._trava_graficos:
+                arquivo = plota_mapa_certidoes(data, resultados_do_mapa(results), totais, folder, True, self.path)
+            if arquivo is None:
+                raise RuntimeError('O mapa não foi gerado (dimensões acima do limite)')
+            return data, arquivo
+
+        versoes = tuple(versao_arquivos(self._fontes(f)) for f in folders)
+        chave = (tuple(str(f) for f in folders), versoes, str(results), totais, mes_de, mes_ate, folder)
+        data, arquivo = self.mapas.obtem(chave, renderiza)
+        if not os.path.exists(arquivo):   # o arquivo foi apagado: renderiza de novo
+            self.mapas.descarta(chave)
+            data, arquivo = self.mapas.obtem(chave, renderiza)
+
+        return data, arquivo
+
+    def estado(self):
+        pastas = self.pastas.resumo()
+        pastas['itens'] = [chave[0] for chave in pastas['itens']]
+        return {'segundos_no_ar': round(time.time() - self.inicio, 1),
+                'pastas': pastas,
+                'validacoes': {k: v for k, v in self.validacoes.resumo().items() if k != 'itens'},
+                'parametros': {k: v for k, v in self.parametros.resumo().items() if k != 'itens'},
+                'mapas': {k: v for k, v in self.mapas.resumo().items() if k != 'itens'}}
+
+
+'''
+Funcao auxiliar: trata_requisicao
+Finalidade: Executar uma requisição ao serviço e montar a resposta
+Parâmetros:
+          servico -> objeto Servico
+          caminho -> rota da requisição (ver ROTAS)
+            corpo -> dicionário com os parâmetros da requisição
+Retorno: dicionário da resposta. Parâmetros faltando ou mal formados geram ErroRequisicao, e
+         pastas sem arquivos ou filtros sem nenhuma certidão, SelecaoVazia
+'''
+def trata_requisicao(servico, caminho, corpo):
+    pastas = corpo.get('pastas') or ([corpo['pasta']] if 'pasta' in corpo else [])
+    janela = {'mes_de': corpo.get('mes_de'), 'mes_ate': corpo.get('mes_ate')}
+
+    if caminho == '/estado':
+        return servico.estado()
+
+    if (caminho == '/valida') and ('pasta' not in corpo):
+        raise ErroRequisicao('Informe a pasta: {"pasta": <número>}')
+    if (caminho in ['/pontua', '/mapa']) and (not pastas):
+        raise ErroRequisicao('Informe as pastas: {"pastas": [<números>]}')
+    for nome, mes in janela.items():
+        if mes is not None:
+            try:
+                mes_iso(mes)
+            except (ValueError, TypeError):
+                raise ErroRequisicao('Mês inválido em ' + nome + ': ' + str(mes) + ' (use mm/aaaa)') from None
+    for pasta in pastas:
+        faltando = [f for f in servico._fontes(pasta) if not os.path.exists(f)]
+        if faltando:
+            raise SelecaoVazia('Pasta ' + str(pasta) + ' sem os arquivos: ' + ', '.join(map(os.path.basename, faltando)))
+
+    if caminho == '/valida':
+        erros = servico.valida(corpo['pasta'])
+        return {'pasta': corpo['pasta'],
+                'quantidades': {nome: int(tabela.shape[0]) for nome, tabela in erros.items()},
+                'erros': {nome: tabela_json(tabela) for nome, tabela in erros.items()}}
+
+    if caminho == '/pontua':
+        scores = servico.pontua(pastas, **janela)
+        return {'pastas': pastas, 'pontuacao': tabela_json(scores[['score']])}
+
+    if caminho == '/mapa':
+        data, arquivo = servico.mapa(pastas, corpo.get('resultados', 'all'), corpo.get('totais', True),
+                                     folder=corpo.get('titulo', ', '.join(str(p) for p in pastas)), **janela)
+        return {'pastas': pastas, 'arquivo': arquivo, 'mapa': tabela_json(data)}
+
+
+'''
+Funcao: inicia_servico
+Finalidade: Subir o serviço local de validação (HTTP, só em 127.0.0.1 por padrão). Os dados
+            ficam em memória entre as requisições, e repetir uma validação, pontuação ou mapa de
+            pastas já carregadas não relê planilhas nem refaz índices. Rotas (POST com JSON):
+            /valida {"pasta": 1}
+            /pontua {"pastas": [1, 2], "mes_de": "01/2024", "mes_ate": "12/2024"}
+            /mapa   {"pastas": [1, 2], "resultados": "all", "totais": true}
+            /estado {} (também por GET)
+Parâmetros:
+             path -> Caminho das pastas baixadas, do cadastro de fornecedores e das pontuações
+             host -> Endereço em que o serviço escuta
+            porta -> Porta do serviço (0 escolhe uma livre)
+       capacidade -> quantidade de pastas mantidas em memória
+     fornecedores -> arquivo do cadastro de fornecedores (padrão: path + 'suppliers.xlsx')
+       pontuacoes -> arquivo das pontuações especiais (padrão: path + 'special-scores.xlsx')
+         bloquear -> Atende até ser interrompido (True) ou roda em segundo plano (False)
+Retorno: tupla (servidor, url do serviço); com bloquear=True, só retorna quando o serviço para
+'''
+def inicia_servico(path='', host='127.0.0.1', porta=PORTA, capacidade=CAPACIDADE, fornecedores=None,
+                   pontuacoes=None, bloquear=False):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    servico = Servico(path, capacidade, fornecedores, pontuacoes)
+    servico.aquece()
+
+    class Tratador(BaseHTTPRequestHandler):
+        def responde(self, status, resposta):
+            conteudo = json.dumps(resposta, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def atende(self, corpo):
+            caminho = self.path.split('?')[0]
+            if caminho not in ROTAS:
+                return self.responde(404, {'erro': 'Rota desconhecida: ' + caminho})
+
+            inicio = time.perf_counter()
+            try:
+                resposta = trata_requisicao(servico, caminho, corpo)
+            except ErroRequisicao as e:
+                return self.responde(400, {'erro': str(e)})
+            except SelecaoVazia as e:
+                return self.responde(404, {'erro': str(e)})
+            except Exception as e:
+                return self.responde(500, {'erro': type(e).__name__ + ': ' + str(e)})
+
+            resposta['segundos'] = round(time.perf_counter() - inicio, 4)
+            self.responde(200, resposta)
+
+        def do_GET(self):
+            self.atende({})
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            try:
+                corpo = json.loads(self.rfile.read(tamanho) or b'{}')
+            except ValueError:
+                return self.responde(400, {'erro': 'Corpo da requisição não é um JSON válido'})
+            self.atende(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), Tratador)
+    servidor.servico = servico
+    url = 'http://' + host + ':' + str(servidor.server_address[1]) + '/'
+
+    if not bloquear:
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        return servidor, url
+
+    print('Serviço de validação em ' + url)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+    return servidor, url
+
+
+class ClienteServico:
+    '''
+    Cliente do serviço local de validação (ver inicia_servico). Devolve os resultados como
+    dataframes, no mesmo formato das funções chamadas diretamente
+    '''
+    def __init__(self, url='http://127.0.0.1:' + str(PORTA) + '/', timeout=600):
+        self.url = url.rstrip('/') + '/'
+        self.timeout = timeout
+
+    def requisita(self, rota, **corpo):
+        from urllib.request import Request, urlopen
+        from urllib.error import HTTPError
+
+        dados = json.dumps(corpo).encode('utf-8')
+        requisicao = Request(self.url + rota, data=dados, headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(requisicao, timeout=self.timeout) as resposta:
+                return json.loads(resposta.read())
+        except HTTPError as e:
+            raise RuntimeError('Serviço respondeu ' + str(e.code) + ': ' + json.loads(e.read()).get('erro', '')) from None
+
+    def valida(self, pasta):
+        resposta = self.requisita('valida', pasta=pasta)
+        return {nome: json_tabela(tabela) for nome, tabela in resposta['erros'].items()}
+
+    def pontua(self, pastas, mes_de=None, mes_ate=None):
+        resposta = self.requisita('pontua', pastas=pastas, mes_de=mes_de, mes_ate=mes_ate)
+        return json_tabela(resposta['pontuacao'])['score']
+
+    def mapa(self, pastas, resultados='all', totais=True, mes_de=None, mes_ate=None):
+        resposta = self.requisita('mapa', pastas=pastas, resultados=resultados, totais=totais,
+                                  mes_de=mes_de, mes_ate=mes_ate)
+        return json_tabela(resposta['mapa']), resposta['arquivo']
+
+    def estado(self):
+        return self.requisita('estado')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serviço local de validação das certidões')
+    parser.add_argument('--path', default='', help='caminho das pastas baixadas e dos parâmetros')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=PORTA)
+    parser.add_argument('--capacidade', type=int, default=CAPACIDADE, help='pastas mantidas em memória')
+    parser.add_argument('--fornecedores', default=None, help='cadastro de fornecedores (padrão: suppliers.xlsx)')
+    parser.add_argument('--pontuacoes', default=None, help='pontuações especiais (padrão: special-scores.xlsx)')
+    args = parser.parse_args(argv)
+
+    inicia_servico(args.path, args.host, args.porta, args.capacidade, args.fornecedores, args.pontuacoes,
+                   bloquear=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório, sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dados_sinteticos import gera_dataset_sintetico, gera_fornecedores_sinteticos   # noqa: E402
+
+
+COLS_DUPLICIDADE = ['Classificação', 'Resultado', 'Consultado (CPF/CNPJ)', 'Emitido em', 'Validade']
+
+
+@pytest.fixture(scope='session')
+def fornecedores():
+    return gera_fornecedores_sinteticos(40, seed=11)
+
+
+@pytest.fixture(scope='session')
+def dataset(fornecedores):
+    '''Dataset sintético pequeno (certidões, positivos), o mesmo em todos os testes'''
+    return gera_dataset_sintetico(800, fornecedores, seed=11)
+
+
+@pytest.fixture
+def df(dataset):
+    return dataset[0].copy()
+
+
+@pytest.fixture
+def dfp(dataset):
+    return dataset[1].copy()
+
+
+@pytest.fixture(scope='session')
+def baseline(tmp_path_factory):
+    '''validacoes.py do commit inicial do repositório, para comparar os validadores otimizados'''
+    import importlib.util
+    import subprocess
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=raiz, check=True,
+                                capture_output=True, text=True).stdout.split()[-1]
+        codigo = subprocess.run(['git', 'show', commit + ':validacoes.py'], cwd=raiz, check=True,
+                                capture_output=True).stdout
+    except (OSError, IndexError, subprocess.CalledProcessError):
+        pytest.skip('histórico do git indisponível')
+
+    arquivo = tmp_path_factory.mktemp('baseline') / 'validacoes_baseline.py'
+    arquivo.write_bytes(codigo)
+    spec = importlib.util.spec_from_file_location('validacoes_baseline', arquivo)
+    modulo = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(modulo)
+    except ImportError as e:
+        pytest.skip('dependência do validacoes.py original ausente: ' + str(e))
+
+    return modulo
+
+
+@pytest.fixture
+def servidor(tmp_path, fornecedores):
+    '''Servidor local que imita o do TCD, com as pastas sintéticas 1 e 2'''
+    from dados_sinteticos import gera_pasta_sintetica, inicia_servidor_sintetico
+
+    path = str(tmp_path) + '/'
+    for folder in (1, 2):
+        gera_pasta_sintetica(folder, 200, fornecedores, seed=folder, path=path)
+
+    servidor, url = inicia_servidor_sintetico(path)
+    yield servidor, url
+    servidor.shutdown()
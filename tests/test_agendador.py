@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+import requests
+
+from agendador import Agendador, BaldeDeFichas, LimiteAdaptativo, le_retry_after
+
+
+def test_agendador_devolve_a_vaga_quando_a_requisicao_falha(servidor):
+    _, url = servidor
+    agendador = Agendador(taxa=100, tentativas=2, espera_base=0)
+
+    assert agendador.requisita('GET', url, params={'folder': '99', 'format': 'xlsx'}).status_code == 404
+    with pytest.raises(requests.RequestException):   # cabeçalho inválido: falha sem nova tentativa
+        agendador.requisita('GET', url, headers={'Authorization': 'Token a\nb'})
+
+    assert agendador._controles(url)[1].em_uso == 0
+    assert agendador.estatisticas['falhas'] == 1
+    assert agendador.estatisticas['requisicoes'] == 2
+
+
+def test_agendador_repete_falhas_temporarias(tmp_path):
+    from dados_sinteticos import inicia_servidor_sintetico
+
+    servidor, url = inicia_servidor_sintetico(str(tmp_path) + '/', taxa_falha=1.0)
+    try:
+        agendador = Agendador(taxa=100, tentativas=3, espera_base=0)
+        assert agendador.requisita('GET', url).status_code == 503
+    finally:
+        servidor.shutdown()
+
+    assert agendador.estatisticas['requisicoes'] == 3
+    assert agendador.estatisticas['repeticoes'] == 2
+    assert agendador.estatisticas['falhas'] == 1
+    assert agendador._controles(url)[1].em_uso == 0
+    assert agendador.concorrencia_atual(url) < agendador.concorrencia
+
+
+def test_sessao_por_thread():
+    agendador = Agendador()
+    sessoes = []
+    threads = [threading.Thread(target=lambda: sessoes.append(agendador._sessao())) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(s) for s in sessoes}) == 3
+    assert agendador._sessao() is agendador._sessao()
+
+
+def test_limite_adaptativo():
+    limite = LimiteAdaptativo(inicial=4, minimo=1, maximo=5, latencia_alvo=1.0)
+    limite.entra()
+    limite.sai(latencia=5.0)
+    assert limite.limite == 2
+    for _ in range(20):
+        limite.entra()
+        limite.sai(latencia=0.1)
+    assert 2 < limite.limite <= 5
+    assert limite.em_uso == 0
+
+
+def test_balde_desacelera_e_acelera():
+    balde = BaldeDeFichas(8)
+    balde.desacelera()
+    assert balde.taxa == 4
+    for _ in range(100):
+        balde.acelera()
+    assert balde.taxa == 8
+
+
+def test_le_retry_after():
+    class Resposta:
+        def __init__(self, valor):
+            self.headers = {'Retry-After': valor} if valor is not None else {}
+
+    assert le_retry_after(Resposta('3')) == 3.0
+    assert le_retry_after(Resposta(None)) is None
+    assert le_retry_after(Resposta('Wed, 21 Oct 2015 07:28:00 GMT')) == 0.0
+    assert le_retry_after(Resposta('amanhã')) is None
+    assert le_retry_after(None) is None
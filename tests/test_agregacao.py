@@ -0,0 +1,102 @@
+import os
+
+import pandas as pd
+import pytest
+
+from agregacao import (COLS_CUBO, combina_cubos, conta_certidoes, conta_cubo, contagens_do_cubo, fatia_cubo,
+                       le_pastas, mes_emissao, mes_iso, monta_ultimas, processa_em_partes, ultimas_certidoes,
+                       ultimas_do_cubo)
+from armazem import abre_armazem, consulta_certidoes, ingere_pasta, le_partes_armazem
+from carregadores import compacta_dataset, get_main_dataset
+from dados_sinteticos import gera_pasta_sintetica
+
+
+@pytest.fixture
+def pastas(tmp_path, fornecedores):
+    path = str(tmp_path) + os.sep
+    for folder in (1, 2, 3):
+        gera_pasta_sintetica(folder, 120, fornecedores, seed=folder, path=path)
+    return path
+
+
+def ordena(df):
+    return df.sort_index().sort_index(axis=1)
+
+
+def confere(partes, df):
+    contagens, ultimas, _ = processa_em_partes(partes)
+
+    esperadas = conta_certidoes(df)
+    pd.testing.assert_frame_equal(ordena(contagens), ordena(esperadas))
+    pd.testing.assert_frame_equal(ordena(monta_ultimas(ultimas)), ordena(ultimas_certidoes(df)))
+
+
+def test_partes_por_pasta_iguais_ao_historico_em_memoria(pastas):
+    df = pd.concat([get_main_dataset(f, path=pastas) for f in (1, 2, 3)], ignore_index=True)
+
+    confere(le_pastas([1, 2, 3], path=pastas, compacto=True), df)
+
+
+@pytest.mark.parametrize('linhas', [1, 37, 1000])
+def test_blocos_do_armazem_iguais_ao_historico_em_memoria(pastas, tmp_path, linhas):
+    con = abre_armazem(path=str(tmp_path) + os.sep)
+    for folder in (1, 2, 3):
+        ingere_pasta(con, folder, path=pastas)
+
+    blocos = list(le_partes_armazem(con, linhas=linhas))
+    assert [parte for parte, _ in blocos] == list(range(len(blocos)))
+    assert max(bloco.shape[0] for _, bloco in blocos) <= linhas
+
+    confere(iter(blocos), consulta_certidoes(con))
+    confere(le_partes_armazem(con, linhas=linhas, pastas=[2]), consulta_certidoes(con, pastas=[2]))
+    con.close()
+
+
+def test_validadores_recebem_cada_parte(pastas):
+    def conta_linhas(df, parte):
+        return pd.DataFrame({'linhas': [df.shape[0]]})
+
+    _, _, erros = processa_em_partes(le_pastas([1, 2], path=pastas), validadores={'linhas': conta_linhas},
+                                     ultimas=False)
+
+    assert erros['linhas']['Parte'].tolist() == [1, 2]
+    assert erros['linhas']['linhas'].tolist() == [120, 120]
+
+
+def periodo(df, mes_de, mes_ate):
+    meses = mes_emissao(df['Emitido em'])
+    return df[meses.notna() & (meses >= mes_iso(mes_de)) & (meses <= mes_iso(mes_ate))]
+
+
+@pytest.mark.parametrize('compacto', [False, True])
+def test_fatias_do_cubo_iguais_as_contagens_diretas(df, compacto):
+    dados = compacta_dataset(df.copy()) if compacto else df
+    cubo = conta_cubo(dados)
+    meses = sorted(mes_emissao(df['Emitido em']).dropna().unique())
+    mes_de, mes_ate = [pd.to_datetime(m).strftime('%m/%Y') for m in (meses[1], meses[-2])]
+
+    pd.testing.assert_frame_equal(ordena(contagens_do_cubo(cubo)), ordena(conta_certidoes(df)))
+    pd.testing.assert_frame_equal(ordena(ultimas_do_cubo(cubo)), ordena(ultimas_certidoes(df)))
+
+    parte = periodo(df, mes_de, mes_ate)
+    assert 0 < parte.shape[0] < df.shape[0]
+    pd.testing.assert_frame_equal(ordena(contagens_do_cubo(cubo, mes_de=mes_de, mes_ate=mes_ate)),
+                                  ordena(conta_certidoes(parte)))
+    pd.testing.assert_frame_equal(ordena(contagens_do_cubo(cubo, ['Positiva'], mes_de, mes_ate)),
+                                  ordena(conta_certidoes(parte, ['Positiva'])))
+    pd.testing.assert_frame_equal(ordena(ultimas_do_cubo(cubo, mes_de, mes_ate)), ordena(ultimas_certidoes(parte)))
+
+    classe = df['Classificação'].iloc[0][0:3]
+    fatia = fatia_cubo(cubo, show_result=['Negativa'], classificacao=classe)
+    esperadas = ((df['Resultado'] == 'Negativa') & df['Consultado (CPF/CNPJ)'].notna() &
+                 (df['Classificação'].str[0:4].str.strip() == classe))
+    assert fatia['qt'].sum() == esperadas.sum()
+
+
+def test_cubos_das_partes_somam_o_cubo_inteiro(df):
+    cubo = None
+    for inicio in range(0, df.shape[0], 150):
+        cubo = combina_cubos(cubo, conta_cubo(df.iloc[inicio:inicio + 150]))
+
+    pd.testing.assert_frame_equal(cubo.sort_values(COLS_CUBO, ignore_index=True),
+                                  conta_cubo(df).sort_values(COLS_CUBO, ignore_index=True), check_dtype=False)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agrupamento import agrupa_nomes, carrega_grupos, erros_por_grupos, normaliza_nome, salva_grupos
+
+
+def como_conjunto(resultado):
+    urls, urls_ref, erros, atualizacoes = resultado
+    return sorted(zip(urls, urls_ref, erros)), atualizacoes
+
+
+def test_normaliza_nome():
+    assert normaliza_nome('Comércio  de Peças S/A') == normaliza_nome('COMERCIO DE PECAS SA') == 'COMERCIO DE PECAS'
+    assert normaliza_nome('Posto 3 Ltda.') == 'POSTO 3'
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_grupos_nao_dependem_da_ordem_das_linhas(df, seed):
+    nomes, grupos = agrupa_nomes(df)
+    nomes_emb, grupos_emb = agrupa_nomes(df.sample(frac=1, random_state=seed))
+
+    grupo_de = dict(zip(nomes['Consultado (Nome)'], nomes['Grupo']))
+    assert grupo_de == dict(zip(nomes_emb['Consultado (Nome)'], nomes_emb['Grupo']))
+    pd.testing.assert_frame_equal(grupos, grupos_emb)
+
+    assert como_conjunto(erros_por_grupos(df, nomes, threshold=80)) == \
+           como_conjunto(erros_por_grupos(df.sample(frac=1, random_state=seed), nomes_emb, threshold=80))
+
+
+def test_grupos_salvos_e_carregados(df, tmp_path):
+    nomes, _ = agrupa_nomes(df)
+    arquivo = salva_grupos(nomes, str(tmp_path / 'grupos.csv'))
+    carregados = carrega_grupos(arquivo)
+
+    pd.testing.assert_frame_equal(carregados, nomes.astype(str))
+    for threshold in [None, 80]:
+        assert erros_por_grupos(df, carregados, threshold=threshold) == erros_por_grupos(df, nomes, threshold=threshold)
+
+
+def test_erros_por_grupos():
+    df = pd.DataFrame({'Consultado (Nome)': ['ACME LTDA', 'Acme', 'Beta Comércio', 'ACME', 'Gama', 'Zeta', np.nan,
+                                             'Zeta S/A', 'ZETA'],
+                       'Consultado (CPF/CNPJ)': ['1', '1', '1', np.nan, np.nan, '2', np.nan, '3', np.nan],
+                       'Url': ['u0', 'u1', 'u2', 'u3', 'u4', 'u5', 'u6', 'u7', 'u8']})
+    nomes, _ = agrupa_nomes(df)
+    urls, urls_ref, erros, atualizacoes = erros_por_grupos(df, nomes)
+
+    assert list(zip(urls, urls_ref)) == [('u0', 'u2'), ('u1', 'u2'), ('u2', 'u1'), ('u3', 'u1'), ('u4', ''),
+                                         ('u6', ''), ('u8', 'u5'), ('u8', 'u7')]
+    assert erros[0] == 'Mesmo CPF/CNPJ com Nomes/Razão Social distintos: [ ACME LTDA ] / [ Beta Comércio ]'
+    assert erros[2] == 'Mesmo CPF/CNPJ com Nomes/Razão Social distintos: [ Beta Comércio ] / [ Acme ]'
+    assert erros[6] == 'Certidão sem CPF/CNPJ, mas Nome/Razão social 2 [ ZETA ] pode pertencer ao CPF/CNPJ [ 2 ]'
+    assert atualizacoes == {3: '1'}
+
+    # threshold 0: todo par de grupos é parecido o bastante e não é informado
+    assert erros_por_grupos(df, nomes, threshold=0)[0] == ['u3', 'u4', 'u6', 'u8', 'u8']
+
+
+def test_erros_por_grupos_em_frame_vazio(df):
+    vazio = df.iloc[:0]
+    nomes, _ = agrupa_nomes(vazio)
+
+    assert erros_por_grupos(vazio, nomes, threshold=80) == ([], [], [], {})
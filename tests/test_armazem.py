@@ -0,0 +1,136 @@
+import os
+
+import pandas as pd
+import pytest
+
+import armazem
+from agregacao import COLS_CUBO, conta_certidoes, conta_cubo, fatia_cubo, ultimas_certidoes
+from armazem import (abre_armazem, atualiza_cubo, consulta_certidoes, consulta_positivos, contagens_armazem,
+                     cubo_armazem, duplicidades_armazem, ingere_pasta, monta_filtros, pastas_ingeridas,
+                     ultimas_certidoes_armazem)
+from carregadores import chave_cpf_cnpj
+from conftest import COLS_DUPLICIDADE
+from dados_sinteticos import gera_pasta_sintetica
+
+
+def ordena(df):
+    return df.sort_index().sort_index(axis=1)
+
+
+@pytest.fixture
+def path_pastas(tmp_path, fornecedores):
+    path = str(tmp_path) + os.sep
+    for folder in (1, 2, 3):
+        gera_pasta_sintetica(folder, 300, fornecedores, seed=folder, path=path)
+    return path
+
+
+@pytest.fixture
+def con(path_pastas):
+    con = abre_armazem(path=path_pastas)
+    for folder in (1, 2, 3):
+        ingere_pasta(con, folder, path=path_pastas)
+    yield con
+    con.close()
+
+
+def test_ingestao_nao_duplica_e_substitui(con, path_pastas):
+    assert ingere_pasta(con, 1, path=path_pastas) == 0
+    assert pastas_ingeridas(con)['pasta'].tolist() == ['1', '2', '3']
+
+    gera_pasta_sintetica(1, 50, seed=7, path=path_pastas)
+    assert ingere_pasta(con, 1, path=path_pastas, substituir=True) == 50
+    assert consulta_certidoes(con, pastas=1).shape[0] == 50
+    assert consulta_certidoes(con).shape[0] == 650
+    assert pastas_ingeridas(con).set_index('pasta').loc['1', 'certidoes'] == 50
+
+
+def test_falha_na_substituicao_mantem_a_pasta_antiga(con, path_pastas, monkeypatch):
+    antes = consulta_certidoes(con, pastas=1)
+    positivos = consulta_positivos(con, pastas=1)
+
+    def falha(*args, **kwargs):
+        raise RuntimeError('falha no meio da gravação')
+
+    gera_pasta_sintetica(1, 50, seed=7, path=path_pastas)
+    monkeypatch.setattr(armazem, 'atualiza_cubo', falha)
+    with pytest.raises(RuntimeError):
+        ingere_pasta(con, 1, path=path_pastas, substituir=True)
+
+    pd.testing.assert_frame_equal(consulta_certidoes(con, pastas=1), antes)
+    pd.testing.assert_frame_equal(consulta_positivos(con, pastas=1), positivos)
+    assert pastas_ingeridas(con).set_index('pasta').loc['1', 'certidoes'] == 300
+
+
+def test_filtros_iguais_ao_pandas(con):
+    df = consulta_certidoes(con)
+    cnpj = df['Consultado (CPF/CNPJ)'].dropna().iloc[0]
+    emissao = pd.to_datetime(df['Emitido em'], format='%d/%m/%Y', errors='coerce')
+
+    casos = [({'pastas': [1, 3]}, df['Pasta'].isin(['1', '3'])),
+             ({'cnpj': cnpj}, chave_cpf_cnpj(df['Consultado (CPF/CNPJ)']) == chave_cpf_cnpj(pd.Series([cnpj]))[0]),
+             ({'resultado': ['Positiva', 'Pos./Neg.']}, df['Resultado'].isin(['Positiva', 'Pos./Neg.'])),
+             ({'classificacao': df['Classificação'].iloc[0][0:3], 'pastas': 2},
+              (df['Classificação'].str[0:4].str.strip() == df['Classificação'].iloc[0][0:3]) & (df['Pasta'] == '2')),
+             ({'emitido_de': '01/01/2020', 'emitido_ate': emissao.max().strftime('%d/%m/%Y')},
+              emissao.notna() & (emissao >= '2020-01-01'))]
+
+    for filtros, esperado in casos:
+        obtido = consulta_certidoes(con, **filtros)
+        assert obtido['Url'].tolist() == df.loc[esperado, 'Url'].tolist(), filtros
+
+
+def test_filtros_qualificados_pela_tabela():
+    where, parametros = monta_filtros(pastas=[1, 2], resultado='Positiva', classificacao='160', tabela='c')
+
+    assert where == ' WHERE c.pasta IN (?, ?) AND c.resultado IN (?) AND trim(c.class_short) IN (?)'
+    assert parametros == ['1', '2', 'Positiva', '160']
+
+
+@pytest.mark.parametrize('pastas', [None, [2], [1, 3]])
+def test_agregacoes_no_armazem_iguais_ao_pandas(con, pastas):
+    df = consulta_certidoes(con, pastas=pastas)
+
+    pd.testing.assert_frame_equal(ordena(contagens_armazem(con, pastas=pastas)), ordena(conta_certidoes(df)))
+    pd.testing.assert_frame_equal(ordena(ultimas_certidoes_armazem(con, pastas=pastas)), ordena(ultimas_certidoes(df)))
+
+
+@pytest.mark.parametrize('pastas', [None, [2], [1, 3]])
+def test_duplicidades_no_armazem_iguais_ao_pandas(con, pastas):
+    df = consulta_certidoes(con, pastas=pastas)
+    esperadas = df[df.duplicated(COLS_DUPLICIDADE, keep=False)]
+
+    candidatas, dfp = duplicidades_armazem(con, COLS_DUPLICIDADE, pastas=pastas)
+
+    assert not esperadas.empty
+    assert candidatas['Url'].tolist() == esperadas['Url'].tolist()
+    assert set(dfp['Nome']) <= set(candidatas.loc[candidatas['Resultado'] == 'Positiva', 'Nome'])
+
+
+def test_duplicidades_com_coluna_desconhecida(con):
+    with pytest.raises(ValueError):
+        duplicidades_armazem(con, ['Coluna inexistente'])
+
+
+@pytest.mark.parametrize('filtros', [{}, {'pastas': [2]}, {'mes_de': '01/2020', 'resultado': 'Positiva'}])
+def test_cubo_do_armazem_igual_ao_cubo_em_memoria(con, filtros):
+    mes_de = filtros.pop('mes_de', None)
+    df = consulta_certidoes(con, **filtros)
+
+    esperado = fatia_cubo(conta_cubo(df), mes_de=mes_de)
+    obtido = cubo_armazem(con, mes_de=mes_de, **filtros)
+
+    pd.testing.assert_frame_equal(obtido.sort_values(COLS_CUBO, ignore_index=True),
+                                  esperado.sort_values(COLS_CUBO, ignore_index=True), check_dtype=False)
+
+
+def test_cubo_refeito_ao_abrir_armazem_antigo(con, path_pastas):
+    antes = cubo_armazem(con)
+    with con:
+        con.execute('DELETE FROM cubo')   # armazém de antes do cubo
+
+    con = abre_armazem(path=path_pastas)
+    pd.testing.assert_frame_equal(cubo_armazem(con).sort_values(COLS_CUBO, ignore_index=True),
+                                  antes.sort_values(COLS_CUBO, ignore_index=True))
+    assert atualiza_cubo(con) == []   # nada mais falta
+    con.close()
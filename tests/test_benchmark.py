@@ -0,0 +1,41 @@
+# Os casos de benchmark.py como suíte do pytest-benchmark. Exemplos:
+#   pytest tests/test_benchmark.py --benchmark-autosave
+#   pytest tests/test_benchmark.py --benchmark-compare --benchmark-compare-fail=median:20%
+# Os tamanhos vêm de VALIDACOES_BENCH_TAMANHOS (ex.: "1000 10000 100000"); no resto da suíte,
+# usar --benchmark-skip para não rodá-los
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import benchmark as suite   # noqa: E402
+
+
+TAMANHOS = [int(n) for n in os.environ.get('VALIDACOES_BENCH_TAMANHOS', '1000').split()]
+
+_CONTEXTOS = {}
+
+
+@pytest.fixture(scope='module')
+def contextos(tmp_path_factory):
+    '''Dados sintéticos de cada tamanho, preparados uma vez para todos os casos'''
+    def contexto(n):
+        if n not in _CONTEXTOS:
+            _CONTEXTOS[n] = suite.prepara_contexto(n, list(suite.CASOS), str(tmp_path_factory.mktemp(str(n))))
+        return _CONTEXTOS[n]
+
+    yield contexto
+    _CONTEXTOS.clear()
+
+
+@pytest.mark.parametrize('n_linhas', TAMANHOS)
+@pytest.mark.parametrize('caso', list(suite.CASOS))
+def test_caso(benchmark, contextos, caso, n_linhas):
+    executa, maximo = suite.CASOS[caso]
+    if (maximo is not None) and (n_linhas > maximo):
+        pytest.skip('caso limitado a ' + str(maximo) + ' linhas')
+
+    contexto = contextos(n_linhas)
+    benchmark.group = caso
+    benchmark.pedantic(executa, args=(contexto,), setup=lambda: suite.plt.close('all'), rounds=3)
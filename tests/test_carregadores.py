@@ -0,0 +1,42 @@
+import pandas as pd
+
+from carregadores import compacta_dataset, get_main_dataset, get_positive_dataset
+from dados_sinteticos import gera_pasta_sintetica
+from documentos import COL_CHAVE
+
+
+def test_compacta_dataset_preserva_os_valores(df):
+    compacto = compacta_dataset(df.copy())
+
+    assert isinstance(compacto['Resultado'].dtype, pd.CategoricalDtype)
+    assert isinstance(compacto['Consultado (CPF/CNPJ)'].dtype, pd.CategoricalDtype)
+    assert compacto['Url'].dtype == object   # um valor por linha: não compensa categorizar
+    for col in df.columns:
+        assert compacto[col].astype(object).fillna('').tolist() == df[col].fillna('').tolist()
+    assert compacto.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+
+def test_chave_cpf_cnpj_so_com_digitos(df):
+    chaves = compacta_dataset(df.copy())[COL_CHAVE].astype(object)
+    cnpjs = df['Consultado (CPF/CNPJ)']
+
+    esperado = cnpjs.str.replace(r'\D', '', regex=True)
+    assert chaves[cnpjs.notna()].tolist() == esperado[cnpjs.notna()].tolist()
+    assert chaves[cnpjs.isna()].isna().all()
+
+
+def test_compacta_dataset_vazio():
+    vazio = pd.DataFrame(columns=['Resultado', 'Consultado (CPF/CNPJ)'])
+    assert compacta_dataset(vazio).shape == (0, 3)
+
+
+def test_carrega_pasta_compacta(tmp_path, fornecedores):
+    path = str(tmp_path) + '/'
+    gera_pasta_sintetica(1, 300, fornecedores, path=path)
+
+    df = get_main_dataset(1, path=path)
+    compacto = get_main_dataset(1, path=path, compacto=True)
+    pd.testing.assert_frame_equal(compacto.drop(columns=COL_CHAVE).astype(object), df.astype(object))
+
+    dfp = get_positive_dataset([1], path=path, compacto=True)
+    assert isinstance(dfp['Nome'].dtype, pd.CategoricalDtype)
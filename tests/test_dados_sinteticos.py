@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dados_sinteticos import digitos_cnpj, formata_cnpjs, gera_dataset_sintetico, ruido_nomes
+
+
+def test_cnpj_com_digitos_verificadores():
+    bases = np.array([[1, 1, 2, 2, 2, 3, 3, 3, 0, 0, 0, 1]])
+    assert formata_cnpjs(digitos_cnpj(bases)).tolist() == ['11.222.333/0001-81']
+
+
+def test_ruido_nos_nomes():
+    nomes = np.array(['GASES AGRO LTDA 1', 'QUIMICA S/A 2', 'ABC'] * 50, dtype=object)
+    ruidos = ruido_nomes(nomes, np.random.default_rng(0))
+
+    assert len(ruidos) == len(nomes)
+    assert (ruidos != nomes).any()
+    # letra faltando: um caractere a menos, e o resto do nome na mesma ordem
+    faltando = [(n, r) for n, r in zip(nomes, ruidos) if len(r) == len(n) - 1]
+    assert faltando
+    for nome, ruido in faltando:
+        assert any(nome[:i] + nome[i + 1:] == ruido for i in range(1, len(nome) - 1))
+    assert len(ruido_nomes(np.array([], dtype=object), np.random.default_rng(0))) == 0
+
+
+@pytest.mark.parametrize('n_linhas', [0, 1, 2000])
+def test_dataset_sintetico(fornecedores, n_linhas):
+    df, dfp = gera_dataset_sintetico(n_linhas, fornecedores, seed=3)
+    de_novo, _ = gera_dataset_sintetico(n_linhas, fornecedores, seed=3)
+
+    assert df.shape[0] == n_linhas
+    pd.testing.assert_frame_equal(df, de_novo)
+    assert set(dfp['Nome']) <= set(df.loc[df['Resultado'] == 'Positiva', 'Nome'])
+
+    validades = df['Validade'].dropna()
+    assert validades.str.fullmatch(r'\d+ dias|\d+ meses|\d{2}/\d{2}/\d{4}').all()
+    cnpjs = df['Consultado (CPF/CNPJ)'].dropna()
+    assert cnpjs.str.fullmatch(r'\d{14}|\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}').all()
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+import diferencas
+from armazem import abre_armazem
+from diferencas import (carrega_execucao, compara_execucoes, compara_execucoes_armazem, consolida_erros,
+                        consolida_pipeline, execucoes_gravadas, grava_execucao, pastas_validadas)
+
+
+def erros(*linhas):
+    return pd.DataFrame(list(linhas), columns=['Url', 'Mensagem'])
+
+
+@pytest.fixture
+def execucoes():
+    anterior = consolida_pipeline({
+        1: {'datas': erros(('u1', 'Data com problema'), ('u2', 'Data com problema')),
+            'validade': erros(('u3', 'Validade Expirada'))},
+        2: {'datas': erros(('u9', 'Data com problema'))},
+        3: {'datas': erros(('u7', 'Data com problema'))}})
+    atual = consolida_pipeline({
+        1: {'datas': erros(('u1', 'Data com problema'), ('u4', 'Data com problema')),
+            'validade': erros()},
+        2: {'datas': erros(), 'validade': erros()},   # validada de novo, sem nenhum erro
+        3: RuntimeError('falhou')})
+    return anterior, atual
+
+
+def test_novos_resolvidos_e_mantidos(execucoes):
+    anterior, atual = execucoes
+    delta, resumo = compara_execucoes(anterior, atual)
+
+    situacoes = {(linha.Situação, linha.Pasta, linha.Url) for linha in delta.itertuples()}
+    assert situacoes == {('Novo', '1', 'u4'), ('Resolvido', '1', 'u2'), ('Resolvido', '1', 'u3'),
+                         ('Resolvido', '2', 'u9')}
+    assert resumo.loc[('datas', '1')].tolist() == [1, 1, 1, 2, 2]
+    assert resumo.loc[('validade', '1')].tolist() == [0, 1, 0, 1, 0]
+    assert resumo.loc[('datas', '2')].tolist() == [0, 1, 0, 1, 0]
+    assert '3' not in delta['Pasta'].tolist()   # a pasta 3 falhou na execução atual
+
+
+def test_pasta_sem_erros_conta_como_validada(execucoes):
+    _, atual = execucoes
+    assert pastas_validadas(atual) == {'1', '2'}
+    assert pastas_validadas(consolida_erros({'datas': erros()}, 5)) == {'5'}
+
+
+def test_execucao_atual_vazia(execucoes):
+    anterior, _ = execucoes
+    atual = consolida_pipeline({1: {}, 2: {}, 3: {}})
+
+    delta, resumo = compara_execucoes(anterior, atual)
+
+    assert (delta['Situação'] == 'Resolvido').all()
+    assert delta.shape[0] == anterior.shape[0]
+    assert resumo['Atual'].sum() == 0
+
+    delta, _ = compara_execucoes(anterior, consolida_pipeline({}))
+    assert delta.shape[0] == 0   # nenhuma pasta validada nas duas
+
+
+def test_execucoes_iguais(execucoes):
+    anterior, _ = execucoes
+    delta, resumo = compara_execucoes(anterior, anterior.copy())
+
+    assert delta.shape[0] == 0
+    assert (resumo['Mantidos'] == resumo['Atual']).all()
+
+
+def test_ida_e_volta_pelo_armazem(execucoes, tmp_path):
+    anterior, atual = execucoes
+    con = abre_armazem(path=str(tmp_path) + '/')
+
+    grava_execucao(con, anterior, '20260101-000000')
+    grava_execucao(con, atual, '20260102-000000')
+    grava_execucao(con, atual, '20260102-000000')   # gravar de novo substitui
+
+    assert execucoes_gravadas(con)['execucao'].tolist() == ['20260101-000000', '20260102-000000']
+    lida = carrega_execucao(con, '20260102-000000')
+    assert pastas_validadas(lida) == {'1', '2'}
+    pd.testing.assert_frame_equal(lida.sort_values('Chave', ignore_index=True),
+                                  atual.sort_values('Chave', ignore_index=True), check_dtype=False)
+
+    delta, resumo = compara_execucoes_armazem(con)
+    esperado, resumo_esperado = compara_execucoes(anterior, atual)
+    assert sorted(delta['Url']) == sorted(esperado['Url'])
+    pd.testing.assert_frame_equal(resumo, resumo_esperado)
+    con.close()
+
+
+def test_falha_ao_regravar_mantem_a_execucao_antiga(execucoes, tmp_path, monkeypatch):
+    anterior, atual = execucoes
+    con = abre_armazem(path=str(tmp_path) + '/')
+    grava_execucao(con, anterior, '20260101-000000')
+
+    def falha(consolidado):
+        raise RuntimeError('falha no meio da gravação')
+
+    monkeypatch.setattr(diferencas, 'pastas_validadas', falha)
+    with pytest.raises(RuntimeError):
+        grava_execucao(con, atual, '20260101-000000')
+    monkeypatch.undo()
+
+    lida = carrega_execucao(con, '20260101-000000')
+    pd.testing.assert_frame_equal(lida.sort_values('Chave', ignore_index=True),
+                                  anterior.sort_values('Chave', ignore_index=True), check_dtype=False)
+    con.close()
+
+
+def test_armazem_precisa_de_duas_execucoes(tmp_path):
+    con = abre_armazem(path=str(tmp_path) + '/')
+    with pytest.raises(ValueError):
+        compara_execucoes_armazem(con)
+    con.close()
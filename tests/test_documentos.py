@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from documentos import (COL_CHAVE, COL_TIPO, COL_VALIDO, documentos_cpf_cnpj, formata_documento,
+                        normaliza_digitos, validar_cpf_cnpj)
+
+
+def test_normaliza_digitos():
+    chaves = normaliza_digitos(['11.222.333/0001-81', '11222333000181', '529.982.247-25',
+                                '52998224725', '1222333000181', '', 'sem número'])
+
+    assert chaves.tolist() == ['11222333000181', '11222333000181', '52998224725',
+                               '52998224725', '01222333000181', None, None]
+
+
+def test_coluna_float_com_vazios():
+    # Coluna numérica com vazios: o pandas lê como float, e os zeros à esquerda somem
+    serie = pd.Series([11222333000181.0, np.nan, 52998224725.0, 1222333000181.0])
+    docs = documentos_cpf_cnpj(serie)
+
+    assert docs[COL_CHAVE].astype(object).tolist()[0] == '11222333000181'
+    assert pd.isna(docs[COL_CHAVE].iloc[1])
+    assert docs[COL_TIPO].tolist() == ['CNPJ', None, 'CPF', 'CNPJ']
+    assert docs[COL_VALIDO].tolist() == [True, False, True, False]
+
+    df = pd.DataFrame({'Url': ['a', 'b', 'c', 'd'], 'Consultado (CPF/CNPJ)': serie})
+    erros = validar_cpf_cnpj(df, save=False)
+    assert erros['Url'].tolist() == ['d']
+    assert erros['Mensagem'].str.startswith('CPF/CNPJ com dígito verificador inválido').all()
+
+
+def test_validar_cpf_cnpj():
+    df = pd.DataFrame({'Url': list('abcdef'),
+                       'Consultado (CPF/CNPJ)': ['11.222.333/0001-81', '11.222.333/0001-82', '123456789012345',
+                                                 '111.111.111-11', np.nan, '529.982.247-25']})
+    erros = validar_cpf_cnpj(df, save=False)
+
+    assert erros['Url'].tolist() == ['b', 'c', 'd']
+    assert erros['Mensagem'].tolist() == ['CPF/CNPJ com dígito verificador inválido [ 11.222.333/0001-82 ]',
+                                          'CPF/CNPJ com tamanho inválido [ 123456789012345 ]',
+                                          'CPF/CNPJ com dígito verificador inválido [ 111.111.111-11 ]']
+    assert validar_cpf_cnpj(df.iloc[:0], save=False).shape[0] == 0
+
+
+def test_dataset_sintetico(df):
+    docs = documentos_cpf_cnpj(df['Consultado (CPF/CNPJ)'])
+    formatados = df['Consultado (CPF/CNPJ)'].str.fullmatch(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}').fillna(False)
+    chaves = docs.loc[formatados, COL_CHAVE].astype(object)
+
+    assert (chaves.map(formata_documento) == df.loc[formatados, 'Consultado (CPF/CNPJ)']).all()
+    assert docs[COL_VALIDO].sum() > 0.85 * df.shape[0]
@@ -0,0 +1,55 @@
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt   # noqa: E402
+import pytest   # noqa: E402
+
+import graficos   # noqa: E402
+from agregacao import resultados_do_mapa   # noqa: E402
+
+
+@pytest.fixture
+def parte(df):
+    return df.iloc[:200]
+
+
+@pytest.fixture(params=[True, False], ids=['headless', 'pyplot'])
+def modo(request):
+    graficos.modo_headless(request.param)
+    yield request.param
+    graficos.modo_headless(False)
+    plt.close('all')
+
+
+@pytest.mark.filterwarnings('ignore:.*non-interactive:UserWarning')
+def test_figuras_fechadas_depois_de_cada_grafico(modo, parte, tmp_path):
+    path = str(tmp_path) + '/'
+    plt.close('all')
+
+    for folder in range(3):
+        graficos.gera_mapa_certidoes(parte, folder=str(folder), save=True, path=path)
+        graficos.gera_sheet_certidoes(parte, folder=str(folder), save=False)
+        graficos.gera_sheet_certidoesT(parte, folder=str(folder), save=False)
+        assert plt.get_fignums() == []
+
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_renderiza_em_lote(parte, tmp_path):
+    path = str(tmp_path) + '/'
+    show_result = resultados_do_mapa('all')
+    tarefas = []
+    for folder in (1, 2):
+        data = graficos.gera_mapa_certidoes(parte, results='all', plotar=False)
+        tarefas.append(('mapa', (data, show_result, True, folder), {'path': path}))
+    sheet = graficos.gera_sheet_certidoes(parte, plotar=False)
+    tarefas.append(('sheet', (sheet, 3), {'save': False}))
+
+    arquivos = graficos.renderiza_em_lote(tarefas, processos=2)
+
+    assert len(arquivos) == 3
+    assert ' Folder [ 1 ] ' in arquivos[0] and ' Folder [ 2 ] ' in arquivos[1]
+    assert arquivos[2] is None
+    assert all(os.path.exists(arquivo) for arquivo in arquivos[:2])
+    assert plt.get_fignums() == []
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ['matplotlib', 'requests', 'fuzzywuzzy']
+
+
+def modulos_carregados(codigo):
+    '''Executa o código num interpretador novo e devolve os módulos pesados carregados'''
+    verifica = codigo + '\nimport sys\nprint(",".join(m for m in %r if m in sys.modules))' % PESADOS
+    saida = subprocess.run([sys.executable, '-c', verifica], cwd=RAIZ, check=True,
+                           capture_output=True, text=True).stdout.strip()
+    return [m for m in saida.split(',') if m]
+
+
+@pytest.mark.parametrize('codigo', ['import validacoes',
+                                    'import validadores',
+                                    'import validacoes\nvalidacoes.validar_duplicidade\nvalidacoes.checar_validade',
+                                    'from validacoes import validar_datas, gera_mapa_certidoes, executa_pipeline'])
+def test_importacao_nao_carrega_modulos_pesados(codigo):
+    assert modulos_carregados(codigo) == []
+
+
+def test_fachada_carrega_sob_demanda():
+    saida = subprocess.run([sys.executable, '-c', 'import sys, validacoes\n'
+                            'antes = "validadores" in sys.modules\n'
+                            'validacoes.validar_datas\n'
+                            'print(antes, "validadores" in sys.modules)'],
+                           cwd=RAIZ, check=True, capture_output=True, text=True).stdout.split()
+    assert saida == ['False', 'True']
@@ -0,0 +1,108 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import instrumentacao as ins
+
+
+@pytest.fixture(autouse=True)
+def perfil_limpo():
+    ins.desativar_perfil()
+    ins.limpar_perfil()
+    yield
+    ins.desativar_perfil()
+    ins.limpar_perfil()
+
+
+@ins.medir
+def dobra(linhas):
+    return np.zeros((2 * linhas.shape[0], 1))
+
+
+@ins.medir('externa')
+def externa(linhas):
+    with ins.fase('interna', linhas_entrada=linhas.shape[0]) as f:
+        f.linhas_saida = 3
+    return dobra(linhas)
+
+
+def test_desligado_nao_registra_nada():
+    assert not ins.perfil_ativo()
+    assert ins.fase('qualquer') is ins._FASE_NULA
+
+    with ins.fase('qualquer') as f:
+        f.linhas_saida = 10
+    assert externa(np.zeros((5, 1))).shape == (10, 1)
+
+    assert ins.obter_perfil() == []
+
+
+def test_fases_aninhadas_e_linhas():
+    ins.ativar_perfil()
+    externa(np.zeros((5, 1)))
+    externa(np.zeros((7, 1)))
+
+    registros = {reg['fase']: reg for reg in ins.obter_perfil()}
+    assert set(registros) == {'externa', 'externa/interna', 'externa/dobra'}
+    assert registros['externa']['chamadas'] == 2
+    assert registros['externa']['nivel'] == 0
+    assert registros['externa/interna']['nivel'] == 1
+    assert registros['externa/interna']['linhas_entrada'] == 12
+    assert registros['externa/interna']['linhas_saida'] == 6
+    assert registros['externa/dobra']['linhas_saida'] == 24
+    assert registros['externa']['tempo_parede_s'] >= registros['externa/dobra']['tempo_parede_s']
+
+
+def test_fases_de_threads_diferentes_nao_se_aninham():
+    ins.ativar_perfil()
+    dentro = threading.Event()
+    pode_sair = threading.Event()
+
+    def trabalho():
+        with ins.fase('thread'):
+            with ins.fase('passo'):
+                dentro.set()
+                pode_sair.wait(10)
+
+    with ins.fase('principal'):
+        thread = threading.Thread(target=trabalho)
+        thread.start()
+        dentro.wait(10)
+        with ins.fase('passo'):
+            pass
+        pode_sair.set()
+        thread.join()
+
+    assert {reg['fase'] for reg in ins.obter_perfil()} == {'principal', 'principal/passo', 'thread', 'thread/passo'}
+
+
+def test_memoria_e_exportacao_json(tmp_path):
+    ins.ativar_perfil(memoria=True)
+    with ins.fase('aloca'):
+        bloco = np.ones(2_000_000)
+    del bloco
+    ins.desativar_perfil()
+
+    arquivo = ins.exportar_perfil('perfil', str(tmp_path) + '/')
+    with open(arquivo, encoding='utf-8') as arq:
+        perfil = json.load(arq)
+
+    assert set(perfil) == {'gerado_em', 'memoria', 'fases'}
+    assert perfil['memoria'] is True
+    [registro] = perfil['fases']
+    assert registro['fase'] == 'aloca'
+    assert registro['memoria_pico_mb'] >= 15
+    assert not (tmp_path / 'perfil.prof').exists()
+
+
+def test_exportacao_com_cprofile(tmp_path):
+    ins.ativar_perfil(cprofile=True)
+    externa(np.zeros((3, 1)))
+    ins.desativar_perfil()
+
+    ins.exportar_perfil('perfil', str(tmp_path) + '/')
+
+    assert (tmp_path / 'perfil.prof').exists()
+    assert ins.resumo_perfil()['fase'].iloc[0] == 'externa'
@@ -0,0 +1,75 @@
+import time
+import asyncio
+import threading
+
+from agendador import Agendador
+from pipeline import executa_pipeline, executa_pipeline_async
+
+
+# Funções de módulo: a validação roda em outro processo
+def valida_fake(folder_id, path):
+    return 'validada ' + str(folder_id)
+
+
+def valida_lenta(folder_id, path):
+    time.sleep(0.2)
+    return time.time()
+
+
+def baixa_falhando(folder_id):
+    if folder_id % 2:
+        raise ConnectionError('sem rede')
+    return False
+
+
+def test_pipeline_com_pasta_inexistente(servidor, tmp_path):
+    _, url = servidor
+    destino = str(tmp_path / 'baixadas') + '/'
+    (tmp_path / 'baixadas').mkdir()
+
+    resultados = executa_pipeline('token', url, [1, 99, 2], destino, validadores=1, max_fila=1,
+                                  agendador=Agendador(taxa=100, tentativas=1))
+
+    assert list(resultados) == [1, 99, 2]
+    assert resultados[99] == 'Download da pasta [ 99 ] não concluído'
+    for folder in (1, 2):
+        assert set(resultados[folder]) == {'duplicidade', 'datas', 'validade', 'cpf_cnpj', 'cnpj_razao'}
+
+
+def test_downloads_que_falham_devolvem_as_vagas():
+    # Uma única vaga (max_fila=0, validadores=1): se uma falha não devolvesse a vaga, o
+    # pipeline travaria na segunda pasta
+    pipeline = executa_pipeline_async('token', 'http://nao.usado/', list(range(6)), baixa=baixa_falhando,
+                                      valida=valida_fake, max_fila=0, validadores=1)
+    resultados = asyncio.run(asyncio.wait_for(pipeline, timeout=30))
+
+    for folder, resultado in resultados.items():
+        if folder % 2:
+            assert isinstance(resultado, ConnectionError)
+        else:
+            assert resultado == 'Download da pasta [ ' + str(folder) + ' ] não concluído'
+
+
+def test_pipeline_valida_pastas_baixadas():
+    resultados = executa_pipeline('token', 'http://nao.usado/', [3, 4], baixa=lambda folder: True,
+                                  valida=valida_fake, max_fila=0)
+
+    assert resultados == {3: 'validada 3', 4: 'validada 4'}
+
+
+def test_downloads_esperam_a_validacao_atrasada():
+    inicios = {}
+    trava = threading.Lock()
+
+    def baixa(folder_id):
+        with trava:
+            inicios[folder_id] = time.time()
+        return True
+
+    fins = executa_pipeline('token', 'http://nao.usado/', list(range(6)), baixa=baixa, valida=valida_lenta,
+                            downloads=4, max_fila=1, validadores=1)
+
+    # Em nenhum início de download há mais de max_fila + validadores pastas em andamento
+    for inicio in inicios.values():
+        em_andamento = sum(1 for f in inicios if inicios[f] <= inicio < fins[f])
+        assert em_andamento <= 2
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacao import ultimas_certidoes
+from carregadores import read_parameters
+from graficos import get_supplier_score, modo_headless, suppliers_score
+from pontuacao import classifica_pontuacao, pesos_cenario, pontua_cenarios, prepara_pontuacao
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+@pytest.fixture(scope='module')
+def special_scores():
+    return read_parameters(path=RAIZ)
+
+
+@pytest.fixture(autouse=True)
+def headless():
+    modo_headless(True)
+    yield
+    modo_headless(False)
+
+
+def score_por_linha(df2, suppliers, special_scores):
+    '''Pontuação fornecedor a fornecedor, como no validacoes.py original'''
+    columns = df2.columns.tolist()
+    scores = {}
+    for row in df2.itertuples():
+        sup_param = suppliers.loc[suppliers.CNPJ_CPF == row[0], ['Classificação', 'Terceiro']]
+        if sup_param.empty:
+            continue
+        curve_ABC = ord(sup_param.iloc[0, 0]) - 64
+        third_local = sup_param.iloc[0, 1]
+        sp_sc_dict = {str(r[0]): r[curve_ABC + (3 * third_local)] for r in special_scores.itertuples(index=False)}
+        scores[row[0]] = get_supplier_score(row[1:], sp_sc_dict, columns)
+    return pd.Series(scores, dtype=np.float64)
+
+
+def test_pontuacao_igual_a_por_linha(df, fornecedores, special_scores):
+    df2 = ultimas_certidoes(df)
+    esperado = score_por_linha(df2.fillna(''), fornecedores, special_scores)
+
+    obtido = pontua_cenarios(prepara_pontuacao(df, fornecedores, ultimas=df2), special_scores)['score']
+
+    assert len(esperado) > 0
+    pd.testing.assert_series_equal(obtido.reindex(esperado.index), esperado, check_names=False)
+
+
+def test_suppliers_score_deixa_nan_fora_do_cadastro(df, fornecedores, special_scores, tmp_path):
+    metade = fornecedores.iloc[:fornecedores.shape[0] // 2]
+    df2 = suppliers_score(df, metade, special_scores, save=True, path=str(tmp_path) + '/')
+
+    cadastrados = df2.index.isin(metade['CNPJ_CPF'])
+    assert df2.loc[cadastrados, 'score'].notna().all()
+    assert df2.loc[~cadastrados, 'score'].isna().all()
+    assert len(os.listdir(tmp_path)) == 1
+
+
+@pytest.mark.parametrize('caso', ['sem_cadastro', 'vazio'])
+def test_nenhum_fornecedor_pontuado(df, fornecedores, special_scores, tmp_path, caso):
+    if caso == 'sem_cadastro':
+        suppliers = fornecedores.assign(CNPJ_CPF='00.000.000/0000-00')
+    else:
+        suppliers = fornecedores.iloc[:0]
+
+    df2 = suppliers_score(df, suppliers, special_scores, save=True, path=str(tmp_path) + '/')
+
+    assert df2['score'].isna().all()
+    assert os.listdir(tmp_path) == []   # nada para plotar
+
+
+def test_cenarios_e_classificacao(df, fornecedores, special_scores):
+    matriz = prepara_pontuacao(df, fornecedores)
+    dobro = special_scores.copy()
+    dobro.iloc[:, 1:] = dobro.iloc[:, 1:] * 2
+
+    scores = pontua_cenarios(matriz, {'base': special_scores, 'dobro': dobro})
+    assert (scores['dobro'] >= scores['base']).all()
+
+    cores = classifica_pontuacao(scores['base'])
+    maximo = scores['base'].max()
+    assert (cores[scores['base'] > 0.7 * maximo] == 'red').all()
+    assert (cores[scores['base'] <= 0.3 * maximo] == 'green').all()
+
+
+def test_pesos_invalidos(special_scores):
+    vazio = special_scores.copy()
+    vazio.iloc[0, 1] = np.nan
+    with pytest.raises(ValueError):
+        pesos_cenario(vazio, ['100'])
+    with pytest.raises(ValueError):
+        pesos_cenario(special_scores.drop(columns=special_scores.columns[1]), ['100'])
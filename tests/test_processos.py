@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import processos
+from dados_sinteticos import gera_pasta_sintetica
+from processos import (assinatura_processos, certidoes_do_processo, formata_processo, indice_processos,
+                       monta_indice_processos, normaliza_processo, processos_compartilhados, processos_da_certidao,
+                       processos_novos)
+
+
+P1 = '0001234-56.2020.8.26.0100'
+P2 = '7654321-00.2021.4.01.3400'
+P3 = '0000001-11.2019.5.02.0001'
+
+
+@pytest.fixture
+def certidoes():
+    df = pd.DataFrame({'Nome': ['a.pdf', 'b.pdf', 'c.pdf', 'd.pdf'],
+                       'Consultado (CPF/CNPJ)': ['11.222.333/0001-81', '11222333000181', '529.982.247-25', np.nan]})
+    dfp = pd.DataFrame({'Nome': ['a.pdf', 'a.pdf', 'b.pdf', 'c.pdf', 'c.pdf', 'd.pdf', 'd.pdf'],
+                        'Número do Processo': [P2, P1, '1234-56.2020.8.26.0100', P1, P1, P3, np.nan]})
+    return df, dfp
+
+
+def test_normaliza_processo():
+    chaves = normaliza_processo(pd.Series([P1, '1234-56.2020.8.26.0100', '12345620208260100', '', 'sem número', np.nan]))
+
+    assert chaves.iloc[0] == chaves.iloc[1] == chaves.iloc[2] == '00012345620208260100'
+    assert chaves.iloc[3:].isna().all()
+    assert formata_processo(chaves.iloc[0]) == P1
+    assert formata_processo('123') == '123'
+
+
+def test_consultas_do_indice(certidoes):
+    df, dfp = certidoes
+    indice = monta_indice_processos(dfp, df)
+
+    assert indice['pares'].shape[0] == 5   # sem repetições nem processos vazios
+    assert certidoes_do_processo(indice, '1234-56.2020.8.26.0100')['Nome'].tolist() == ['a.pdf', 'b.pdf', 'c.pdf']
+    assert certidoes_do_processo(indice, 'inexistente').empty
+    assert processos_da_certidao(indice, 'a.pdf') == tuple(sorted(normaliza_processo(pd.Series([P1, P2]))))
+    assert processos_da_certidao(indice, 'x.pdf') == ()
+    assert assinatura_processos(indice, ['b.pdf', 'x.pdf']) == ['00012345620208260100', '']
+
+
+def test_processos_compartilhados(certidoes):
+    df, dfp = certidoes
+    compartilhados = processos_compartilhados(monta_indice_processos(dfp, df))
+
+    # a e b são o mesmo CNPJ, formatado de jeitos diferentes; d não tem CPF/CNPJ
+    assert compartilhados['Número do Processo'].tolist() == [P1]
+    assert compartilhados['Quantidade'].tolist() == [2]
+    assert compartilhados['CPF/CNPJs'].iloc[0] == ['11222333000181', '52998224725']
+    assert processos_compartilhados(monta_indice_processos(dfp, df), minimo=3).empty
+
+
+def test_processos_novos(certidoes):
+    df, dfp = certidoes
+    anterior = monta_indice_processos(dfp[dfp['Nome'] == 'b.pdf'])
+    novos = processos_novos(monta_indice_processos(dfp), anterior)
+
+    assert sorted(map(formata_processo, novos['Processo'].unique())) == sorted([P2, P3])
+    assert processos_novos(anterior, anterior).empty
+
+
+def test_indice_em_disco_refeito_quando_a_pasta_muda(tmp_path, fornecedores, monkeypatch):
+    path = str(tmp_path) + os.sep
+    gera_pasta_sintetica(1, 150, fornecedores, seed=1, path=path)
+
+    montagens = []
+    monta = processos.monta_indice_processos
+    monkeypatch.setattr(processos, 'monta_indice_processos', lambda dfp, df=None: montagens.append(1) or monta(dfp, df))
+
+    indice = indice_processos(1, path=path)
+    assert os.path.exists(path + 'indice-processos-caso-1.csv')
+    assert len(montagens) == 1
+
+    lido = indice_processos(1, path=path)   # lido do disco
+    assert len(montagens) == 1
+    pd.testing.assert_frame_equal(lido['pares'], indice['pares'])
+
+    positivos = path + 'positivos-caso-1.csv'
+    dfp = pd.read_csv(positivos, dtype=str)
+    dfp.loc[0, 'Número do Processo'] = P3
+    dfp.to_csv(positivos, index=False)
+    mtime = os.path.getmtime(path + 'indice-processos-caso-1.csv')
+    os.utime(positivos, (mtime + 10, mtime + 10))
+
+    refeito = indice_processos(1, path=path)
+    assert len(montagens) == 2
+    assert dfp.loc[0, 'Nome'] in certidoes_do_processo(refeito, P3)['Nome'].tolist()
+
+
+def test_indice_de_pasta_sem_positivos(tmp_path, fornecedores, capsys):
+    path = str(tmp_path) + os.sep
+    gera_pasta_sintetica(1, 50, fornecedores, seed=1, path=path)
+    gera_pasta_sintetica(2, 50, fornecedores, seed=2, path=path)
+    os.remove(path + 'positivos-caso-2.csv')
+
+    indice = indice_processos([1, 2], path=path)
+
+    assert 'WARNING: pasta 2 sem arquivo de positivos' in capsys.readouterr().out
+    pd.testing.assert_frame_equal(indice['pares'], indice_processos(1, path=path)['pares'])
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import COLS_DUPLICIDADE
+from processos import monta_indice_processos
+from validadores import validar_duplicidade
+import quase_duplicadas as qd
+
+
+def grupos_por_url(erros):
+    return erros.groupby('Grupo')['Url'].agg(frozenset).tolist()
+
+
+@pytest.mark.parametrize('linhas', [0, 1, 2, 30])
+def test_aproximada_em_frames_vazios_e_pequenos(df, dfp, linhas):
+    parte = df.iloc[:linhas]
+
+    exata = validar_duplicidade(parte, dfp, COLS_DUPLICIDADE, save=False)
+    aproximada = validar_duplicidade(parte, dfp, COLS_DUPLICIDADE, save=False, aproximada=True)
+
+    assert list(aproximada.columns) == list(exata.columns) + ['Similaridade']
+    assert set(exata['Url']) <= set(aproximada['Url'])
+
+
+def test_duplicadas_exatas_continuam_no_modo_aproximado(df, dfp):
+    exata = validar_duplicidade(df, dfp, COLS_DUPLICIDADE, save=False)
+    aproximada = validar_duplicidade(df, dfp, COLS_DUPLICIDADE, save=False, aproximada=True)
+
+    assert exata.shape[0] > 0
+    grupos_aproximados = grupos_por_url(aproximada)
+    for grupo in grupos_por_url(exata):   # cada grupo exato cabe inteiro num grupo aproximado
+        assert any(grupo <= outro for outro in grupos_aproximados)
+
+    exatas = aproximada[aproximada['Url'].isin(exata['Url'])]
+    assert (exatas['Similaridade'] == 1.0).all()
+    assert (exatas['Mensagem'] == 'Possível certidão duplicada').all()
+
+
+def test_quase_duplicada_com_um_dia_de_diferenca(df, dfp):
+    original = df[df['Resultado'] == 'Negativa'].iloc[0]
+    copia = original.copy()
+    copia['Url'], copia['Nome'] = 'copia', 'copia.pdf'
+    emissao = pd.to_datetime(original['Emitido em'], format='%d/%m/%Y') + pd.Timedelta(days=1)
+    copia['Emitido em'] = emissao.strftime('%d/%m/%Y')
+    copia['Consultado (CPF/CNPJ)'] = ' ' + str(original['Consultado (CPF/CNPJ)']).replace('.', ' ')
+
+    erros = validar_duplicidade(pd.concat([df, copia.to_frame().T], ignore_index=True), dfp,
+                                COLS_DUPLICIDADE, save=False, aproximada=True)
+
+    grupo = erros.loc[erros['Url'] == 'copia', 'Grupo']
+    assert len(grupo) == 1
+    assert original['Url'] in set(erros.loc[erros['Grupo'] == grupo.iloc[0], 'Url'])
+
+
+def test_lsh_encontra_os_mesmos_pares_que_a_forca_bruta(df, dfp):
+    linhas, fichas = qd.fichas_certidoes(df, COLS_DUPLICIDADE, monta_indice_processos(dfp))
+
+    i, j = np.triu_indices(df.shape[0], 1)
+    todos = np.column_stack([i, j])
+    esperados = set(map(tuple, todos[qd.similaridades(linhas, fichas, todos) >= qd.LIMIAR].tolist()))
+
+    assinaturas = qd.assinaturas_minhash(linhas, fichas, df.shape[0])
+    pares = qd.pares_lsh(assinaturas)
+    pares = pares[qd.estimativas_minhash(assinaturas, pares) >= qd.LIMIAR - qd.FOLGA]
+    encontrados = set(map(tuple, pares[qd.similaridades(linhas, fichas, pares) >= qd.LIMIAR].tolist()))
+
+    assert esperados
+    assert encontrados == esperados
@@ -0,0 +1,115 @@
+import os
+import shutil
+
+import pytest
+
+from dados_sinteticos import gera_pasta_sintetica
+from servico import CacheLRU, ClienteServico, Servico, inicia_servico
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def pastas(tmp_path, fornecedores):
+    '''Pastas sintéticas 1 e 2, cadastro de fornecedores e pontuações especiais em tmp_path'''
+    path = str(tmp_path) + os.sep
+    for folder in (1, 2):
+        gera_pasta_sintetica(folder, 150, fornecedores, seed=folder, path=path)
+    fornecedores.to_excel(path + 'suppliers.xlsx', index=False)
+    shutil.copy(os.path.join(RAIZ, 'special-scores.xlsx'), path + 'special-scores.xlsx')
+    return path
+
+
+@pytest.fixture
+def cliente(pastas):
+    servidor, url = inicia_servico(pastas, porta=0)
+    yield ClienteServico(url, timeout=120)
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_cache_lru_acertos_e_descartes():
+    cache = CacheLRU(capacidade=2)
+    calculos = []
+
+    def calcula(chave):
+        return lambda: calculos.append(chave) or chave.upper()
+
+    assert cache.obtem('a', calcula('a')) == 'A'
+    assert cache.obtem('a', calcula('a')) == 'A'
+    cache.obtem('b', calcula('b'))
+    cache.obtem('a', calcula('a'))   # 'a' passa a ser o mais recente
+    cache.obtem('c', calcula('c'))   # descarta 'b'
+
+    assert calculos == ['a', 'b', 'c']
+    assert cache.resumo() == {'itens': ['a', 'c'], 'acertos': 2, 'faltas': 3, 'descartes': 1}
+
+    cache.descarta('a')
+    cache.obtem('a', calcula('a'))
+    assert calculos == ['a', 'b', 'c', 'a']
+
+
+def test_pasta_relida_quando_o_arquivo_muda(pastas):
+    servico = Servico(pastas)
+
+    dados = servico.pasta(1)
+    assert servico.pasta(1) is dados
+    assert servico.pastas.estatisticas['acertos'] == 1
+
+    arquivo = pastas + 'caso-1.xlsx'
+    mtime = os.path.getmtime(arquivo)
+    os.utime(arquivo, (mtime + 10, mtime + 10))
+
+    assert servico.pasta(1) is not dados
+    assert servico.pastas.estatisticas['faltas'] == 2
+
+
+def test_validacao_e_pontuacao_em_cache(pastas):
+    servico = Servico(pastas)
+
+    erros = servico.valida(1)
+    assert servico.valida(1) is erros
+    assert servico.validacoes.estatisticas == {'acertos': 1, 'faltas': 1, 'descartes': 0}
+
+    servico.pontua([1, 2])
+    servico.pontua([1, 2])
+    assert servico.parametros.estatisticas['faltas'] == 2   # fornecedores e pontuações, uma vez cada
+    assert servico.pastas.estatisticas['faltas'] == 2       # a pasta 1 veio do cache
+
+
+def test_rotas_respondem(cliente):
+    erros = cliente.valida(1)
+    assert set(erros) == {'duplicidade', 'datas', 'validade', 'cpf_cnpj', 'cnpj_razao'}
+
+    scores = cliente.pontua([1, 2])
+    assert not scores.empty
+
+    cliente.pontua([1, 2])
+    estado = cliente.estado()
+    assert estado['pastas']['acertos'] > 0
+    assert sorted(estado['pastas']['itens']) == ['1', '2']
+
+
+@pytest.mark.parametrize('rota, corpo', [
+    ('valida', {}),
+    ('pontua', {}),
+    ('mapa', {'pastas': []}),
+    ('pontua', {'pastas': [1], 'mes_de': '13/2024'}),
+    ('mapa', {'pastas': [1], 'mes_ate': 'dez/2024'}),
+    ('mapa', {'pastas': [1], 'resultados': 'nenhum'}),
+])
+def test_requisicoes_invalidas_respondem_400(cliente, rota, corpo):
+    with pytest.raises(RuntimeError, match='Serviço respondeu 400'):
+        cliente.requisita(rota, **corpo)
+
+
+@pytest.mark.parametrize('rota, corpo', [
+    ('valida', {'pasta': 99}),
+    ('pontua', {'pastas': [1, 99]}),
+    ('pontua', {'pastas': [1, 2], 'mes_de': '01/1990', 'mes_ate': '12/1990'}),
+    ('mapa', {'pastas': [1, 2], 'mes_de': '01/1990', 'mes_ate': '12/1990'}),
+])
+def test_selecoes_vazias_respondem_404(cliente, rota, corpo):
+    with pytest.raises(RuntimeError, match='Serviço respondeu 404'):
+        cliente.requisita(rota, **corpo)
@@ -0,0 +1,69 @@
+import pytest
+
+from conftest import COLS_DUPLICIDADE
+from carregadores import compacta_dataset
+from correspondencia import validar_cnpj_razao
+from validadores import validar_duplicidade, validar_datas, checar_validade
+
+
+def linhas(erros, colunas=('Url', 'Mensagem')):
+    return sorted(map(tuple, erros[list(colunas)].astype(str).to_numpy().tolist()))
+
+
+def grupos(erros):
+    return sorted(sorted(urls) for urls in erros.groupby('Grupo')['Url'].agg(list))
+
+
+@pytest.fixture(params=[False, True], ids=['objeto', 'compacto'])
+def df_teste(request, df):
+    # compacta_dataset altera o dataset recebido: o original fica para o validador de referência
+    return compacta_dataset(df.copy()) if request.param else df
+
+
+def test_validar_duplicidade(baseline, df_teste, df, dfp):
+    esperado = baseline.validar_duplicidade(df, dfp, COLS_DUPLICIDADE, save=False)
+    obtido = validar_duplicidade(df_teste, dfp, COLS_DUPLICIDADE, save=False)
+
+    assert esperado.shape[0] > 0
+    assert grupos(obtido) == grupos(esperado)
+    assert set(obtido['Mensagem']) == set(esperado['Mensagem'])
+
+
+def test_validar_datas(baseline, df_teste, df):
+    cols = ['Emitido em']
+    esperado = baseline.validar_datas(df, cols, is_null_error=True, save=False)
+    obtido = validar_datas(df_teste, cols, is_null_error=True, save=False)
+
+    assert esperado.shape[0] > 0
+    assert linhas(obtido) == linhas(esperado)
+
+
+def test_checar_validade(baseline, df_teste, df):
+    esperado = baseline.checar_validade(df, limit_date='01/01/2026', save=False)
+    obtido = checar_validade(df_teste, limit_date='01/01/2026', save=False)
+
+    assert esperado.shape[0] > 0
+    assert linhas(obtido) == linhas(esperado)
+
+
+def test_validar_cnpj_razao(baseline, df_teste, df):
+    df_esperado, esperado = baseline.validar_cnpj_razao(df.copy(), save=False)
+    df_obtido, obtido = validar_cnpj_razao(df_teste.copy(), save=False)
+
+    assert esperado.shape[0] > 0
+    assert linhas(obtido, ('Url', 'Mensagem', 'Url Referência')) == linhas(esperado, ('Url', 'Mensagem', 'Url Referência'))
+    assert df_obtido['Consultado (CPF/CNPJ)'].astype(object).fillna('').tolist() == \
+        df_esperado['Consultado (CPF/CNPJ)'].astype(object).fillna('').tolist()
+
+
+@pytest.mark.parametrize('linhas_df', [0, 1])
+def test_frames_vazios_e_de_uma_linha(baseline, df, dfp, linhas_df):
+    parte = df.iloc[:linhas_df]
+
+    assert validar_duplicidade(parte, dfp, COLS_DUPLICIDADE, save=False).shape[0] == 0
+    assert linhas(validar_datas(parte, ['Emitido em'], is_null_error=True, save=False)) == \
+        linhas(baseline.validar_datas(parte, ['Emitido em'], is_null_error=True, save=False))
+    assert linhas(checar_validade(parte, limit_date='01/01/2026', save=False)) == \
+        linhas(baseline.checar_validade(parte, limit_date='01/01/2026', save=False))
+    assert linhas(validar_cnpj_razao(parte.copy(), save=False)[1]) == \
+        linhas(baseline.validar_cnpj_razao(parte.copy(), save=False)[1])
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from visualizador import VisualizadorErros, monta_indice
+
+
+@pytest.fixture
+def erros():
+    n = 23
+    return pd.DataFrame({'Regra': ['datas', 'validade', 'duplicidade'] * 7 + ['datas', np.nan],
+                         'Pasta': [1, 2] * 11 + [np.nan],
+                         'Grupo': [float(k // 4) if k % 5 else np.nan for k in range(n)],
+                         'Mensagem': 'Erro <b>',
+                         'Url': ['u' + str(k) for k in range(n)]},
+                        index=range(100, 100 + n))
+
+
+def esperadas(erros, mascara):
+    return erros.loc[mascara.to_numpy(), 'Url'].tolist()
+
+
+def test_indice_ignora_nulos():
+    indice = monta_indice(pd.Series(['a', np.nan, 'b', 'a', None]))
+
+    assert set(indice) == {'a', 'b'}
+    assert indice['a'].tolist() == [0, 3]
+    assert monta_indice(pd.Series([np.nan, np.nan])) == {}
+
+
+def test_paginacao(erros):
+    v = VisualizadorErros(erros, tamanho_pagina=5)
+
+    assert v.total_paginas == 5
+    assert v.pagina()['Url'].tolist() == ['u0', 'u1', 'u2', 'u3', 'u4']
+    assert v.proxima()['Url'].tolist() == ['u5', 'u6', 'u7', 'u8', 'u9']
+    assert v.pagina(5)['Url'].tolist() == ['u20', 'u21', 'u22']
+    assert v.proxima()['Url'].tolist() == ['u20', 'u21', 'u22']   # fica na última
+    assert v.pagina(99)['Url'].tolist() == ['u20', 'u21', 'u22']
+    assert v.pagina(0)['Url'].tolist() == ['u0', 'u1', 'u2', 'u3', 'u4']
+    assert v.anterior()['Url'].tolist() == ['u0', 'u1', 'u2', 'u3', 'u4']   # fica na primeira
+
+    v.pagina(3)
+    assert v.anterior()['Url'].iloc[0] == 'u5'
+    assert 'Página 2 de 5 (23 de 23 erros)' in v.html_pagina()
+
+
+def test_filtros_combinados(erros):
+    v = VisualizadorErros(erros, tamanho_pagina=4)
+
+    v.pagina(3)
+    v.filtra(Regra=['datas', 'validade', 'datas'], Pasta=1)
+    assert v.atual == 0   # filtrar volta para a primeira página
+    mascara = erros['Regra'].isin(['datas', 'validade']) & (erros['Pasta'] == 1)
+    assert v.posicoes.tolist() == np.flatnonzero(mascara).tolist()
+    assert v.total_paginas == -(-mascara.sum() // 4)
+
+    v.filtra(Grupo=[1.0, 3.0])
+    mascara &= erros['Grupo'].isin([1.0, 3.0])
+    assert [u for p in range(1, v.total_paginas + 1) for u in v.pagina(p)['Url']] == esperadas(erros, mascara)
+
+    v.filtra(Pasta=None)   # remove só o filtro da Pasta
+    assert set(v.filtros) == {'Regra', 'Grupo'}
+    assert v.posicoes.tolist() == np.flatnonzero(erros['Regra'].isin(['datas', 'validade']) &
+                                                 erros['Grupo'].isin([1.0, 3.0])).tolist()
+
+    v.filtra(Regra='inexistente')
+    assert v.pagina().empty
+    assert v.total_paginas == 1
+    assert 'Página 1 de 1 (0 de 23 erros)' in v.html_pagina()
+
+    v.limpa_filtros()
+    assert v.filtros == {}
+    assert len(v.posicoes) == erros.shape[0]
+
+
+def test_nulos_nas_colunas_indexadas(erros):
+    v = VisualizadorErros(erros, tamanho_pagina=50)
+
+    assert sum(v.valores('Grupo').values()) == erros['Grupo'].notna().sum()
+    assert sum(v.valores('Pasta').values()) == 22
+
+    # sem filtro na coluna, as linhas com ela vazia continuam visíveis
+    v.filtra(Regra='datas')
+    assert v.pagina()['Url'].tolist() == esperadas(erros, erros['Regra'] == 'datas')
+    assert erros['Grupo'].isna().iloc[0] and ('u0' in v.pagina()['Url'].tolist())
+    assert v.filtra(Pasta=[1, 2]).pagina()['Url'].tolist() == esperadas(erros, (erros['Regra'] == 'datas') &
+                                                                          erros['Pasta'].notna())
+
+    html = v.limpa_filtros().html_pagina()
+    assert 'NaN' not in html and 'nan' not in html
+    assert 'Erro &lt;b&gt;' in html
+    assert '<a href="u22">u22</a>' in html
+
+
+def test_coluna_sem_indice(erros):
+    v = VisualizadorErros(erros)
+
+    with pytest.raises(ValueError):
+        v.filtra(Url='u1')
+    with pytest.raises(ValueError):
+        v.filtra(Situação='Novo')   # coluna indexável, mas ausente da tabela
+
+
+def test_resultado_buscado_nas_certidoes(erros):
+    certidoes = pd.DataFrame({'Url': ['u1', 'u1', 'u3'], 'Resultado': ['Positiva', 'Negativa', 'Negativa']})
+    v = VisualizadorErros(erros, tamanho_pagina=4, certidoes=certidoes)
+
+    pagina = v.pagina()
+    assert pagina['Resultado'].iloc[1] == 'Positiva'   # primeira certidão com a Url
+    assert pagina['Resultado'].iloc[3] == 'Negativa'
+    assert pagina['Resultado'].iloc[[0, 2]].isna().all()
+    assert 'background-color' in v.html_pagina()
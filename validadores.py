@@ -0,0 +1,331 @@
+import pandas as pd
+import numpy as np
+
+from datetime import datetime, date
+from dateutil.relativedelta import relativedelta
+import time
+
+from instrumentacao import medir, fase
+from processos import monta_indice_processos, assinatura_processos
+
+
+'''
+Funcao: monta_processos
+Finalidade: Obter todos os processos de uma certidão positiva, montando uma string com eles
+Parâmetros: 
+              dfp -> dataset com as anotações positivas
+             nome -> Nome do arquivo da certidão
+Retorno: string com os números dos processos encontrados
+'''
+def monta_processos(dfp, nome):
+
+    procs = dfp[dfp['Nome'] == nome].sort_values('Número do Processo')
+    str_procs = ''
+    for proc in procs.itertuples():
+        str_procs += proc[3]
+        
+    return str_procs
+
+
+'''
+Funcao: validar_duplicidade
+Finalidade: Verificar se existem linhas duplicadas em um dataset, considerando-se um conjunto de features,
+            bem como os processos, em caso de certidão positiva
+Parâmetros: 
+               df -> dataset que se deseja verificar duplicidades
+              dfp -> dataset com as anotações positivas
+    cols_to_group -> lista com as colunas que devem ser verificadas
+    col_to_report -> coluna que será informada no caso de erro
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+          armazem -> conexão com o armazém local (opcional). Se informada, df e dfp são
+                     ignorados e o agrupamento é feito no armazém, nas pastas informadas
+           pastas -> Número da pasta, ou lista de pastas, a verificar no armazém
+           indice -> índice de processos já montado (ver processos.indice_processos). Se não for
+                     informado, é montado só para as certidões duplicadas
+       aproximada -> procura também certidões quase duplicadas (espaços, processos fora de ordem
+                     ou faltando, emissão com um dia de diferença) por MinHash/LSH; o resultado
+                     ganha a coluna 'Similaridade' (ver quase_duplicadas.quase_duplicadas)
+           limiar -> similaridade mínima no modo aproximado
+Retorno: dataframe com as linhas e mensagens de erro
+'''
+@medir
+def validar_duplicidade (   df, 
+                            dfp, 
+                            cols_to_check=[], 
+                            col_to_report='Url', 
+                            folder='',
+                            save=True, 
+                            path='',
+                            armazem=None,
+                            pastas=None,
+                            indice=None,
+                            aproximada=False,
+                            limiar=None):
+
+    if aproximada:  # quase duplicadas não se resolvem no armazém: todas as certidões entram
+        from quase_duplicadas import quase_duplicadas, LIMIAR
+        if armazem is not None:
+            from armazem import consulta_certidoes, consulta_positivos
+            df, dfp = consulta_certidoes(armazem, pastas=pastas), consulta_positivos(armazem, pastas=pastas)
+        if indice is None:
+            indice = monta_indice_processos(dfp)
+        erros_df = quase_duplicadas(df, cols_to_check, indice, col_to_report, LIMIAR if limiar is None else limiar)
+
+    else:
+        if armazem is not None: # só as candidatas a duplicadas vêm do armazém
+            from armazem import duplicidades_armazem
+            df, dfp = duplicidades_armazem(armazem, cols_to_check, pastas)
+        erros_df = agrupa_duplicadas(df, dfp, cols_to_check, col_to_report, indice)
+
+    if (save) and (erros_df.shape[0] > 0):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        save_to = path + 'Certidões Duplicadas Folder [ ' + folder + ' ] - ' + timestr + '.xlsx'
+        erros_df.to_excel(save_to, sheet_name='Erros')
+
+    return erros_df
+
+
+'''
+Funcao auxiliar: agrupa_duplicadas
+Finalidade: Agrupar as certidões exatamente duplicadas (mesmas colunas e mesmos processos)
+Parâmetros:
+               df -> dataset que se deseja verificar duplicidades
+              dfp -> dataset com as anotações positivas
+    cols_to_check -> lista com as colunas que devem ser verificadas
+    col_to_report -> coluna que será informada no caso de erro
+           indice -> índice de processos já montado (opcional)
+Retorno: dataframe com Grupo, Url e Mensagem
+'''
+def agrupa_duplicadas(df, dfp, cols_to_check, col_to_report, indice=None):
+
+    dupdf = df[df.duplicated(cols_to_check, keep=False)]
+
+    # Assinatura dos processos de cada certidão positiva, buscada no índice invertido em vez
+    # de varrer dfp certidão por certidão (ver monta_processos)
+    with fase('montagem de processos', linhas_entrada=dupdf.shape[0]):
+        if indice is None:
+            indice = monta_indice_processos(dfp[dfp['Nome'].isin(dupdf.iloc[:, 0])])
+        assinaturas = assinatura_processos(indice, dupdf.iloc[:, 0].to_numpy())
+        str_procs = np.where((dupdf['Resultado'] == 'Positiva').to_numpy(), assinaturas, '').tolist()
+
+    dupdf.insert(loc=dupdf.shape[1],column='Processos', value=str_procs ,allow_duplicates=True)
+    cols_to_check2 = cols_to_check.copy()
+    cols_to_check2.append('Processos')
+
+    # No dataset compacto, as colunas categóricas são agrupadas pelos seus códigos, com os nulos
+    # por último, o que dá os mesmos grupos (e na mesma ordem) que as colunas texto
+    chaves = dupdf[cols_to_check2].reset_index(drop=True)
+    for col in cols_to_check2:
+        if isinstance(chaves[col].dtype, pd.CategoricalDtype):
+            codigos = chaves[col].cat.codes.astype(np.int32)
+            chaves[col] = codigos.where(codigos >= 0, len(chaves[col].cat.categories))
+    chaves[col_to_report] = dupdf[col_to_report].to_numpy()
+
+    dup_w_process = chaves.groupby(cols_to_check2, dropna=False)[col_to_report].apply(np.array).reset_index(name=col_to_report)
+
+    urls = []
+    erros = []
+    grupos = []
+    grupo = 1
+
+    for line in dup_w_process.itertuples():
+        if (len(line[len(cols_to_check2)+1])) > 1:
+            for dupurl in line[len(cols_to_check2)+1]:
+                grupos.append(grupo)
+                urls.append(dupurl)
+                erros.append('Possível certidão duplicada')
+                
+            grupo += 1
+
+    return pd.DataFrame.from_dict({'Grupo': grupos, 'Url': urls, 'Mensagem': erros})
+
+
+'''
+Funcao: valida_data
+Finalidade: Verifica se uma string possui uma data válida, de acordo com um formato
+Parâmetros: 
+             data -> String com a data
+           format -> O formato em que a data deveria estar
+    is_null_error -> Considera valores nulos errado ou não
+Retorno: se a data for válida, retorna ela, caso contrário retorna ''
+'''
+def valida_data(data, format='%d/%m/%Y', is_null_error=False):
+
+    try:
+        date = datetime.strptime(data, format).date()
+    except:
+        date = ''
+
+    return date
+
+
+'''
+Funcao: validar_datas
+Finalidade: Verificar se colunas de datas de um dataframe estão corretas
+Parâmetros: 
+               df -> dataset que se deseja verificar as colunas
+        cols_date -> lista com as colunas a serem verificadas
+           format -> O formato em que as datas deveriam estar
+    col_to_report -> coluna que será informada no caso de erro
+    is_null_error -> Considera valores nulos errados ou não
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: dataframe com as linhas e mensagens de erro
+'''
+@medir
+def validar_datas ( df, 
+                    cols_date=[], 
+                    format='%d/%m/%Y', 
+                    col_to_report='Url', 
+                    is_null_error=False, 
+                    folder='',
+                    save=True, 
+                    path=''):
+
+    urls = []
+    erros = []
+    cols = cols_date.copy()
+    cols.append(col_to_report)
+    with fase('laço por linha', linhas_entrada=df.shape[0]) as f:
+        for line in df[cols].itertuples():
+            for col in range(len(cols_date)):
+                if pd.notna(line[col+1]):
+                    date = valida_data(line[col+1])
+                    if date == '':
+                        urls.append(line[len(cols)])
+                        erros.append('Data com problema: Coluna [ ' + cols_date[col] + ' ] Valor [ ' + line[col+1]+ ' ]')
+                else:
+                    if is_null_error:
+                        urls.append(line[len(cols)])
+                        erros.append('Data com problema: Coluna [ ' + cols_date[col] + ' ]  Vazia')
+        f.linhas_saida = len(erros)
+
+    erros_df = pd.DataFrame.from_dict({'Url': urls, 'Mensagem': erros})
+
+    if (save) and (erros_df.shape[0] > 0):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        save_to = path + 'Certidões com Datas Erradas Folder [ ' + folder + ' ] - ' + timestr + '.xlsx'
+        erros_df.to_excel(save_to, sheet_name='Erros')
+
+    return erros_df
+
+
+'''
+Funcao: checar_validade
+Finalidade: Checar a validade de uma certidão, a partir da data de sua emissão, em uma certa data
+            Obs: A coluna de validade pode estar em dias, meses ou datas, ou ainda ser nula
+Parâmetros: 
+               df -> dataset que se deseja verificar as validades
+  col_to_validate -> coluna com a validade obtida pela automação
+      cols_issued -> coluna com a data de emissão
+    col_to_report -> coluna que será informada no caso de erro
+    is_null_error -> Flag que informa se as validades nulas serão consideradas erradas ou não
+       limit_date -> Data contra a qual a validade será verificada
+           folder -> Número da pasta de certidões que iremos processar
+             save -> O resultado deve ser salvo em disco (True ou False)
+             path -> Caminho para salvar o resultado
+Retorno: dataframe com as linhas e mensagens de erro
+'''
+@medir
+def checar_validade (   df, 
+                        col_to_validate='Validade', 
+                        col_issued='Emitido em', 
+                        col_to_report='Url', 
+                        is_null_error=False, 
+                        limit_date='', 
+                        folder='',
+                        save=True, 
+                        path=''):
+    urls = []
+    erros = []
+    cols = list()
+    cols.append(col_to_validate)
+    cols.append(col_issued)
+    cols.append(col_to_report)
+
+    if limit_date == '':
+        date_base = date.today()
+    else:
+        date_base =  valida_data(limit_date) 
+
+    if date_base != '': # a data base é uma data válida, entao vamos checar
+
+        with fase('laço por linha', linhas_entrada=df.shape[0]) as f:
+            for line in df[cols].itertuples():
+                v = line[1]
+                e = line[2]
+
+                if (pd.isna(v)):
+                    v = ''
+
+                if (pd.isna(e)):
+                    e = ''
+
+                if (v == '') and (is_null_error):  # campo validade nulo, e isso é errado
+                    urls.append(line[3])
+                    erros.append('Validade com problema: Coluna [ ' + col_to_validate + ' ] nula')
+                    continue
+
+                v = v.strip().lower() # campo validade
+                e = e.strip() # campo emissao
+
+                if (e == '') and (v == ''): # campo 'emitido em' e 'Validade' nulos
+                    urls.append(line[3])
+                    erros.append('Datas de Emissão e de Validade vazias')
+                    continue
+            
+                else: # Emissao ou Validade ou ambas contêm algo
+
+                    data_emi = valida_data(e) 
+
+                    if 'dias' in v: # validade em dias
+                        try: # tenta pegar o número de dias
+                            dias = int(v[0:3])
+                        except:
+                            urls.append(line[3])
+                            erros.append('Validade com problema: Coluna [ ' + col_to_validate + ' ] Valor [ <vazio> ]')
+                            continue
+                    elif 'meses' in v: # validade em meses
+                        try:
+                            meses = int(v[0:2]) # tenta pegar o número de meses
+                        except:
+                            urls.append(line[3])
+                            erros.append('Validade com problema: Coluna [ ' + col_to_validate + ' ] Valor [ <vazio> ]')
+                            continue
+
+                        data_val = data_emi + relativedelta(months=meses)
+                        dias = abs((data_val - data_emi).days)
+                    elif e: # validade em data
+                        if v == '': # A Validade é vazia, mas isso não é erro
+                            continue
+
+                        data_val = valida_data(v) # Valida a data de validade
+                        if data_val == '': # Não é uma data válida
+                            urls.append(line[3])
+                            erros.append('Validade com problema: Coluna [ ' + col_to_validate + ' ] Valor [ ' + v + ']')
+                            continue
+
+                        dias = abs((data_val - data_emi).days)
+
+                    if data_emi == '': # Sem data de emissão, mas com validade
+                        valid_until = data_val
+                    else:
+                        valid_until = data_emi + relativedelta(days=dias)
+                    
+                    if valid_until < date_base:
+                        urls.append(line[3])
+                        erros.append('Validade Expirada: Válida até [ ' + valid_until.strftime("%d/%m/%Y") + ' ]')
+                        continue
+            f.linhas_saida = len(erros)
+
+    erros_df = pd.DataFrame.from_dict({'Url': urls, 'Mensagem': erros}).sort_values('Mensagem')
+
+    if (save) and (erros_df.shape[0] > 0):
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        save_to = path + 'Certidões com Validade Errada Folder [ ' + folder + ' ] - ' + timestr + '.xlsx'
+        erros_df.to_excel(save_to, sheet_name='Erros')
+
+    return erros_df
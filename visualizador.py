@@ -0,0 +1,207 @@
+import html
+
+import numpy as np
+import pandas as pd
+
+from graficos import make_clickable, CORES_RESULTADO
+
+
+TAMANHO_PAGINA = 50
+# Colunas das tabelas de erros (validadores, pipeline e diferencas) que ganham índice para filtro
+COLS_INDICE = ['Regra', 'Mensagem', 'Grupo', 'Pasta', 'Situação']
+
+
+'''
+Funcao auxiliar: monta_indice
+Finalidade: Montar o índice de uma coluna: para cada valor, as posições (ordenadas) das linhas
+            que o têm. É feito uma vez, e cada filtro depois só junta arrays já prontos
+Parâmetros:
+            serie -> coluna da tabela de erros
+Retorno: dicionário valor -> np.array com as posições
+'''
+def monta_indice(serie):
+    codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+
+    return {valor: ordem[limites[k]:limites[k + 1]] for k, valor in enumerate(valores.tolist())}
+
+
+'''
+Funcao auxiliar: formata_resultado
+Finalidade: Colorir um Resultado com as cores do mapa de certidões
+Parâmetros:
+        resultado -> texto do Resultado
+Retorno: string formatada como html
+'''
+def formata_resultado(resultado):
+    if resultado not in CORES_RESULTADO:
+        return '' if pd.isna(resultado) else html.escape(str(resultado))
+
+    return f'<span style="background-color: {CORES_RESULTADO[resultado]}">{html.escape(resultado)}</span>'
+
+
+class VisualizadorErros:
+    '''
+    Visualizador paginado de tabelas de erros grandes em notebooks. A tabela fica em memória e só
+    a página visível é convertida para html, com as Urls clicáveis (make_clickable) e o Resultado
+    colorido; filtros por Regra, Mensagem, Grupo, Pasta e Situação usam índices montados uma vez
+    na criação, então navegar e filtrar não dependem do tamanho da tabela.
+    Se informado o dataset de certidões, o Resultado das linhas visíveis é buscado nele pela Url
+    '''
+    def __init__(self, erros, tamanho_pagina=TAMANHO_PAGINA, certidoes=None, col_url='Url',
+                 col_resultado='Resultado', colunas_indice=COLS_INDICE):
+        self.erros = erros.reset_index(drop=True)
+        self.tamanho_pagina = tamanho_pagina
+        self.col_url = col_url
+        self.col_resultado = col_resultado
+        self.indices = {col: monta_indice(self.erros[col]) for col in colunas_indice if col in self.erros.columns}
+
+        self.resultados = None
+        if (certidoes is not None) and (col_resultado not in self.erros.columns):
+            unicas = certidoes.drop_duplicates(col_url)
+            self.resultados = pd.Series(unicas[col_resultado].to_numpy(), index=unicas[col_url].to_numpy())
+
+        self.filtros = {}
+        self.posicoes = np.arange(self.erros.shape[0])
+        self.atual = 0
+
+    @property
+    def total_paginas(self):
+        return max(1, -(-len(self.posicoes) // self.tamanho_pagina))
+
+    def valores(self, coluna):
+        '''Valores de uma coluna indexada, com a quantidade de linhas de cada um'''
+        return {valor: len(posicoes) for valor, posicoes in self.indices[coluna].items()}
+
+    def filtra(self, **filtros):
+        '''
+        Filtra por colunas indexadas (ex.: filtra(Mensagem='Data inválida', Grupo=[1, 2])); uma
+        lista aceita qualquer dos valores, e None remove o filtro da coluna. Linhas com a coluna
+        vazia não entram no índice dela, então só aparecem sem filtro nessa coluna. Volta para a
+        página 1
+        '''
+        for coluna, valor in filtros.items():
+            if coluna not in self.indices:
+                raise ValueError(f'Coluna sem índice: {coluna}')
+            if valor is None:
+                self.filtros.pop(coluna, None)
+            else:
+                self.filtros[coluna] = list(dict.fromkeys(valor)) if isinstance(valor, (list, tuple, set)) else [valor]
+
+        posicoes = None
+        for coluna, valores in self.filtros.items():
+            partes = [self.indices[coluna].get(valor, np.zeros(0, dtype=np.intp)) for valor in valores]
+            # a união das posições precisa ser ordenada e sem repetições para o intersect1d(assume_unique)
+            selecao = np.unique(np.concatenate(partes)) if len(partes) > 1 else partes[0]
+            posicoes = selecao if posicoes is None else np.intersect1d(posicoes, selecao, assume_unique=True)
+
+        self.posicoes = np.arange(self.erros.shape[0]) if posicoes is None else posicoes
+        self.atual = 0
+
+        return self
+
+    def limpa_filtros(self):
+        self.filtros = {}
+        return self.filtra()
+
+    def pagina(self, numero=None):
+        '''Linhas de uma página (começando em 1; padrão: a atual), sem formatação'''
+        if numero is not None:
+            self.atual = min(max(numero - 1, 0), self.total_paginas - 1)
+
+        inicio = self.atual * self.tamanho_pagina
+        pagina = self.erros.iloc[self.posicoes[inicio:inicio + self.tamanho_pagina]]
+
+        if self.resultados is not None:
+            pagina = pagina.assign(**{self.col_resultado: self.resultados.reindex(pagina[self.col_url].to_numpy()).to_numpy()})
+
+        return pagina
+
+    def proxima(self):
+        return self.pagina(self.atual + 2)
+
+    def anterior(self):
+        return self.pagina(self.atual)
+
+    def html_pagina(self, numero=None):
+        '''Html da página, com as Urls clicáveis e o Resultado colorido'''
+        pagina = self.pagina(numero)
+
+        formatadores = {}
+        for coluna in pagina.columns:
+            if coluna == self.col_url:
+                formatadores[coluna] = lambda url: make_clickable(html.escape(str(url), quote=True))
+            elif coluna == self.col_resultado:
+                formatadores[coluna] = formata_resultado
+            else:
+                formatadores[coluna] = lambda valor: '' if pd.isna(valor) else html.escape(str(valor))
+
+        # o to_html não passa os nulos pelos formatadores: na_rep evita o 'NaN' nas células vazias
+        tabela = pagina.to_html(escape=False, formatters=formatadores, na_rep='')
+        filtros = ', '.join(f'{coluna}: {", ".join(map(str, valores))}' for coluna, valores in self.filtros.items())
+
+        return (tabela + f'<p>Página {self.atual + 1} de {self.total_paginas} '
+                f'({len(self.posicoes)} de {self.erros.shape[0]} erros)' + (f' - {html.escape(filtros)}' if filtros else '') + '</p>')
+
+    def _repr_html_(self):
+        return self.html_pagina()
+
+    def exibe(self):
+        '''
+        Exibe a página com controles (ipywidgets) de navegação e de filtro pelas colunas indexadas.
+        Sem ipywidgets, exibe só a página atual; use filtra/proxima/anterior para navegar
+        '''
+        from IPython.display import display, HTML
+
+        try:
+            import ipywidgets as widgets
+        except ImportError:
+            print('WARNING: ipywidgets não instalado; exibindo só a página atual')
+            display(HTML(self.html_pagina()))
+            return None
+
+        saida = widgets.Output()
+
+        def atualiza(*_):
+            saida.clear_output(wait=True)
+            with saida:
+                display(HTML(self.html_pagina()))
+
+        seletores = []
+        for coluna in self.indices:
+            opcoes = [('(todos)', None)] + [(f'{valor} ({qt})', valor) for valor, qt in self.valores(coluna).items()]
+            seletor = widgets.Dropdown(options=opcoes, description=coluna)
+
+            def muda(mudanca, coluna=coluna):
+                self.filtra(**{coluna: mudanca['new']})
+                atualiza()
+
+            seletor.observe(muda, names='value')
+            seletores.append(seletor)
+
+        anterior = widgets.Button(description='Anterior')
+        proxima = widgets.Button(description='Próxima')
+        anterior.on_click(lambda _: (self.anterior(), atualiza()))
+        proxima.on_click(lambda _: (self.proxima(), atualiza()))
+
+        atualiza()
+        display(widgets.VBox([widgets.HBox(seletores), widgets.HBox([anterior, proxima]), saida]))
+        return None
+
+
+'''
+Funcao: visualiza_erros
+Finalidade: Exibir uma tabela de erros em um notebook, uma página por vez (ver VisualizadorErros),
+            em vez de estilizar a tabela inteira
+Parâmetros:
+            erros -> dataframe com os erros (dos validadores, do pipeline ou de compara_execucoes)
+   tamanho_pagina -> linhas por página
+        certidoes -> dataset de certidões, para colorir o Resultado das linhas visíveis (opcional)
+Retorno: o visualizador
+'''
+def visualiza_erros(erros, tamanho_pagina=TAMANHO_PAGINA, certidoes=None):
+    visualizador = VisualizadorErros(erros, tamanho_pagina, certidoes)
+    visualizador.exibe()
+
+    return visualizador